@@ -1,12 +1,262 @@
+import csv
+import glob
+import hashlib
+import mmap
+import multiprocessing
 import os
+import posixpath
 import time
+import zipfile
+from xml.etree import cElementTree as ElementTree
+import numpy
 from xlrd import *
 import xlsxwriter
 
 import Objects
 
-
-def generate_sheet(workbook, sheet_name, template=False):
+# Namespace of the elements of the spreadsheet XML in .xlsx files
+XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+# Delimiters of the delimited text files that grab_data reads (by extension)
+TEXT_DELIMITERS = {'.csv': ',', '.tsv': '\t', '.txt': '\t'}
+# Extensions of the files in a directory that grab_batch reads
+INPUT_EXTENSIONS = ('.xlsx', '.xls') + tuple(TEXT_DELIMITERS)
+# Layout and content of the parse cache sidecars; changing either invalidates
+#    old sidecars
+PARSE_CACHE_VERSION = 2
+# Properties of the cell formats of generated workbooks, by name
+CELL_FORMATS = {
+	'basic': {'text_wrap': True, 'align': 'center', 'valign': 'vcenter'},
+	'bold': {'bold': True},
+	'border': {
+		'align': 'center', 'valign': 'vcenter',
+		'top': 1, 'bottom': 1, 'right': 1, 'left': 1},
+	'border_bold': {
+		'text_wrap': True, 'align': 'center', 'valign': 'vcenter',
+		'bold': True, 'top': 1, 'bottom': 1, 'right': 1, 'left': 1},
+	'border_bot': {
+		'text_wrap': True, 'align': 'center', 'valign': 'vcenter',
+		'bottom': 1},
+	'border_bold_bot': {
+		'text_wrap': True, 'align': 'center', 'valign': 'vcenter',
+		'bold': True, 'bottom': 1},
+	'border_bold_bot_top': {
+		'text_wrap': True, 'align': 'center', 'valign': 'vcenter',
+		'bold': True, 'bottom': 1, 'top': 1},
+	'border_left': {'left': 1},
+	'border_right': {'text_wrap': True, 'align': 'right', 'right': 1},
+	'border_top': {'text_wrap': True, 'top': 1}}
+
+
+class FormatRegistry(object):
+	"""Cell formats of a workbook, each added to it once and shared by its sheets
+
+	Formats are looked up by their name in CELL_FORMATS (registry['bold']) and
+		formats with the same properties are the same Format object.
+
+	=== Attributes ===
+	@type workbook: Workbook
+		Workbook the formats are added to
+	@type formats: dict[tuple, Format]
+		Formats added to <workbook>, by their sorted properties
+	"""
+	def __init__(self, workbook):
+		""" Constructor of FormatRegistry object.
+
+		@type self: FormatRegistry
+		@type workbook: Workbook
+		@rtype: None
+		"""
+		self.workbook = workbook
+		self.formats = {}
+
+	def __getitem__(self, name):
+		"""Return the format of <workbook> named <name> in CELL_FORMATS.
+
+		@type self: FormatRegistry
+		@type name: str
+		@rtype: Format
+		"""
+		return self.get(CELL_FORMATS[name])
+
+	def get(self, properties):
+		"""Return the format of <workbook> with <properties>, adding it once.
+
+		@type self: FormatRegistry
+		@type properties: dict[str, object]
+			As taken by Workbook.add_format
+		@rtype: Format
+		"""
+		key = tuple(sorted(properties.items()))
+		if key not in self.formats:
+			self.formats[key] = self.workbook.add_format(properties)
+		return self.formats[key]
+
+
+class SheetWriter(object):
+	"""Worksheet wrapper that writes cells to xlsxwriter in row order.
+
+	Workbooks in constant_memory mode keep only the current row of each
+		worksheet in memory, so cells written above it are lost. Cells written
+		through a SheetWriter are buffered, in any order, until flush() writes
+		the rows above a given row in order; later writes to a buffered cell
+		replace the earlier ones, as they do in a worksheet.
+	Other attributes (set_column, insert_chart, name...) are the worksheet's.
+
+	=== Attributes ===
+	@type worksheet: Worksheet
+		Worksheet the cells are written to
+	@type rows: dict[int, dict[int, (str, tuple)]]
+		Buffered cells as the Worksheet method and arguments to write them,
+		by row and column
+	@type merges: dict[int, list[tuple]]
+		Arguments of the Worksheet.merge_range calls buffered, by last row
+	@type first_row: int
+		Rows above this one have been written to <worksheet>
+	"""
+	def __init__(self, worksheet):
+		""" Constructor of SheetWriter object.
+
+		@type self: SheetWriter
+		@type worksheet: Worksheet
+		@rtype: None
+		"""
+		self.worksheet = worksheet
+		self.rows = {}
+		self.merges = {}
+		self.first_row = 0
+
+	def __getattr__(self, name):
+		return getattr(self.worksheet, name)
+
+	def buffer(self, method, row, col, args):
+		"""Buffer the cell at <row>, <col> to be written by <method>(*<args>).
+
+		@type self: SheetWriter
+		@type method: str
+		@type row: int
+		@type col: int
+		@type args: tuple
+		@rtype: None
+		"""
+		if row < self.first_row:
+			raise ValueError(
+				"Row %d of sheet '%s' has already been written" %
+				(row, self.worksheet.name))
+		self.rows.setdefault(row, {})[col] = (method, args)
+
+	def write(self, row, col, *args):
+		"""Buffer Worksheet.write(<row>, <col>, *<args>).
+
+		@type self: SheetWriter
+		@type row: int
+		@type col: int
+		@type args: tuple
+		@rtype: None
+		"""
+		self.buffer('write', row, col, args)
+
+	def write_blank(self, row, col, *args):
+		"""Buffer Worksheet.write_blank(<row>, <col>, *<args>).
+
+		@type self: SheetWriter
+		@type row: int
+		@type col: int
+		@type args: tuple
+		@rtype: None
+		"""
+		self.buffer('write_blank', row, col, args)
+
+	def write_row(self, row, col, data, cell_format=None):
+		"""Buffer <data> as a row of cells starting from <row>, <col>.
+
+		@type self: SheetWriter
+		@type row: int
+		@type col: int
+		@type data: [object]
+		@type cell_format: Format | None
+		@rtype: None
+		"""
+		for index, token in enumerate(data):
+			self.buffer('write', row, col + index, (token, cell_format))
+
+	def write_column(self, row, col, data, cell_format=None):
+		"""Buffer <data> as a column of cells starting from <row>, <col>.
+
+		@type self: SheetWriter
+		@type row: int
+		@type col: int
+		@type data: [object]
+		@type cell_format: Format | None
+		@rtype: None
+		"""
+		for index, token in enumerate(data):
+			self.buffer('write', row + index, col, (token, cell_format))
+
+	def merge_range(
+			self, first_row, first_col, last_row, last_col, data,
+			cell_format=None):
+		"""Buffer Worksheet.merge_range with the same arguments.
+
+		@type self: SheetWriter
+		@type first_row: int
+		@type first_col: int
+		@type last_row: int
+		@type last_col: int
+		@type data: object
+		@type cell_format: Format | None
+		@rtype: None
+		"""
+		# Worksheet.merge_range writes every row of the range at once, which
+		#    loses cells written after it in the rows above the last one. The
+		#    cells of the range are buffered like any other, and the range is
+		#    merged when flush() reaches its last row: the rows above it are
+		#    written by then, so merge_range only writes the range's own cells
+		#    again or has them dropped.
+		for row in range(first_row, last_row + 1):
+			for col in range(first_col, last_col + 1):
+				if row == first_row and col == first_col:
+					self.write(row, col, data, cell_format)
+				else:
+					self.write_blank(row, col, '', cell_format)
+		self.merges.setdefault(last_row, []).append(
+			(first_row, first_col, last_row, last_col, data, cell_format))
+
+	def flush(self, end_row=None):
+		"""Write the buffered rows above <end_row> (all if None) in order.
+
+		Cells can't be written above <end_row> afterwards.
+
+		@type self: SheetWriter
+		@type end_row: int | None
+		@rtype: None
+		"""
+		if end_row is None:
+			end_row = max(self.rows) + 1 if self.rows else self.first_row
+		for row in sorted(row for row in self.rows if row < end_row):
+			for args in self.merges.pop(row, []):
+				self.worksheet.merge_range(*args)
+			for col, (method, args) in sorted(self.rows.pop(row).items()):
+				getattr(self.worksheet, method)(row, col, *args)
+		self.first_row = max(self.first_row, end_row)
+
+	def close(self):
+		"""Write all buffered rows, and close the worksheet's temp file.
+
+		No more cells can be written afterwards.
+
+		@type self: SheetWriter
+		@rtype: None
+		"""
+		self.flush()
+		# In constant_memory mode each worksheet keeps a temp file of its rows
+		#    open until Workbook.close() reopens them one by one, so workbooks
+		#    with many sheets would run out of file handles
+		if self.worksheet.optimization:
+			self.worksheet._opt_close()
+		self.first_row = float('inf')
+
+
+def generate_sheet(workbook, sheet_name, template=False, formats=None):
 	"""Create/return basic excel sheet template (in existing <workbook>)
 
 	This is the template upon which most sheets (which the exception of summary
@@ -18,40 +268,31 @@ def generate_sheet(workbook, sheet_name, template=False):
 	@type sheet_name: str
 		Excel label of Worksheet object that is to be inserted.
 	@type template: bool
-	@rtype: Workbook
+	@type formats: FormatRegistry | None
+		Formats of <workbook>; a registry is made for the sheet if None
+	@rtype: Worksheet
 	"""
+	if formats is None:
+		formats = FormatRegistry(workbook)
 	worksheet = workbook.add_worksheet(sheet_name)
+	write_sheet_labels(worksheet, formats, template)
+	return worksheet
+
+
+def write_sheet_labels(worksheet, formats, template=False):
+	"""Write the labels of the basic sheet template (see generate_sheet).
+
+	@type worksheet: Worksheet | SheetWriter
+	@type formats: FormatRegistry
+	@type template: bool
+	@rtype: None
+	"""
 	worksheet.set_row(1, 30.75)  # Setting the height of the SA row to ~2 lines
 
-	#  Formatting for basic cells (previously run_header/basic)
-	basic = workbook.add_format()
-	basic.set_text_wrap()
-	basic.set_align('center')
-	basic.set_align('vcenter')
-	# Formatting for cells surrounded by a border (prev. empty_row/basic_format)
-	border = workbook.add_format()
-	border.set_align('center')
-	border.set_align('vcenter')
-	border.set_top()
-	border.set_bottom()
-	border.set_right()
-	border.set_left()
-	# Formatting for bolded cells (previously req/border_all)
-	border_bold = workbook.add_format()
-	border_bold.set_text_wrap()
-	border_bold.set_align('center')
-	border_bold.set_align('vcenter')
-	border_bold.set_bold()
-	border_bold.set_bottom()
-	border_bold.set_right()
-	border_bold.set_left()
-	border_bold.set_top()
-	# Formatting for not bolded cells (prev. not_req/analyzed_header/not_bold)
-	border_bot = workbook.add_format()
-	border_bot.set_text_wrap()
-	border_bot.set_align('center')
-	border_bot.set_align('vcenter')
-	border_bot.set_bottom()
+	basic = formats['basic']
+	border = formats['border']
+	border_bold = formats['border_bold']
+	border_bot = formats['border_bot']
 
 	# List of input field labels in order they are to be written to the file
 	row_headers = [
@@ -94,8 +335,6 @@ def generate_sheet(workbook, sheet_name, template=False):
 			'Reg Type', border_bold)
 		worksheet.write(index, 2, "", border)
 
-	return worksheet
-
 
 def write_run_labels(worksheet, formats):
 	"""Write basic input field labels for the <worksheet> of a single run.
@@ -138,6 +377,17 @@ def write_run_labels(worksheet, formats):
 	worksheet.set_column(6, 6, 10)
 
 
+def cell_value(value):
+	"""Return <value> as it should be written to a cell; blanks (nan) as ''
+
+	@type value: float | str
+	@rtype: float | str
+	"""
+	if value != value:
+		return ''
+	return value
+
+
 def write_basic_series(worksheet, formats, run):
 	"""Write basic elution series data for the <worksheet> of a single run.
 
@@ -156,7 +406,7 @@ def write_basic_series(worksheet, formats, run):
 		worksheet.write(23 + index, 1, run.elut_ends[index])
 		end_elut_ends_parsed = 23 + index
 	for index, item in enumerate(run.raw_cpms):
-		worksheet.write(23 + index, 2, item)
+		worksheet.write(23 + index, 2, cell_value(item))
 	for index, item in enumerate(run.elut_ends_parsed):
 		worksheet.write(23 + index, 3, item, border_left)
 	for index, item in enumerate(run.elut_cpms_gfact):
@@ -229,23 +479,48 @@ def write_phase(worksheet, formats, first_row, first_col, phase, vertical=True):
 	"""
 	border_bot = formats[0]
 	if vertical:
-		worksheet.write(first_row, first_col, phase.xs[0])
-		worksheet.write(first_row + 1, first_col, phase.xs[1])
-		worksheet.write(first_row + 2, first_col, phase.slope)
-		worksheet.write(first_row + 3, first_col, phase.intercept)
-		worksheet.write(first_row + 4, first_col, phase.r2)
-		worksheet.write(first_row + 5, first_col, phase.k)
-		worksheet.write(first_row + 6, first_col, phase.t05)
-		worksheet.write(first_row + 7, first_col, phase.efflux, border_bot)
+		worksheet.write(first_row, first_col, cell_value(phase.xs[0]))
+		worksheet.write(first_row + 1, first_col, cell_value(phase.xs[1]))
+		worksheet.write(first_row + 2, first_col, cell_value(phase.slope))
+		worksheet.write(first_row + 3, first_col, cell_value(phase.intercept))
+		worksheet.write(first_row + 4, first_col, cell_value(phase.r2))
+		worksheet.write(first_row + 5, first_col, cell_value(phase.k))
+		worksheet.write(first_row + 6, first_col, cell_value(phase.t05))
+		worksheet.write(
+			first_row + 7, first_col, cell_value(phase.efflux), border_bot)
 	else:
-		worksheet.write(first_row, first_col, phase.xs[0])
-		worksheet.write(first_row, first_col + 1, phase.xs[1])
-		worksheet.write(first_row, first_col + 2, phase.slope)
-		worksheet.write(first_row, first_col + 3, phase.intercept)
-		worksheet.write(first_row, first_col + 4, phase.r2)
-		worksheet.write(first_row, first_col + 5, phase.k)
-		worksheet.write(first_row, first_col + 6, phase.t05)
-		worksheet.write(first_row, first_col + 7, phase.efflux, border_bot)
+		worksheet.write(first_row, first_col, cell_value(phase.xs[0]))
+		worksheet.write(first_row, first_col + 1, cell_value(phase.xs[1]))
+		worksheet.write(first_row, first_col + 2, cell_value(phase.slope))
+		worksheet.write(first_row, first_col + 3, cell_value(phase.intercept))
+		worksheet.write(first_row, first_col + 4, cell_value(phase.r2))
+		worksheet.write(first_row, first_col + 5, cell_value(phase.k))
+		worksheet.write(first_row, first_col + 6, cell_value(phase.t05))
+		worksheet.write(
+			first_row, first_col + 7, cell_value(phase.efflux), border_bot)
+
+
+def write_phase_table(worksheet, formats, first_row, first_col, table):
+	"""Write the phases of <table> to excel <worksheet>, one phase per col.
+
+	Each parameter of the phases is written as a row in the same layout as
+		write_phase(vertical=True), starting from <first_row> and <first_col>.
+	len(formats) = 1
+
+	@type worksheet: Worksheet
+	@type formats: [Format] | [None]
+	@type first_row: int
+	@type first_col: int
+	@type table: PhaseTable
+	@rtype: None
+	"""
+	border_bot = formats[0]
+	names = ['start', 'end', 'slope', 'intercept', 'r2', 'k', 't05', 'efflux']
+	for offset, name in enumerate(names):
+		cell_format = border_bot if name == 'efflux' else None
+		worksheet.write_row(
+			first_row + offset, first_col,
+			[cell_value(value) for value in getattr(table, name)], cell_format)
 
 
 def write_phase_series(worksheet, formats, current_col, phase, phase_num):
@@ -377,10 +652,10 @@ def write_summary_chart(
 					   'border': {'color': 'red'},
 					   'fill': {'color': 'black'}}})
 	# Add p3 regression line
-	worksheet.write(7, 0, analysis.phase3.xy1[0])
-	worksheet.write(7, 1, analysis.phase3.xy1[1])
-	worksheet.write(8, 0, analysis.phase3.xy2[0])
-	worksheet.write(8, 1, analysis.phase3.xy2[1])
+	worksheet.write(7, 0, cell_value(analysis.phase3.xy1[0]))
+	worksheet.write(7, 1, cell_value(analysis.phase3.xy1[1]))
+	worksheet.write(8, 0, cell_value(analysis.phase3.xy2[0]))
+	worksheet.write(8, 1, cell_value(analysis.phase3.xy2[1]))
 
 	chart_all.add_series({
 		'categories': [analysis.run.name, 7, 0, 8, 0],
@@ -390,10 +665,10 @@ def write_summary_chart(
 		'marker': {'type': 'none'}
 	})
 	# Add p2 regression line
-	worksheet.write(7, 2, analysis.phase2.xy1[0])
-	worksheet.write(7, 3, analysis.phase2.xy1[1])
-	worksheet.write(8, 2, analysis.phase2.xy2[0])
-	worksheet.write(8, 3, analysis.phase2.xy2[1])
+	worksheet.write(7, 2, cell_value(analysis.phase2.xy1[0]))
+	worksheet.write(7, 3, cell_value(analysis.phase2.xy1[1]))
+	worksheet.write(8, 2, cell_value(analysis.phase2.xy2[0]))
+	worksheet.write(8, 3, cell_value(analysis.phase2.xy2[1]))
 
 	chart_all.add_series({
 		'categories': [analysis.run.name, 7, 2, 8, 2],
@@ -403,10 +678,10 @@ def write_summary_chart(
 		'marker': {'type': 'none'}
 	})
 	# Add p2 regression line
-	worksheet.write(7, 4, analysis.phase1.xy1[0])
-	worksheet.write(7, 5, analysis.phase1.xy1[1])
-	worksheet.write(8, 4, analysis.phase1.xy2[0])
-	worksheet.write(8, 5, analysis.phase1.xy2[1])
+	worksheet.write(7, 4, cell_value(analysis.phase1.xy1[0]))
+	worksheet.write(7, 5, cell_value(analysis.phase1.xy1[1]))
+	worksheet.write(8, 4, cell_value(analysis.phase1.xy2[0]))
+	worksheet.write(8, 5, cell_value(analysis.phase1.xy2[1]))
 
 	chart_all.add_series({
 		'categories': [analysis.run.name, 7, 4, 8, 4],
@@ -562,23 +837,25 @@ def write_basic_calculations(
 	"""
 	border_bot = formats[0]
 	worksheet.write(first_row, first_col, analysis.run.name, border_bot)
-	worksheet.write(first_row + 1, first_col, analysis.run.SA)
-	worksheet.write(first_row + 2, first_col, analysis.run.rt_cnts)
-	worksheet.write(first_row + 3, first_col, analysis.run.sht_cnts)
-	worksheet.write(first_row + 4, first_col, analysis.run.rt_wght)
-	worksheet.write(first_row + 5, first_col, analysis.run.gfact)
-	worksheet.write(first_row + 6, first_col, analysis.run.load_time)
+	worksheet.write(first_row + 1, first_col, cell_value(analysis.run.SA))
+	worksheet.write(first_row + 2, first_col, cell_value(analysis.run.rt_cnts))
+	worksheet.write(first_row + 3, first_col, cell_value(analysis.run.sht_cnts))
+	worksheet.write(first_row + 4, first_col, cell_value(analysis.run.rt_wght))
+	worksheet.write(first_row + 5, first_col, cell_value(analysis.run.gfact))
+	worksheet.write(
+		first_row + 6, first_col, cell_value(analysis.run.load_time))
 	worksheet.write(first_row + 7, first_col, analysis.kind, border_bot)
 	if summary:
-		worksheet.write(first_row + 8, first_col, analysis.poolsize)
-		worksheet.write(first_row + 9, first_col, analysis.ratio)
-		worksheet.write(first_row + 10, first_col, analysis.netflux)
-		worksheet.write(first_row + 11, first_col, analysis.influx, border_bot)
+		worksheet.write(first_row + 8, first_col, cell_value(analysis.poolsize))
+		worksheet.write(first_row + 9, first_col, cell_value(analysis.ratio))
+		worksheet.write(first_row + 10, first_col, cell_value(analysis.netflux))
+		worksheet.write(
+			first_row + 11, first_col, cell_value(analysis.influx), border_bot)
 	else:
-		worksheet.write(4, 13, analysis.influx)
-		worksheet.write(4, 14, analysis.netflux)
-		worksheet.write(4, 15, analysis.ratio)
-		worksheet.write(4, 16, analysis.poolsize, border_bot)
+		worksheet.write(4, 13, cell_value(analysis.influx))
+		worksheet.write(4, 14, cell_value(analysis.netflux))
+		worksheet.write(4, 15, cell_value(analysis.ratio))
+		worksheet.write(4, 16, cell_value(analysis.poolsize), border_bot)
 
 
 def write_constant_row_labels(worksheet, formats):
@@ -687,11 +964,13 @@ def write_series(worksheet, formats, row, col, x_series, y_series, raw_series):
 	Data is written in a column starting from <row> and <col>.
 	Data is spaced according to a <raw_series> whose length is greater than or
 		equal to x_series.
-	We iterate along the larger <raw_series> inputting points from <y_series>
-		only if that point's correspondent in <x_series> matches the point from
-		<raw_series>. If no points match then a blank cell is left.
+	Each point of <y_series> is written in the row of the point of the sorted
+		<raw_series> that its correspondent in <x_series> matches, found by
+		binary search. Rows that no point matches are left blank.
 	This allows us to space all data according to larger <raw_series>
 
+	Precondition: <raw_series> is in increasing order (as elut_ends are)
+
 	@type workbook: Worksheet
 	@type formats: [Format]
 	@type row: int
@@ -702,17 +981,92 @@ def write_series(worksheet, formats, row, col, x_series, y_series, raw_series):
 	@rtype: None
 	"""
 	border_top = formats[0]
-	for index2, item2 in enumerate(raw_series):
-		for index3, item3 in enumerate(x_series):
-			if item2 == item3:
-				if index2 == 0:  # First item needs top border to delineate
-					worksheet.write(
-						row + index2, col,
-						y_series[index3], border_top)
-				else:
-					worksheet.write(
-						row + index2, col,
-						y_series[index3])
+	raw_series = numpy.asarray(raw_series, dtype=float)
+	x_series = numpy.asarray(x_series, dtype=float)
+	indexes = numpy.searchsorted(raw_series, x_series)
+	matched = indexes < len(raw_series)
+	matched[matched] = raw_series[indexes[matched]] == x_series[matched]
+	indexes = indexes[matched].tolist()
+
+	column = [''] * len(raw_series)  # Blanks aren't written to the sheet
+	for index, item in zip(
+			indexes, numpy.asarray(y_series, dtype=float)[matched].tolist()):
+		column[index] = cell_value(item)
+	if 0 in indexes:  # First item needs top border to delineate
+		worksheet.write(row, col, column[0], border_top)
+		worksheet.write_column(row + 1, col, column[1:])
+	else:
+		worksheet.write_column(row, col, column)
+
+
+def parameter_labels():
+	"""Return the parameters that are resampled, with their row labels.
+
+	@rtype: list[(str, unicode)]
+		Parameter names as in Analysis.intervals (e.g. 'k_p3') and labels
+	"""
+	labels = [
+		('poolsize', "Pool Size"), ('ratio', "E:I Ratio"),
+		('netflux', "Net flux"), ('influx', "Influx")]
+	for phase_num, phase_name in [('3', 'III'), ('2', 'II'), ('1', 'I')]:
+		labels.extend([
+			('k_p' + phase_num, "Phase " + phase_name + " k"),
+			('t05_p' + phase_num, "Phase " + phase_name + " Half-Life"),
+			('r0_p' + phase_num, "Phase " + phase_name + u" R\u2080"),
+			('efflux_p' + phase_num, "Phase " + phase_name + " Efflux")])
+	return labels
+
+
+def write_intervals(worksheet, formats, first_row, first_col, analysis):
+	"""Write bootstrap intervals of <analysis> to excel <worksheet>.
+
+	With <first_col> = 0 the row labels are written instead.
+
+	@type worksheet: Worksheet
+	@type formats: [Format]
+	@type first_row: int
+	@type first_col: int
+	@type analysis: Analysis | None
+	@rtype: None
+	"""
+	border_bold_bot_top, border_bot = formats
+	for index, (name, label) in enumerate(parameter_labels()):
+		row = first_row + index * 2
+		if first_col == 0:
+			worksheet.merge_range(row, 0, row + 1, 0, label, border_bold_bot_top)
+			worksheet.write(row, 1, "Lower")
+			worksheet.write(row + 1, 1, "Upper", border_bot)
+		else:
+			lower, upper = analysis.intervals.get(name, ('', ''))
+			worksheet.write(row, first_col, cell_value(lower))
+			worksheet.write(row + 1, first_col, cell_value(upper), border_bot)
+
+
+def write_count_spreads(worksheet, formats, first_row, first_col, analysis):
+	"""Write the spreads of <analysis> caused by counting noise to <worksheet>.
+
+	With <first_col> = 0 the row labels are written instead.
+
+	@type worksheet: Worksheet
+	@type formats: [Format]
+	@type first_row: int
+	@type first_col: int
+	@type analysis: Analysis | None
+	@rtype: None
+	"""
+	border_bold_bot_top, border_bot = formats
+	labels = parameter_labels()
+	for index, (name, label) in enumerate(labels):
+		row = first_row + index
+		# Bottom border closes off the block
+		cell_format = border_bot if index == len(labels) - 1 else None
+		if first_col == 0:
+			worksheet.write(row, 0, label, border_bold_bot_top)
+			worksheet.write(row, 1, "Counting SD", cell_format)
+		else:
+			worksheet.write(
+				row, first_col,
+				cell_value(analysis.count_spreads.get(name, '')), cell_format)
 
 
 def generate_summary(workbook, experiment, formats):
@@ -722,68 +1076,130 @@ def generate_summary(workbook, experiment, formats):
 
 	@type workbook: Workbook
 	@type experiment: Experiment
-	@type formats: [Format]
+	@type formats: FormatRegistry
 	@rtype: None
 	"""
-	border_bold_bot_top, border_bot, border_top = formats
+	border_bold_bot_top = formats['border_bold_bot_top']
+	border_bot = formats['border_bot']
+	border_top = formats['border_top']
 
-	worksheet = generate_sheet(workbook, "Summary", template=False)
+	worksheet = SheetWriter(workbook.add_worksheet("Summary"))
+	write_sheet_labels(worksheet, formats)
 	write_constant_row_labels(worksheet, [border_bold_bot_top, border_bot])
 	spacer = len(experiment.analyses[0].run.elut_ends) - 1
 	elution_series = experiment.analyses[0].run.elut_ends
 	write_series_row_labels(
 		worksheet, [border_bold_bot_top, border_top],
 		spacer, elution_series)
+	# Bootstrap intervals go below the series, then the spreads caused by
+	#    counting noise, if they have been calculated
+	bootstrapped = any(analysis.intervals for analysis in experiment.analyses)
+	simulated = any(analysis.count_spreads for analysis in experiment.analyses)
+	intervals_row = 43 + (spacer * 7)
+	spreads_row = intervals_row
+	if bootstrapped:
+		write_intervals(
+			worksheet, [border_bold_bot_top, border_bot], intervals_row, 0, None)
+		spreads_row += 2 * len(parameter_labels())
+	if simulated:
+		write_count_spreads(
+			worksheet, [border_bold_bot_top, border_bot], spreads_row, 0, None)
+
+	write_phase_table(
+		worksheet, [border_bot], 12, 2, experiment.phase_table('phase3'))
+	write_phase_table(
+		worksheet, [border_bot], 20, 2, experiment.phase_table('phase2'))
+	write_phase_table(
+		worksheet, [border_bot], 28, 2, experiment.phase_table('phase1'))
 
 	# input basic run information
 	for index, analysis in enumerate(experiment.analyses):
 		write_basic_calculations(
 			worksheet, [border_bot], analysis, 0, index + 2, summary=True)
-		write_phase(
-			worksheet, [border_bot], 12, index + 2, analysis.phase3)
-		write_phase(
-			worksheet, [border_bot], 20, index + 2, analysis.phase2)
-		write_phase(
-			worksheet, [border_bot], 28, index + 2, analysis.phase1)
-
-		write_series(
-			worksheet, [border_top],
-			36, index + 2,
-			analysis.run.elut_ends_parsed, analysis.run.elut_cpms_log,
-			analysis.run.elut_ends)
-		write_series(
-			worksheet, [border_top],
-			37 + spacer, index + 2,
-			analysis.run.elut_ends_parsed, analysis.run.elut_cpms_gRFW,
-			analysis.run.elut_ends)
-		write_series(
-			worksheet, [border_top],
-			38 + (spacer * 2), index + 2,
-			analysis.phase3.x_series, analysis.phase3.y_series,
-			analysis.run.elut_ends)
-		write_series(
-			worksheet, [border_top],
-			39 + (spacer * 3), index + 2,
-			analysis.phase2.x_series, analysis.phase2.y_series,
-			analysis.run.elut_ends)
-		write_series(
-			worksheet, [border_top],
-			40 + (spacer * 4), index + 2,
-			analysis.phase1.x_series, analysis.phase1.y_series,
-			analysis.run.elut_ends)
-		write_series(
-			worksheet, [border_top],
-			41 + (spacer * 5), index + 2,
-			analysis.run.elut_ends, analysis.run.raw_cpms,
-			analysis.run.elut_ends)
-		write_series(
-			worksheet, [border_top],
-			42 + (spacer * 6), index + 2,
-			analysis.run.elut_ends_parsed, analysis.run.elut_cpms_gfact,
-			analysis.run.elut_ends)
-
-
-def generate_analysis(experiment):
+	worksheet.flush(36)
+
+	# Each block of series is written for every run before the next block,
+	#    so that only one block is buffered at a time
+	for block in range(7):
+		first_row = 36 + block + (spacer * block)
+		for index, analysis in enumerate(experiment.analyses):
+			run = analysis.run
+			x_series, y_series = [
+				(run.elut_ends_parsed, run.elut_cpms_log),
+				(run.elut_ends_parsed, run.elut_cpms_gRFW),
+				(analysis.phase3.x_series, analysis.phase3.y_series),
+				(analysis.phase2.x_series, analysis.phase2.y_series),
+				(analysis.phase1.x_series, analysis.phase1.y_series),
+				(run.elut_ends, run.raw_cpms),
+				(run.elut_ends_parsed, run.elut_cpms_gfact)][block]
+			write_series(
+				worksheet, [border_top], first_row, index + 2,
+				x_series, y_series, run.elut_ends)
+		worksheet.flush(first_row + spacer + 1)
+	for index, analysis in enumerate(experiment.analyses):
+		if bootstrapped:
+			write_intervals(
+				worksheet, [border_bold_bot_top, border_bot],
+				intervals_row, index + 2, analysis)
+		if simulated:
+			write_count_spreads(
+				worksheet, [border_bold_bot_top, border_bot],
+				spreads_row, index + 2, analysis)
+	worksheet.close()
+
+
+def generate_sensitivity(workbook, experiment, formats):
+	"""Create a sheet in an open <workbook> of objective analyses of each run
+		in <experiment> for every valid obj_num_pts.
+
+	Shows how sensitive the phase parameters are to the number of points
+		objective regression is started with.
+
+	@type workbook: Workbook
+	@type experiment: Experiment
+	@type formats: FormatRegistry
+	@rtype: None
+	"""
+	border_bold_bot_top = formats['border_bold_bot_top']
+	border_bot = formats['border_bot']
+
+	worksheet = SheetWriter(workbook.add_worksheet("Sensitivity"))
+	worksheet.freeze_panes(2, 2)
+	worksheet.set_column(0, 0, 12)
+	worksheet.merge_range(0, 0, 1, 0, 'Run Name', border_bold_bot_top)
+	worksheet.merge_range(
+		0, 1, 1, 1, 'Objective regression points', border_bold_bot_top)
+	phase_headers = [
+		'Start', 'End', "Slope", "Intercept", u"R\u00b2", "k", "Half-Life",
+		"Efflux"]
+	for index, phase_num in enumerate(['III', 'II', 'I']):
+		first_col = 2 + index * len(phase_headers)
+		worksheet.merge_range(
+			0, first_col, 0, first_col + len(phase_headers) - 1,
+			'Phase ' + phase_num, border_bold_bot_top)
+		for index2, item in enumerate(phase_headers):
+			worksheet.write(1, first_col + index2, item, border_bot)
+
+	row = 2
+	for analysis in experiment.analyses:
+		for obj_analysis in analysis.obj_sweep():
+			worksheet.write(row, 0, analysis.run.name)
+			worksheet.write(row, 1, obj_analysis.obj_num_pts)
+			write_phase(
+				worksheet, [None], row, 2, obj_analysis.phase3,
+				vertical=False)
+			write_phase(
+				worksheet, [None], row, 10, obj_analysis.phase2,
+				vertical=False)
+			write_phase(
+				worksheet, [None], row, 18, obj_analysis.phase1,
+				vertical=False)
+			row += 1
+			worksheet.flush(row)
+	worksheet.close()
+
+
+def generate_analysis(experiment, sensitivity=False):
 	"""Creating an excel file in <experiment>.directory.
 
 	Excel file contains comprehensive data analysis as created by the user.
@@ -793,53 +1209,30 @@ def generate_analysis(experiment):
 		CATE data inputted properly.
 
 	@type experiment: Experiment
+	@type sensitivity: bool
+		Whether to add a sheet of objective analyses for every obj_num_pts
 	@rtype: None
 	"""
 	output_name = 'vaCATE Output - ' + time.strftime("(%Y_%m_%d).xlsx")
-	workbook = xlsxwriter.Workbook(experiment.directory + "\\" + output_name)
-
-	# Formatting for bolded cells
-	bold = workbook.add_format()
-	bold.set_bold()
-	# Formatting for not bolded cells
-	border_bot = workbook.add_format()
-	border_bot.set_text_wrap()
-	border_bot.set_align('center')
-	border_bot.set_align('vcenter')
-	border_bot.set_bottom()
-	# Formatting for bolded cells
-	border_bold_bot = workbook.add_format()
-	border_bold_bot.set_text_wrap()
-	border_bold_bot.set_align('center')
-	border_bold_bot.set_align('vcenter')
-	border_bold_bot.set_bold()
-	border_bold_bot.set_bottom()
-	# Formatting for bolded cells
-	border_bold_bot_top = workbook.add_format()
-	border_bold_bot_top.set_text_wrap()
-	border_bold_bot_top.set_align('center')
-	border_bold_bot_top.set_align('vcenter')
-	border_bold_bot_top.set_bold()
-	border_bold_bot_top.set_bottom()
-	border_bold_bot_top.set_top()
-	# Formatting for cells with a left border
-	border_left = workbook.add_format()
-	border_left.set_left()
-	# Formatting for not bolded cells
-	border_right = workbook.add_format()
-	border_right.set_text_wrap()
-	border_right.set_align('right')
-	border_right.set_right()
-	# Formatting for not bolded cells
-	border_top = workbook.add_format()
-	border_top.set_text_wrap()
-	border_top.set_top()
-
-	generate_summary(
-		workbook, experiment, [border_bold_bot_top, border_bot, border_top])
+	# Sheets are written through SheetWriters, in row order, so that only the
+	#    current row of each sheet is kept in memory
+	workbook = xlsxwriter.Workbook(
+		experiment.directory + "\\" + output_name, {'constant_memory': True})
+
+	formats = FormatRegistry(workbook)
+	bold = formats['bold']
+	border_bot = formats['border_bot']
+	border_bold_bot = formats['border_bold_bot']
+	border_left = formats['border_left']
+	border_right = formats['border_right']
+
+	generate_summary(workbook, experiment, formats)
+	if sensitivity:
+		generate_sensitivity(workbook, experiment, formats)
 
 	for analysis in experiment.analyses:
-		worksheet = generate_sheet(workbook, analysis.run.name, template=False)
+		worksheet = SheetWriter(workbook.add_worksheet(analysis.run.name))
+		write_sheet_labels(worksheet, formats)
 		write_run_labels(
 			worksheet, [border_bot, border_right, border_bold_bot])
 		write_basic_calculations(
@@ -888,52 +1281,275 @@ def generate_analysis(experiment):
 			workbook, worksheet, analysis,
 			(p1_x_col, p1_y_col, p1_chart_end), 'I')
 		write_antilog_chart(workbook, worksheet, analysis, end_log_efflux)
+		worksheet.close()
 
 	workbook.close()
 
 
-def grab_data(input_file):
+def grab_data(input_file, backend='xlrd', cache=False):
 	"""Extracts data from an excel file in directory/filename.
 
 	Data is used to create/return an Experiment object.
 
 	Precondition: input file is formatted according to
-		generate_sheet/generate_template
+		generate_sheet/generate_template, or is a delimited text file
+		(.csv, .tsv or .txt) with the same layout
 
 	@type input_file: path
+	@type backend: 'xlrd' | 'stream'
+		How an excel <input_file> is read. 'xlrd' opens the whole workbook;
+		'stream' parses an .xlsx file one row at a time (see stream_rows) so
+		that large templates are never held in memory as a workbook.
+	@type cache: bool
+		Whether to reuse/store the parsed data in a sidecar file next to
+		<input_file> (see read_parse_cache). The sidecar is only used while
+		<input_file> keeps its size and modification time, or its content.
 	@rtype: Experiment
 	"""
-	# Accessing the file from which data is to be grabbed
-	#    input_file = os.path.join(directory, filename)
-	input_book = open_workbook(input_file)
-	input_sheet = input_book.sheet_by_index(0)
+	if cache:
+		cached = read_parse_cache(input_file)
+		if cached is not None:
+			return build_experiment(input_file, *cached)
+		key = parse_cache_key(input_file)
+
+	extension = os.path.splitext(input_file)[1].lower()
+	if extension in TEXT_DELIMITERS:
+		header, elut_ends, cpm_cols = text_run_data(
+			input_file, TEXT_DELIMITERS[extension])
+	elif backend == 'stream':
+		header, elut_ends, cpm_cols = stream_run_data(input_file)
+	else:
+		# Accessing the file from which data is to be grabbed
+		#    input_file = os.path.join(directory, filename)
+		input_book = open_workbook(input_file)
+		input_sheet = input_book.sheet_by_index(0)
+
+		# Parsing elution times, correcting for header offset (8)
+		elut_ends = [float(x) for x in input_sheet.col_values(1, 8)]
+
+		# Run information is in rows 0-6 of every col after the elution
+		#    times, each row is read in one go
+		first_col, end_col = 2, input_sheet.row_len(0)
+		header = [
+			input_sheet.row_values(row, first_col, end_col)
+			for row in range(7)]
+		# Elution cpms, correcting for header offset (8)
+		cpm_cols = [
+			input_sheet.col_values(col_index, 8)
+			for col_index in range(first_col, end_col)]
+
+	if cache:
+		write_parse_cache(input_file, key, header, elut_ends, cpm_cols)
+	return build_experiment(input_file, header, elut_ends, cpm_cols)
+
+
+def parse_cache_path(input_file):
+	"""Return the path of the parse cache sidecar of <input_file>.
+
+	@type input_file: path
+	@rtype: path
+	"""
+	directory, name = os.path.split(input_file)
+	return os.path.join(directory, '.' + name + '.npz')
+
+
+def parse_cache_key(input_file):
+	"""Return the key identifying the current content of <input_file>.
+
+	@type input_file: path
+	@rtype: (path, int, float, str)
+		absolute path, size, modification time and SHA-1 hash of the file
+	"""
+	status = os.stat(input_file)
+	return (
+		os.path.abspath(input_file), status.st_size, status.st_mtime,
+		file_sha1(input_file))
+
 
+def file_sha1(input_file):
+	"""Return the SHA-1 hash of the content of <input_file>.
+
+	@type input_file: path
+	@rtype: str
+	"""
+	digest = hashlib.sha1()
+	with open(input_file, 'rb') as data:
+		for block in iter(lambda: data.read(1 << 20), b''):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+def read_parse_cache(input_file):
+	"""Return the parsed data of <input_file> stored in its sidecar.
+
+	The sidecar is used if it was written for the file at the same path with
+		the same size and modification time, which is checked without
+		reading the file. Otherwise it is content-addressed: it is used (and
+		rewritten with the new path and time) if the file has the size and
+		hash it was written for, e.g. after being moved or touched. If not,
+		or if there is no readable sidecar, None is returned.
+
+	@type input_file: path
+	@rtype: None | (list[list], ndarray, list[ndarray])
+		header rows 0-6 of each run, elut_ends, and raw cpms of each run
+		(see build_experiment)
+	"""
+	sidecar_path = parse_cache_path(input_file)
+	try:
+		status = os.stat(input_file)
+		# numpy.load leaves a broken NpzFile behind for truncated archives
+		if not zipfile.is_zipfile(sidecar_path):
+			return None
+		sidecar = numpy.load(sidecar_path)
+	except (IOError, OSError, ValueError, zipfile.BadZipfile):
+		return None
+	try:
+		if (int(sidecar['version']) != PARSE_CACHE_VERSION or
+				int(sidecar['size']) != status.st_size):
+			return None
+		path = os.path.abspath(input_file)
+		moved = (
+			str(sidecar['path']) != path or
+			float(sidecar['mtime']) != status.st_mtime)
+		if moved and str(sidecar['sha1']) != file_sha1(input_file):
+			return None
+		header = [sidecar['names'].tolist()]
+		for row in sidecar['info'].tolist():  # Blank values are nan
+			header.append(['' if value != value else value for value in row])
+		elut_ends, cpm_cols = sidecar['elut_ends'], list(sidecar['cpms'])
+		sha1 = str(sidecar['sha1'])
+	except (IOError, OSError, ValueError, KeyError, EOFError, UnicodeError,
+			zipfile.BadZipfile):
+		return None
+	finally:
+		sidecar.close()
+	if moved:
+		write_parse_cache(
+			input_file, (path, status.st_size, status.st_mtime, sha1),
+			header, elut_ends, cpm_cols)
+	return header, elut_ends, cpm_cols
+
+
+def write_parse_cache(input_file, key, header, elut_ends, cpm_cols):
+	"""Store the parsed data of <input_file> in its sidecar.
+
+	The cache is only an optimization, so data that can't be stored (e.g. the
+		directory is read-only) is silently left uncached.
+
+	@type input_file: path
+	@type key: (path, int, float, str)
+		See parse_cache_key
+	@type header: list[list]
+	@type elut_ends: list[float] | ndarray
+	@type cpm_cols: list[list[float | str]] | list[ndarray]
+	@rtype: None
+	"""
+	path, size, mtime, sha1 = key
+	try:
+		names = numpy.array([str(name) for name in header[0]])
+		info = numpy.array(
+			[[numpy.nan if value == '' else value for value in row]
+			 for row in header[1:]], dtype=float)
+		cpms = numpy.array(
+			[[numpy.nan if cpm == '' else cpm for cpm in raw_cpms]
+			 for raw_cpms in cpm_cols], dtype=float).reshape(
+				len(cpm_cols), len(elut_ends))
+		numpy.savez(
+			parse_cache_path(input_file), version=PARSE_CACHE_VERSION,
+			path=path, size=size, mtime=mtime, sha1=sha1, names=names,
+			info=info, elut_ends=numpy.asarray(elut_ends, dtype=float),
+			cpms=cpms)
+	except (IOError, OSError, ValueError, UnicodeError):
+		pass
+
+
+def grab_batch(source, backend='xlrd', processes=None, cache=False):
+	"""Extract an Experiment from each input file of <source>.
+
+	<source> is either a directory, of which every excel or delimited text
+		file is read (except excel lock files, '~$...'), or a glob pattern.
+	Files are read by grab_data over a pool of <processes> processes. A file
+		that can't be read doesn't stop the batch; its error is returned
+		in place of its Experiment.
+
+	@type source: path | str
+	@type backend: 'xlrd' | 'stream'
+		See grab_data
+	@type processes: int | None
+		Number of processes to use. Default is the number of CPUs.
+	@type cache: bool
+		See grab_data
+	@rtype: list[(path, Experiment | None, str | None)]
+		Path, Experiment and error message of every file, in sorted order
+	"""
+	if os.path.isdir(source):
+		input_files = [
+			os.path.join(source, name) for name in os.listdir(source)
+			if os.path.splitext(name)[1].lower() in INPUT_EXTENSIONS and
+			not name.startswith('~$')]
+	else:
+		input_files = glob.glob(source)
+	input_files.sort()
+	tasks = [(input_file, backend, cache) for input_file in input_files]
+	if processes == 1 or len(tasks) < 2:
+		results = map(grab_task, tasks)
+	else:
+		pool = multiprocessing.Pool(processes)
+		try:
+			results = pool.map(grab_task, tasks, chunksize=1)
+		finally:
+			pool.close()
+			pool.join()
+	return [
+		(input_file, experiment, error)
+		for input_file, (experiment, error) in zip(input_files, results)]
+
+
+def grab_task(task):
+	"""grab_data for a tuple of its arguments, to be mapped over a Pool.
+
+	@type task: (path, str, bool)
+	@rtype: (Experiment | None, str | None)
+		Experiment of the file, or the error raised while reading it
+	"""
+	try:
+		return grab_data(*task), None
+	except Exception as error:
+		return None, '%s: %s' % (type(error).__name__, error)
+
+
+def build_experiment(input_file, header, elut_ends, cpm_cols):
+	"""Create/return an Experiment of the runs read from <input_file>.
+
+	@type input_file: path
+	@type header: list[list]
+		Rows 0-6 (name, SA, root cnts, shoot cnts, root weight, g factor and
+		load time) of the template, with one value per run.
+	@type elut_ends: list[float]
+	@type cpm_cols: list[list[float | str]] | list[ndarray]
+		Raw cpms of each run; blank eluates are '' (or nan).
+	@rtype: Experiment
+	"""
 	# List where all run info is stored with RunObjects as ind. entries
 	all_analysis_objects = []
+	(run_names, SAs, root_cnts_all, shoot_cnts_all, root_weights, g_factors,
+	 load_times) = header
 
-	# Parsing elution times, correcting for header offset (8)
-	raw_elution_times = input_sheet.col(1)  # Col w/elution times given in file
-	elut_ends = [float(x.value) for x in raw_elution_times[8:]]
-
-	for col_index in range(2, input_sheet.row_len(0)):
+	for offset, raw_cpms in enumerate(cpm_cols):
 		# Grab individual CATE values of interest
-		run_name = str(input_sheet.cell(0, col_index).value)  # in case name is #
-		SA = input_sheet.cell(1, col_index).value
-		root_cnts = input_sheet.cell(2, col_index).value
-		shoot_cnts = input_sheet.cell(3, col_index).value
-		root_weight = input_sheet.cell(4, col_index).value
-		g_factor = input_sheet.cell(5, col_index).value
-		load_time = input_sheet.cell(6, col_index).value
-		# Grabbing elution cpms, correcting for header offset (8)
-		raw_cpm_column = input_sheet.col(col_index)[8:]  # Raw counts given by file
-		raw_cpms = []
-		elution_cpms = []
-		for item in raw_cpm_column:
-			raw_cpms.append(item.value)
-			if item.value != '':
-				elution_cpms.append(float(item.value))
-			else:
-				elution_cpms.append(0.0)
+		run_name = str(run_names[offset])  # in case name is #
+		SA = SAs[offset]
+		root_cnts = root_cnts_all[offset]
+		shoot_cnts = shoot_cnts_all[offset]
+		root_weight = root_weights[offset]
+		g_factor = g_factors[offset]
+		load_time = load_times[offset]
+		if isinstance(raw_cpms, numpy.ndarray):  # Parse cache and text files
+			elution_cpms = numpy.where(numpy.isnan(raw_cpms), 0.0, raw_cpms)
+		else:
+			elution_cpms = [
+				0.0 if cpm == '' or cpm != cpm else float(cpm)
+				for cpm in raw_cpms]
 
 		temp_run = Objects.Run(
 			run_name, SA, root_cnts, shoot_cnts, root_weight, g_factor,
@@ -945,6 +1561,253 @@ def grab_data(input_file):
 	return Objects.Experiment(os.path.dirname(input_file), all_analysis_objects)
 
 
+def text_run_data(input_file, delimiter):
+	"""Read the run data of delimited text <input_file>.
+
+	The file has the layout of the excel template: names, SA, root cnts,
+		shoot cnts, root weight, g factor and load time in rows 0-6, labels
+		in row 7, then a row for each eluate (vial #, elution time and the
+		cpms of each run). The file is memory-mapped, its eluate rows are
+		split at the delimiters (or by the csv module if it has quoted
+		fields) and converted into one array at once. Values are read as
+		xlrd would read them from a sheet (e.g. run name 1 is 1.0), and
+		blank cpms are nan.
+
+	@type input_file: path
+	@type delimiter: str
+	@rtype: (list[list], ndarray, list[ndarray])
+		header rows 0-6 of each run, elut_ends, and raw cpms of each run
+	"""
+	with open(input_file, 'rb') as text_file:
+		text = mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			header_rows = list(csv.reader(
+				[text.readline() for row in range(8)], delimiter=delimiter))
+			names = header_rows[0]
+			while names and not names[-1].strip():  # Trailing delimiters
+				names.pop()
+			num_cols = len(names)
+			start = text.tell()
+			if text.find('"', start) == -1:
+				rows = [
+					line.split(delimiter)
+					for line in text[start:].splitlines()]
+			else:  # Quoted fields may hold delimiters or line breaks
+				rows = csv.reader(iter(text.readline, ''), delimiter=delimiter)
+			values = text_values(rows, num_cols)
+		finally:
+			text.close()
+
+	header = [[text_value(name, numeric=False) for name in names[2:]]]
+	for row in header_rows[1:7]:
+		row = row + [''] * (num_cols - len(row))
+		header.append([text_value(value) for value in row[2:num_cols]])
+
+	values = values.reshape(-1, num_cols - 1)
+	while len(values) and numpy.isnan(values[-1]).all():  # Blank rows
+		values = values[:-1]
+	cpm_cols = [values[:, col] for col in range(1, num_cols - 1)]
+	return header, values[:, 0], cpm_cols
+
+
+def text_values(rows, num_cols):
+	"""Return the elution times and cpms of <rows> of eluates as an array.
+
+	@type rows: iterable[list[str]]
+		Fields of each row
+	@type num_cols: int
+		Number of columns of the file, vial # included
+	@rtype: ndarray
+		One row per eluate; blank values are nan
+	"""
+	cells = []
+	for row in rows:
+		fields = row[1:num_cols]  # Vial # not needed
+		cells.append(fields + [''] * (num_cols - 1 - len(fields)))
+	cells = numpy.array(cells, dtype=str)
+	cells[cells == ''] = 'nan'
+	try:
+		return cells.astype(float)  # Spaces around numbers are ignored
+	except ValueError:  # Blank fields of spaces
+		cells = numpy.char.strip(cells)
+		cells[cells == ''] = 'nan'
+		return cells.astype(float)
+
+
+def text_value(value, numeric=True):
+	"""Return text field <value> as xlrd reads the cell it was saved from.
+
+	Numbers are floats and blanks are ''.
+
+	@type value: str
+	@type numeric: bool
+		Whether <value> must be a number (or blank), otherwise it is left as
+		text if it isn't one
+	@rtype: float | str
+	"""
+	if not value.strip():
+		return ''
+	try:
+		return float(value)
+	except ValueError:
+		if numeric:
+			raise
+		return value
+
+
+def stream_run_data(input_file):
+	"""Read the run data of .xlsx <input_file> as it is streamed row by row.
+
+	Returns the same blocks that grab_data reads with xlrd.
+
+	@type input_file: path
+	@rtype: (list[list], list[float], list[list[float | str]])
+		header rows 0-6 of each run, elut_ends, and raw cpms of each run
+	"""
+	# Eluate rows are added to the columns as they are streamed, so only the
+	#    header rows are kept
+	header, elut_ends, cpm_cols = [], [], []
+	num_cols = num_blank = 0
+	for row_num, row in enumerate(stream_rows(input_file)):
+		num_cols = max(num_cols, len(row))
+		if row_num < 8:  # Row 7 holds the labels of the cpms
+			header.append(row)
+			continue
+		if not row:  # Only kept if a row with values follows
+			num_blank += 1
+			continue
+		for row in [[]] * num_blank + [row]:
+			elut_ends.append(float((row + ['', ''])[1]))
+			cpms = row[2:]
+			while len(cpm_cols) < len(cpms):
+				cpm_cols.append([''] * (len(elut_ends) - 1))
+			cpms += [''] * (len(cpm_cols) - len(cpms))
+			for col, cpm in zip(cpm_cols, cpms):
+				col.append(cpm)
+		num_blank = 0
+	while len(cpm_cols) < num_cols - 2:
+		cpm_cols.append([''] * len(elut_ends))
+	header = [(row + [''] * (num_cols - len(row)))[2:] for row in header[:7]]
+	return header, elut_ends, cpm_cols
+
+
+def stream_rows(input_file):
+	"""Yield the cell values of each row of the first sheet of .xlsx
+		<input_file>.
+
+	The sheet XML is parsed incrementally straight out of the zip archive and
+		each row is discarded once its values are yielded, so memory use does
+		not grow with the size of the sheet (apart from the shared strings).
+	As with xlrd, numbers are floats and empty cells are ''. Rows only
+		extend to their last cell with a value.
+
+	@type input_file: path
+	@rtype: iterator[list[float | int | str]]
+	"""
+	with zipfile.ZipFile(input_file) as book:
+		strings = xlsx_shared_strings(book)
+		sheet = book.open(xlsx_first_sheet(book))
+		num_rows = 0
+		for _, elem in ElementTree.iterparse(sheet):
+			if elem.tag != XLSX_NS + 'row':
+				continue
+			# Rows without any cells are left out of the XML
+			row_num = int(elem.get('r', num_rows + 1))
+			while num_rows < row_num - 1:
+				yield []
+				num_rows += 1
+			row = []
+			for cell in elem.iter(XLSX_NS + 'c'):
+				value = xlsx_cell_value(cell, strings)
+				if value == '':  # e.g. formatted cells without a value
+					continue
+				col_index = xlsx_col_index(cell.get('r'), len(row))
+				row.extend([''] * (col_index - len(row)))
+				row.append(value)
+			yield row
+			num_rows += 1
+			elem.clear()
+
+
+def xlsx_shared_strings(book):
+	"""Return the shared strings table of the .xlsx zip archive <book>.
+
+	@type book: ZipFile
+	@rtype: list[str]
+	"""
+	if 'xl/sharedStrings.xml' not in book.namelist():
+		return []
+	strings = []
+	for _, elem in ElementTree.iterparse(book.open('xl/sharedStrings.xml')):
+		if elem.tag == XLSX_NS + 'si':
+			strings.append(''.join(
+				text.text or '' for text in elem.iter(XLSX_NS + 't')))
+			elem.clear()
+	return strings
+
+
+def xlsx_first_sheet(book):
+	"""Return the name of the first worksheet in the .xlsx zip archive <book>.
+
+	@type book: ZipFile
+	@rtype: str
+	"""
+	workbook = ElementTree.fromstring(book.read('xl/workbook.xml'))
+	sheet = workbook.find(XLSX_NS + 'sheets')[0]
+	rel_id = sheet.get(
+		'{http://schemas.openxmlformats.org/officeDocument/2006/'
+		'relationships}id')
+	rels = ElementTree.fromstring(book.read('xl/_rels/workbook.xml.rels'))
+	for rel in rels:
+		if rel.get('Id') == rel_id:
+			target = rel.get('Target')
+			if target.startswith('/'):
+				return target[1:]
+			return posixpath.normpath(posixpath.join('xl', target))
+
+
+def xlsx_col_index(ref, default):
+	"""Return the col index of cell reference <ref> (e.g. 'C9' -> 2).
+
+	@type ref: str | None
+	@type default: int
+		Index used if the cell has no reference
+	@rtype: int
+	"""
+	if ref is None:
+		return default
+	col_index = 0
+	for char in ref:
+		if not char.isalpha():
+			break
+		col_index = col_index * 26 + ord(char.upper()) - ord('A') + 1
+	return col_index - 1
+
+
+def xlsx_cell_value(cell, strings):
+	"""Return the value of xlsx <cell> element as xlrd would.
+
+	@type cell: Element
+	@type strings: list[str]
+		Shared strings table of the workbook
+	@rtype: float | int | str
+	"""
+	cell_type = cell.get('t', 'n')
+	if cell_type == 'inlineStr':
+		return ''.join(
+			text.text or '' for text in cell.iter(XLSX_NS + 't'))
+	value = cell.find(XLSX_NS + 'v')
+	if value is None or value.text is None:
+		return ''
+	if cell_type == 's':
+		return strings[int(value.text)]
+	if cell_type in ('str', 'e'):
+		return value.text
+	if cell_type == 'b':
+		return int(value.text)
+	return float(value.text)
+
+
 if __name__ == "__main__":
 	directory = os.path.dirname(os.path.abspath(__file__))
 	file_path = os.path.join(directory, "Tests/4/Test_MultiRun1.xlsx")
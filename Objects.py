@@ -1,3 +1,9 @@
+import bisect
+import collections
+import cPickle
+import hashlib
+import multiprocessing
+import os
 import numpy
 import Operations
 
@@ -10,6 +16,8 @@ class Experiment(object):
 		Folder where our data is/analysis will output
 	@type analyses: list[Analysis]
 		Individual CATE run objects (includes current analysis implemented)
+	@type frame: ExperimentFrame
+		Columns of the run data and results of all analyses
 	"""
 	def __init__(self, directory, analyses):
 		"""Experiment object with all relevant data
@@ -23,13 +31,284 @@ class Experiment(object):
 		"""
 		self.directory = directory
 		self.analyses = analyses  # List of Analysis objects
+		self.frame = ExperimentFrame(analyses)
+
+	def analyze_all(
+			self, kind, obj_num_pts=None, xs_p1=('', ''), xs_p2=('', ''),
+			xs_p3=('', ''), engine='curvestrip', weighted=False, cache=None):
+		"""Apply the same analysis settings to every run and analyze them.
+
+		Results are the same as calling Analysis.analyze on every analysis, but
+			all runs are stacked into 2-D arrays (one row per run) and analyzed
+			together.
+
+		@type self: Experiment
+		@type kind: 'obj' | 'subj' | 'opt'
+			The kind of analysis to implement
+		@type obj_num_pts: int | None
+			Number of points that objective analysis is to be done with
+			(objective analysis only; other kinds keep that of each analysis).
+		@type xs_p1: ('', '') | (float, float)
+			x-values of boundaries of phase 1 (subjective analysis only).
+		@type xs_p2: ('', '') | (float, float)
+			x-values of boundaries of phase 2 (subjective analysis only).
+		@type xs_p3: ('', '') | (float, float)
+			x-values of boundaries of phase 3 (subjective analysis only).
+		@type engine: 'curvestrip' | 'nonlinear'
+			How the phases are fit (see Analysis)
+		@type weighted: bool
+			Whether regressions are weighted (see Analysis)
+		@type cache: ResultCache | None
+			Runs with results in <cache> are restored from it instead of
+			analyzed; the results of the others are stored in it.
+		@rtype: None
+		"""
+		analyses, restored = [], []
+		for analysis in self.analyses:
+			analysis.kind = kind
+			if kind == 'obj':
+				analysis.obj_num_pts = obj_num_pts
+			analysis.engine = engine
+			analysis.weighted = weighted
+			if kind == 'subj':
+				analysis.xs_p3, analysis.xs_p2, analysis.xs_p1 = \
+					xs_p3, xs_p2, xs_p1
+			if cache is not None and cache.restore(analysis):
+				restored.append(analysis)
+			else:
+				analyses.append(analysis)
+		if restored:
+			cache.store_settings(restored)
+		if not analyses:
+			return
+
+		runs = [analysis.run for analysis in analyses]
+		elut_ends, x, y, counts = Operations.stack_runs(runs)
+		cols = numpy.arange(x.shape[1])
+		parsed = cols < counts[:, numpy.newaxis]
+		SA = numpy.array([run.SA for run in runs], dtype=float)
+		load_time = numpy.array([run.load_time for run in runs], dtype=float)
+		weights = None
+		if weighted:
+			weights = numpy.zeros(x.shape)
+			for row, run in enumerate(runs):
+				weights[row, :counts[row]] = run.poisson_weights
+
+		# Objective and optimal analyses set the phase limits of every run,
+		#    after which the process is the same for all kinds of analyses
+		if kind == 'obj':
+			starts_p3, r2s, ms, bs = Operations.batch_obj_phase3(
+				obj_num_pts, x, y, counts, weights)
+			starts_p2, highest_r2s = Operations.batch_obj_phase12(
+				starts_p3, x, y, weights)
+			for row, analysis in enumerate(analyses):
+				run = analysis.run
+				num_r2s = counts[row] - 1
+				analysis.obj_x_start = run.x[-obj_num_pts:]
+				analysis.obj_y_start = run.y[-obj_num_pts:]
+				analysis.r2s = r2s[row, :num_r2s].tolist()
+				analysis.ms = ms[row, :num_r2s].tolist()
+				analysis.bs = bs[row, :num_r2s].tolist()
+				analysis.xs_p3 = (
+					run.elut_ends_parsed[starts_p3[row]],
+					run.elut_ends_parsed[-1])
+				analysis.p12_r2_max = highest_r2s[row]
+				start_p2, end_p2 = starts_p2[row], starts_p3[row] - 1
+				if start_p2 < 0:
+					analysis.xs_p2, analysis.xs_p1 = ('', ''), ('', '')
+				else:
+					analysis.xs_p2 = (
+						run.elut_ends_parsed[start_p2],
+						run.elut_ends_parsed[end_p2])
+					analysis.xs_p1 = (
+						run.elut_ends_parsed[0],
+						run.elut_ends_parsed[start_p2 - 1])
+		elif kind == 'opt':
+			for row, analysis in enumerate(analyses):
+				analysis.xs_p3, analysis.xs_p2, analysis.xs_p1, \
+					analysis.opt_r2_max = Operations.get_opt_phases(
+						elut_ends_parsed=analysis.run.elut_ends_parsed,
+						elut_cpms_log=analysis.run.elut_cpms_log,
+						weights=None if weights is None else
+						weights[row, :counts[row]])
+
+		xs_p3_all = [analysis.xs_p3 for analysis in analyses]
+		xs_p2_all = [analysis.xs_p2 for analysis in analyses]
+		xs_p1_all = [analysis.xs_p1 for analysis in analyses]
+
+		phases3, (slopes3, intercepts3, ks3, t05s3, r0s3, effluxes3) = \
+			Operations.batch_extract_phases(
+				xs_p3_all, x, y, parsed, SA, load_time, weights)
+		elut_periods, tracers_retained, netfluxes, influxes, ratios, \
+			poolsizes = Operations.batch_advanced_run_calcs(
+				runs, ks3, t05s3, r0s3, effluxes3)
+
+		# Curve strip phase 1 + 2 data of phase 3
+		# From here on data series potentially have 'holes' from
+		# omitting negative log operations during curvestripping
+		tolerance = BoundaryIndex.tolerance
+		with numpy.errstate(invalid='ignore'):
+			ends_p12 = (x <= Operations.xs_to_arrays(xs_p2_all)[1][
+				:, numpy.newaxis] + tolerance).sum(axis=1) - 1
+		p12 = parsed & (cols <= ends_p12[:, numpy.newaxis])
+		y_p12_curvestrip_p3, p12_curvestrip_p3 = Operations.curvestrip_arrays(
+			x, y, p12, slopes3, intercepts3)
+		phases2, params2 = Operations.batch_extract_phases(
+			xs_p2_all, x, y_p12_curvestrip_p3, p12_curvestrip_p3,
+			SA, load_time, weights)
+		slopes2, intercepts2 = params2[0], params2[1]
+
+		# Phase 1 is sliced out of the curve-stripped phase 1 + 2 data by its
+		#    index in elut_ends_parsed (start) and elut_ends (end)
+		starts_p1, ends_p1 = Operations.xs_to_arrays(xs_p1_all)
+		with numpy.errstate(invalid='ignore'):
+			starts_p1 = (x < starts_p1[:, numpy.newaxis] - tolerance).sum(
+				axis=1)
+			ends_p1 = (elut_ends <= ends_p1[:, numpy.newaxis] + tolerance).sum(
+				axis=1) - 1
+		ranks = numpy.cumsum(p12_curvestrip_p3, axis=1) - 1
+		p1_curvestrip_p3 = p12_curvestrip_p3 & \
+			(ranks >= starts_p1[:, numpy.newaxis]) & \
+			(ranks <= ends_p1[:, numpy.newaxis])
+		y_p1_curvestrip_p23, p1_curvestrip_p23 = Operations.curvestrip_arrays(
+			x, y_p12_curvestrip_p3, p1_curvestrip_p3, slopes2, intercepts2)
+		phases1 = Operations.batch_extract_phases(
+			xs_p1_all, x, y_p1_curvestrip_p23, p1_curvestrip_p23,
+			SA, load_time, weights)[0]
+
+		for row, analysis in enumerate(analyses):
+			if analysis.xs_p3 == ('', ''):
+				continue
+			analysis.phase3 = phases3[row]
+			if not analysis.phase3.is_empty:
+				analysis.elut_period = elut_periods[row]
+				analysis.tracer_retained = tracers_retained[row]
+				analysis.netflux = netfluxes[row]
+				analysis.influx = influxes[row]
+				analysis.ratio = ratios[row]
+				analysis.poolsize = poolsizes[row]
+			else:
+				Operations.clear_run_calcs(analysis)
+			if analysis.xs_p2 == ('', '') or analysis.phase3.is_empty:
+				continue
+			end_p12 = ends_p12[row]
+			analysis.x_p12 = analysis.run.x[: end_p12 + 1]
+			analysis.y_p12 = analysis.run.y[: end_p12 + 1]
+			analysis.x_p12_curvestrip_p3 = \
+				x[row, p12_curvestrip_p3[row]].tolist()
+			analysis.y_p12_curvestrip_p3 = \
+				y_p12_curvestrip_p3[row, p12_curvestrip_p3[row]].tolist()
+			analysis.phase2 = phases2[row]
+			if analysis.xs_p1 == ('', '') or analysis.phase2.is_empty:
+				continue
+			start_p1, end_p1 = starts_p1[row], ends_p1[row]
+			analysis.x_p1 = analysis.run.x[start_p1: end_p1 + 1]
+			analysis.y_p1 = analysis.run.y[start_p1: end_p1 + 1]
+			analysis.x_p1_curvestrip_p3 = \
+				x[row, p1_curvestrip_p3[row]].tolist()
+			analysis.y_p1_curvestrip_p3 = \
+				y_p12_curvestrip_p3[row, p1_curvestrip_p3[row]].tolist()
+			analysis.x_p1_curvestrip_p23 = \
+				x[row, p1_curvestrip_p23[row]].tolist()
+			analysis.y_p1_curvestrip_p23 = \
+				y_p1_curvestrip_p23[row, p1_curvestrip_p23[row]].tolist()
+			analysis.phase1 = phases1[row]
+		if engine == 'nonlinear':
+			Operations.batch_nonlinear_phases(analyses)
+		Analysis.results_version += 1
+		if cache is not None:
+			cache.store(analyses)
+
+	def phase_table(self, phase_name):
+		"""Return the <phase_name> phases of all analyses as a PhaseTable.
+
+		@type self: Experiment
+		@type phase_name: str
+			'phase3', 'phase2' or 'phase1'
+		@rtype: PhaseTable
+		"""
+		if self.frame.analyses is not self.analyses:
+			self.frame = ExperimentFrame(self.analyses)
+		return self.frame.phase_table(phase_name)
+
+	def bootstrap(
+			self, num_resamples=2000, confidence=95, seed=0, processes=None):
+		"""Set percentile intervals of the parameters of every analysis.
+
+		Residuals of each phase are resampled <num_resamples> times for each
+			analysis (see Operations.bootstrap_run), with analyses spread
+			over a pool of <processes> processes. Every analysis gets its own
+			seed drawn from <seed>, so intervals don't depend on the number of
+			processes.
+
+		Precondition: analyses have been analyzed
+
+		@type self: Experiment
+		@type num_resamples: int
+		@type confidence: float
+			Percent of resamples each interval covers
+		@type seed: int
+		@type processes: int | None
+			Number of processes to use. Default is the number of CPUs.
+		@rtype: None
+		"""
+		seeds = numpy.random.RandomState(seed).randint(
+			2 ** 31 - 1, size=len(self.analyses))
+		tasks = [
+			(analysis.run, analysis.xs_p3, analysis.xs_p2, analysis.xs_p1,
+			 num_resamples, int(run_seed))
+			for analysis, run_seed in zip(self.analyses, seeds)
+			if analysis.xs_p3 != ('', '')]
+		if processes == 1 or len(tasks) < 2:
+			samples = map(Operations.bootstrap_task, tasks)
+		else:
+			pool = multiprocessing.Pool(processes)
+			try:
+				samples = pool.map(Operations.bootstrap_task, tasks)
+			finally:
+				pool.close()
+				pool.join()
+		samples = iter(samples)
+		for analysis in self.analyses:
+			if analysis.xs_p3 == ('', ''):
+				analysis.intervals = {}
+			else:
+				analysis.intervals = Operations.percentile_intervals(
+					next(samples), confidence)
+
+	def simulate_counts(self, num_draws=1000, seed=0, count_time=1):
+		"""Set the spread of the parameters of every analysis caused by
+			counting noise in the raw cpms.
+
+		See Operations.simulate_counts. Every analysis gets its own seed drawn
+			from <seed>.
+
+		Precondition: analyses have been analyzed
+
+		@type self: Experiment
+		@type num_draws: int
+		@type seed: int
+		@type count_time: float
+			Minutes each eluate was counted for
+		@rtype: None
+		"""
+		seeds = numpy.random.RandomState(seed).randint(
+			2 ** 31 - 1, size=len(self.analyses))
+		for analysis, run_seed in zip(self.analyses, seeds):
+			if analysis.xs_p3 == ('', ''):
+				analysis.count_spreads = {}
+			else:
+				analysis.count_spreads = Operations.sample_spreads(
+					Operations.simulate_counts(
+						analysis.run, analysis.xs_p3, analysis.xs_p2,
+						analysis.xs_p1, num_draws, int(run_seed), count_time))
 
 
 class Analysis(object):
 	"""Analysis of a single CATE run/replicate
 
 	=== Attributes ===
-	@type kind: None | 'obj' | 'subj'
+	@type kind: None | 'obj' | 'subj' | 'opt'
 		The kind of analysis currently implemented. Default in None
 	@type obj_num_pts: int
 		Number of points that objective analysis is to be done with. 
@@ -42,13 +321,33 @@ class Analysis(object):
 		x-values of boundaries of phase 2. Default are empty strings.
 	@type xs_p3: ('', '') | (float, float)
 		x-values of boundaries of phase 3. Default are empty strings.                
+	@type engine: 'curvestrip' | 'nonlinear'
+		How the phases are fit. Default is by curve-stripping; 'nonlinear'
+		refits the curve-stripped phases together as a sum of exponentials.
+	@type weighted: bool
+		Whether regressions are weighted by the counts of each point (see
+		Run.poisson_weights), including the search for optimal phase limits
+		and the nonlinear refit. Default is unweighted.
+	@type intervals: dict[str, ('', '') | (float, float)]
+		Bootstrap percentile intervals of the parameters (e.g. 'k_p3' or
+		'influx'), if Experiment.bootstrap has been run.
+	@type count_spreads: dict[str, '' | float]
+		Standard deviations of the parameters (e.g. 'k_p3' or 'influx') caused
+		by counting noise, if Experiment.simulate_counts has been run.
+	@type phase_cache: dict[str, (tuple, object)]
+		Last result of each phase step of analyze() with the inputs (phase
+		boundaries and upstream slopes/intercepts) it was calculated from.
 	"""
+	# Incremented whenever an analysis is made, analyzed or restored, so that
+	#    ExperimentFrames know when to rebuild their columns
+	results_version = 0
+
 	def __init__(
 			self, kind, obj_num_pts, run, xs_p1=('', ''),
 			xs_p2=('', ''), xs_p3=('', '')):
 		""" Constructor of Analysis object
 
-		@type kind: None | 'obj' | 'subj'
+		@type kind: None | 'obj' | 'subj' | 'opt'
 			The kind of analysis currently implemented. Default in None
 		@type obj_num_pts: int | None
 			Number of points that objective analysis is to be done with. 
@@ -63,24 +362,24 @@ class Analysis(object):
 			x-values of boundaries of phase 3. Default are empty strings. 
 		@rtype: None
 		"""
-		self.kind = kind  # None, 'obj', or 'subj'
+		self.kind = kind  # None, 'obj', 'subj', or 'opt'
+		self.engine = 'curvestrip'
+		self.weighted = False
 		self.obj_num_pts = obj_num_pts  # None if not obj regression
 		self.run = run
 		self.xs_p3, self.xs_p2, self.xs_p1 = xs_p3, xs_p2, xs_p1
 
 		# Default values are None unless assigned
-		self.phase3 = Phase(
-			('', ''), ('', ''), ('', ''), '', '', '', [], [], '', '', '', '')
-		self.phase2 = Phase(
-			('', ''), ('', ''), ('', ''), '', '', '', [], [], '', '', '', '')
-		self.phase1 = Phase(
-			('', ''), ('', ''), ('', ''), '', '', '', [], [], '', '', '', '')
+		self.phase3 = Phase.empty()
+		self.phase2 = Phase.empty()
+		self.phase1 = Phase.empty()
 		self.r2s = None
 
 		self.obj_x_start, self.obj_y_start = None, None
 		# Attributes for testing
 		self.r2s = None  # Lists from obj analysis, y=mx+b
 		self.p12_r2_max = None
+		self.opt_r2_max = None
 
 		self.x_p12, self.y_p12 = None, None
 		self.x_p12_curvestrip_p3, self.y_p12_curvestrip_p3 = None, None
@@ -89,98 +388,505 @@ class Analysis(object):
 
 		self.elut_period, self.tracer_retained, self.poolsize = None, None, None
 		self.influx, self.netflux, self.ratio = None, None, None
+		self.intervals = {}  # Bootstrap intervals, set by Experiment
+		self.count_spreads = {}  # Counting noise, set by Experiment
+
+		# (key, result) of the last calculation of each phase
+		self.phase_cache = {}
+		Analysis.results_version += 1
 
-	def analyze(self):
+	def analyze(self, cache=None):
 		"""Implement analysis based on settings from attributes.
 
 		Parameters are defined based on the phase limits that have been provided
 		The 'engine' of the analysis if you will.
 
 		@type self: Analysis
+		@type cache: ResultCache | None
+			Results are restored from <cache> instead of calculated if they
+			are in it, and stored in it otherwise.
 		@rtype: None
 		"""
+		if cache is not None and cache.restore(self):
+			cache.store_settings([self])
+			return
 		# Implement objective analysis. Note that objective analysis just uses a
 		#    set algorithm to set phase limits. After this if block the process
 		#    is the same of both objective and subjective analyses. A subjective
-		#    just allows the user to directly set the phase limits.
+		#    just allows the user to directly set the phase limits. An optimal
+		#    analysis sets the limits that give the best fit of all 3 phases.
 		if self.kind == 'obj':
 			self.obj_x_start = self.run.x[-self.obj_num_pts:]
 			self.obj_y_start = self.run.y[-self.obj_num_pts:]
+			weights = self.weights_of(self.run.elut_ends_parsed)
 			self.xs_p3, self.r2s, self.ms, self.bs = Operations.get_obj_phase3(
 				obj_num_pts=self.obj_num_pts,
 				elut_ends_parsed=self.run.elut_ends_parsed,
-				elut_cpms_log=self.run.elut_cpms_log)
+				elut_cpms_log=self.run.elut_cpms_log, weights=weights)
 			self.xs_p2, self.xs_p1, self.p12_r2_max = Operations.get_obj_phase12(
 				xs_p3=self.xs_p3, 
 				elut_ends_parsed=self.run.elut_ends_parsed,
-				elut_cpms_log=self.run.elut_cpms_log,
-				elut_ends=self.run.elut_ends)
+				elut_cpms_log=self.run.elut_cpms_log, weights=weights)
+		elif self.kind == 'opt':
+			self.xs_p3, self.xs_p2, self.xs_p1, self.opt_r2_max = \
+				Operations.get_opt_phases(
+					elut_ends_parsed=self.run.elut_ends_parsed,
+					elut_cpms_log=self.run.elut_cpms_log,
+					weights=self.weights_of(self.run.elut_ends_parsed))
 		# From here analysis is same for both objective and subjective analyses
+		self.analyze_phases()
+		if self.engine == 'nonlinear':
+			Operations.batch_nonlinear_phases([self])
+		Analysis.results_version += 1
+		if cache is not None:
+			cache.store([self])
+
+	def analyze_phases(self):
+		"""Extract the phases from the phase limits that have been set.
+
+		@type self: Analysis
+		@rtype: None
+		"""
+		# Each phase is only recalculated if its boundaries or the fits of the
+		#    phases curve-stripped from it changed since the last analysis
 		if self.xs_p3 != ('', ''):
-			self.phase3 = Operations.extract_phase(
-				xs=self.xs_p3, 
-				x_series=self.run.elut_ends_parsed, 
-				y_series=self.run.elut_cpms_log,
-				elut_ends=self.run.elut_ends,
-				SA=self.run.SA, load_time=self.run.load_time)
-			Operations.advanced_run_calcs(analysis=self)
-			if self.xs_p2 != ('', '') and self.phase3.xs != ('', ''):
-				# Set series' to be curve-stripped
-				end_p12_index = Operations.x_to_index(
-					x_value=self.xs_p2[1], boundary_type='end',
-					x_series=self.run.elut_ends_parsed,
-					larger_x=self.run.elut_ends)
-				self.x_p12 = self.run.x[: end_p12_index+1]
-				self.y_p12 = self.run.y[: end_p12_index+1]
-				# Curve strip phase 1 + 2 data of phase 3
-				# From here on data series potentially have 'holes' from
-				# omitting negative log operations during curvestripping
-				self.x_p12_curvestrip_p3, self.y_p12_curvestrip_p3 = \
-					Operations.curvestrip(
-						x_series=self.x_p12, y_series=self.y_p12, 
-						slope=self.phase3.slope,
-						intercept=self.phase3.intercept)
-				self.phase2 = Operations.extract_phase(
-					xs=self.xs_p2, 
-					x_series=self.x_p12_curvestrip_p3,
-					y_series=self.y_p12_curvestrip_p3,
-					elut_ends=self.run.elut_ends,
-					SA=self.run.SA, load_time=self.run.load_time)
-				if self.xs_p1 != ('', '') and self.phase2.xs != ('', ''):
-					start_p1_index = Operations.x_to_index(
-						x_value=self.xs_p1[0], boundary_type='start',
-						x_series=self.run.elut_ends_parsed,
-						larger_x=self.run.elut_ends)
-					end_p1_index = Operations.x_to_index(
-						x_value=self.xs_p1[1], boundary_type='end',
-						x_series=self.run.elut_ends,
-						larger_x=self.run.elut_ends)
-					self.x_p1 = self.run.x[start_p1_index : end_p1_index+1]
-					self.y_p1 = self.run.y[start_p1_index : end_p1_index+1]
-					# Getting phase 1 data that has been already stripped of
-					# phase 3 data
-					self.x_p1_curvestrip_p3 =\
-						self.x_p12_curvestrip_p3[start_p1_index: end_p1_index+1]
-					self.y_p1_curvestrip_p3 =\
-						self.y_p12_curvestrip_p3[start_p1_index: end_p1_index+1]
-					# Curve-strip phase 2 data from phase 1
-					self.x_p1_curvestrip_p23, self.y_p1_curvestrip_p23 = \
-						Operations.curvestrip(
-							x_series=self.x_p1_curvestrip_p3,
-							y_series=self.y_p1_curvestrip_p3, 
-							slope=self.phase2.slope,
-							intercept=self.phase2.intercept)
-					self.phase1 = Operations.extract_phase(
-						xs=self.xs_p1, 
-						x_series=self.x_p1_curvestrip_p23,
-						y_series=self.y_p1_curvestrip_p23,
-						elut_ends=self.run.elut_ends,
-						SA=self.run.SA, load_time=self.run.load_time)
+			self.phase3 = self.cached_step(
+				'phase3', (self.xs_p3, self.weighted), self.calc_phase3)
+			if self.phase3.is_empty:
+				Operations.clear_run_calcs(analysis=self)
+			else:
+				Operations.advanced_run_calcs(analysis=self)
+			if self.xs_p2 != ('', '') and not self.phase3.is_empty:
+				(self.phase2, self.x_p12, self.y_p12,
+				 self.x_p12_curvestrip_p3, self.y_p12_curvestrip_p3) = \
+					self.cached_step(
+						'phase2',
+						(self.xs_p2, self.weighted,
+						 self.phase3.slope, self.phase3.intercept),
+						self.calc_phase2)
+				if self.xs_p1 != ('', '') and not self.phase2.is_empty:
+					(self.phase1, self.x_p1, self.y_p1,
+					 self.x_p1_curvestrip_p3, self.y_p1_curvestrip_p3,
+					 self.x_p1_curvestrip_p23, self.y_p1_curvestrip_p23) = \
+						self.cached_step(
+							'phase1',
+							(self.xs_p1, self.xs_p2[1], self.weighted,
+							 self.phase3.slope, self.phase3.intercept,
+							 self.phase2.slope, self.phase2.intercept),
+							self.calc_phase1)
+
+	def obj_sweep(self, obj_nums=None):
+		"""Return an objective analysis of the run for each of <obj_nums>.
+
+		The suffix regressions of the run are only calculated once for all of
+			<obj_nums>, and objective analyses that start phase 3 at the same
+			point share the same phase fits.
+
+		@type self: Analysis
+		@type obj_nums: list[int] | None
+			Numbers of points to start objective regression with. Default is
+			every value accepted by Preview (3 to half of elut_ends).
+		@rtype: list[Analysis]
+		"""
+		if obj_nums is None:
+			obj_nums = range(3, len(self.run.elut_ends) // 2)
+		weights = self.weights_of(self.run.elut_ends_parsed)
+		starts_p3, r2s, ms, bs = Operations.sweep_obj_phase3(
+			obj_nums=obj_nums,
+			elut_ends_parsed=self.run.elut_ends_parsed,
+			elut_cpms_log=self.run.elut_cpms_log, weights=weights)
+		analyses = []
+		analyzed = {}  # First analysis with each start of phase 3
+		for obj_num_pts, start_p3 in zip(obj_nums, starts_p3):
+			analysis = Analysis('obj', obj_num_pts, self.run)
+			analysis.weighted = self.weighted
+			analysis.obj_x_start = self.run.x[-obj_num_pts:]
+			analysis.obj_y_start = self.run.y[-obj_num_pts:]
+			analysis.r2s, analysis.ms, analysis.bs = r2s, ms, bs
+			analysis.xs_p3 = (
+				self.run.elut_ends_parsed[start_p3],
+				self.run.elut_ends_parsed[-1])
+			if start_p3 in analyzed:
+				first = analyzed[start_p3]
+				analysis.xs_p2, analysis.xs_p1 = first.xs_p2, first.xs_p1
+				analysis.p12_r2_max = first.p12_r2_max
+				analysis.phase_cache = dict(first.phase_cache)
+			else:
+				analysis.xs_p2, analysis.xs_p1, analysis.p12_r2_max = \
+					Operations.get_obj_phase12(
+						xs_p3=analysis.xs_p3,
+						elut_ends_parsed=self.run.elut_ends_parsed,
+						elut_cpms_log=self.run.elut_cpms_log, weights=weights)
+				analyzed[start_p3] = analysis
+			analysis.analyze_phases()
+			analyses.append(analysis)
+		return analyses
+
+	def weights_of(self, x_series):
+		"""Regression weights of the points of <x_series> (None if unweighted).
+
+		@type self: Analysis
+		@type x_series: list[float]
+			Points of the run's elut_ends_parsed (e.g. after curve-stripping)
+		@rtype: None | ndarray
+		"""
+		if not self.weighted:
+			return None
+		return self.run.poisson_weights[
+			[self.run.parsed_index.start(x_value) for x_value in x_series]]
+
+	def cached_step(self, name, key, calc):
+		"""Return the result of <calc>, reusing the result of the last call
+			for step <name> if it was calculated from the same <key>.
+
+		@type self: Analysis
+		@type name: str
+			Name of the step of the analysis (e.g. 'phase2')
+		@type key: tuple
+			Inputs the result of <calc> depends on
+		@type calc: function
+			Calculates the result of the step from the current attributes
+		@rtype: object
+		"""
+		cached = self.phase_cache.get(name)
+		if cached is not None and cached[0] == key:
+			return cached[1]
+		result = calc()
+		self.phase_cache[name] = (key, result)
+		return result
+
+	def calc_phase3(self):
+		"""Extract phase 3 from the parsed run data.
+
+		@type self: Analysis
+		@rtype: Phase
+		"""
+		return Operations.extract_phase(
+			xs=self.xs_p3, 
+			x_series=self.run.elut_ends_parsed, 
+			y_series=self.run.elut_cpms_log,
+			SA=self.run.SA, load_time=self.run.load_time,
+			weights=self.weights_of(self.run.elut_ends_parsed))
+
+	def calc_phase2(self):
+		"""Curve-strip phase 3 from phase 1 + 2 data and extract phase 2.
+
+		@type self: Analysis
+		@rtype: (Phase, ndarray, ndarray, list[float], list[float])
+			phase2, x_p12, y_p12, x_p12_curvestrip_p3, y_p12_curvestrip_p3
+		"""
+		# Set series' to be curve-stripped
+		end_p12_index = self.run.parsed_index.end(self.xs_p2[1])
+		x_p12 = self.run.x[: end_p12_index+1]
+		y_p12 = self.run.y[: end_p12_index+1]
+		# Curve strip phase 1 + 2 data of phase 3
+		# From here on data series potentially have 'holes' from
+		# omitting negative log operations during curvestripping
+		y_curvestrip, kept = Operations.curvestrip_arrays(
+			x_series=x_p12, y_series=y_p12, series=True,
+			slope=self.phase3.slope, intercept=self.phase3.intercept)
+		x_p12_curvestrip_p3 = x_p12[kept].tolist()
+		y_p12_curvestrip_p3 = y_curvestrip[kept].tolist()
+		phase2 = Operations.extract_phase(
+			xs=self.xs_p2, 
+			x_series=x_p12_curvestrip_p3,
+			y_series=y_p12_curvestrip_p3,
+			SA=self.run.SA, load_time=self.run.load_time,
+			weights=self.weights_of(x_p12_curvestrip_p3))
+		return phase2, x_p12, y_p12, x_p12_curvestrip_p3, y_p12_curvestrip_p3
+
+	def calc_phase1(self):
+		"""Curve-strip phase 2 from phase 1 data and extract phase 1.
+
+		Precondition: x_p12_curvestrip_p3 and y_p12_curvestrip_p3 are set
+
+		@type self: Analysis
+		@rtype: (Phase, ndarray, ndarray, list[float], list[float],
+				 list[float], list[float])
+			phase1, x_p1, y_p1, x_p1_curvestrip_p3, y_p1_curvestrip_p3,
+			x_p1_curvestrip_p23, y_p1_curvestrip_p23
+		"""
+		start_p1_index = self.run.parsed_index.start(self.xs_p1[0])
+		end_p1_index = self.run.elut_index.end(self.xs_p1[1])
+		x_p1 = self.run.x[start_p1_index : end_p1_index+1]
+		y_p1 = self.run.y[start_p1_index : end_p1_index+1]
+		# Getting phase 1 data that has been already stripped of
+		# phase 3 data
+		x_p1_curvestrip_p3 =\
+			self.x_p12_curvestrip_p3[start_p1_index: end_p1_index+1]
+		y_p1_curvestrip_p3 =\
+			self.y_p12_curvestrip_p3[start_p1_index: end_p1_index+1]
+		# Curve-strip phase 2 data from phase 1
+		y_curvestrip, kept = Operations.curvestrip_arrays(
+			x_series=x_p1_curvestrip_p3,
+			y_series=y_p1_curvestrip_p3, series=True,
+			slope=self.phase2.slope,
+			intercept=self.phase2.intercept)
+		x_p1_curvestrip_p23 = numpy.asarray(x_p1_curvestrip_p3)[kept].tolist()
+		y_p1_curvestrip_p23 = y_curvestrip[kept].tolist()
+		phase1 = Operations.extract_phase(
+			xs=self.xs_p1, 
+			x_series=x_p1_curvestrip_p23,
+			y_series=y_p1_curvestrip_p23,
+			SA=self.run.SA, load_time=self.run.load_time,
+			weights=self.weights_of(x_p1_curvestrip_p23))
+		return (
+			phase1, x_p1, y_p1, x_p1_curvestrip_p3, y_p1_curvestrip_p3,
+			x_p1_curvestrip_p23, y_p1_curvestrip_p23)
+
+
+class ResultCache(object):
+	""" Persistent cache of finished analyses, shared between sessions
+
+	Results are stored in <directory>, one file per analysis, keyed by a hash
+		of the run's data and the settings of the analysis (see key). When
+		the files take more than <max_bytes> the least recently used ones
+		are removed; their sizes and order of use are kept in memory, so the
+		directory is only listed by the first eviction. The settings last used for each run are also kept, so
+		an analysis can be brought back as it was left (see restore_last).
+	The cache is only an optimization: files that can't be read or written
+		are treated as missing.
+
+	=== Attributes ===
+	@type directory: path
+		Folder the cache files are kept in
+	@type max_bytes: int
+		Size that the cache files are evicted down to
+	@type entries: None | OrderedDict[str, int]
+		Size of each cache file by name, least recently used first (None
+		until the directory is listed)
+	@type size: int
+		Total size of the files in <entries>
+	"""
+	# Attributes of an Analysis that analyze() sets
+	results = (
+		'xs_p3', 'xs_p2', 'xs_p1', 'phase3', 'phase2', 'phase1',
+		'r2s', 'ms', 'bs', 'obj_x_start', 'obj_y_start', 'p12_r2_max',
+		'opt_r2_max', 'x_p12', 'y_p12', 'x_p12_curvestrip_p3',
+		'y_p12_curvestrip_p3', 'x_p1', 'y_p1', 'x_p1_curvestrip_p3',
+		'y_p1_curvestrip_p3', 'x_p1_curvestrip_p23', 'y_p1_curvestrip_p23',
+		'elut_period', 'tracer_retained', 'netflux', 'influx', 'ratio',
+		'poolsize')
+	# Changing how results are calculated or stored must change the version
+	version = 1
+
+	def __init__(self, directory=None, max_bytes=64 * 2 ** 20):
+		""" Constructor of ResultCache object.
+
+		@type self: ResultCache
+		@type directory: path | None
+			Default is .vacate/results in the home folder of the user
+		@type max_bytes: int
+		@rtype: None
+		"""
+		if directory is None:
+			directory = os.path.join(
+				os.path.expanduser('~'), '.vacate', 'results')
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.entries, self.size = None, 0
+
+	def run_key(self, run):
+		"""Return the hash of the data of <run> that results depend on.
+
+		@type self: ResultCache
+		@type run: Run
+		@rtype: str
+		"""
+		digest = hashlib.sha1(run.data)
+		digest.update(repr((
+			ResultCache.version, run.SA, run.rt_cnts, run.sht_cnts,
+			run.rt_wght, run.gfact, run.load_time)))
+		return digest.hexdigest()
+
+	def key(self, analysis):
+		"""Return the key of the results of <analysis> with its settings.
+
+		Phase limits are only part of the key of subjective analyses; other
+			kinds of analyses set them.
+
+		@type self: ResultCache
+		@type analysis: Analysis
+		@rtype: str
+		"""
+		settings = (
+			analysis.kind, analysis.obj_num_pts, analysis.engine,
+			analysis.weighted)
+		if analysis.kind == 'subj':
+			settings += (analysis.xs_p3, analysis.xs_p2, analysis.xs_p1)
+		digest = hashlib.sha1(self.run_key(analysis.run))
+		digest.update(repr(settings))
+		return digest.hexdigest()
+
+	def restore(self, analysis):
+		"""Set the cached results of <analysis>, if there are any.
+
+		@type self: ResultCache
+		@type analysis: Analysis
+		@rtype: bool
+			Whether the results were restored
+		"""
+		results = self.read(self.key(analysis) + '.result')
+		if results is None:
+			return False
+		for name, value in results.items():
+			setattr(analysis, name, value)
+		analysis.phase_cache = {}
+		Analysis.results_version += 1
+		return True
+
+	def restore_last(self, analysis):
+		"""Apply the settings last stored for the run of <analysis> and restore
+			its results with them.
+
+		@type self: ResultCache
+		@type analysis: Analysis
+		@rtype: bool
+			Whether the results were restored
+		"""
+		settings = self.read(self.run_key(analysis.run) + '.settings')
+		if settings is None:
+			return False
+		(kind, obj_num_pts, engine, weighted, xs_p3, xs_p2, xs_p1) = settings
+		previous = (
+			analysis.kind, analysis.obj_num_pts, analysis.engine,
+			analysis.weighted, analysis.xs_p3, analysis.xs_p2, analysis.xs_p1)
+		analysis.kind, analysis.obj_num_pts = kind, obj_num_pts
+		analysis.engine, analysis.weighted = engine, weighted
+		analysis.xs_p3, analysis.xs_p2, analysis.xs_p1 = xs_p3, xs_p2, xs_p1
+		if self.restore(analysis):
+			return True
+		(analysis.kind, analysis.obj_num_pts, analysis.engine,
+		 analysis.weighted, analysis.xs_p3, analysis.xs_p2,
+		 analysis.xs_p1) = previous
+		return False
+
+	def store(self, analyses):
+		"""Store the results and settings of analyzed <analyses>, then evict.
+
+		@type self: ResultCache
+		@type analyses: list[Analysis]
+		@rtype: None
+		"""
+		for analysis in analyses:
+			self.write(self.key(analysis) + '.result', dict(
+				(name, getattr(analysis, name))
+				for name in ResultCache.results if hasattr(analysis, name)))
+		self.store_settings(analyses)
+		self.evict()
+
+	def store_settings(self, analyses):
+		"""Store the settings of <analyses> as the last used for their runs.
+
+		@type self: ResultCache
+		@type analyses: list[Analysis]
+		@rtype: None
+		"""
+		for analysis in analyses:
+			self.write(self.run_key(analysis.run) + '.settings', (
+				analysis.kind, analysis.obj_num_pts, analysis.engine,
+				analysis.weighted, analysis.xs_p3, analysis.xs_p2,
+				analysis.xs_p1))
+
+	def read(self, name):
+		"""Return the object in cache file <name> and mark it as used.
+
+		@type self: ResultCache
+		@type name: str
+		@rtype: object | None
+		"""
+		path = os.path.join(self.directory, name)
+		try:
+			with open(path, 'rb') as cache_file:
+				value = cPickle.load(cache_file)
+			os.utime(path, None)
+		except (IOError, OSError, EOFError, ValueError, cPickle.PickleError):
+			return None
+		if self.entries is not None and name in self.entries:
+			self.entries[name] = self.entries.pop(name)
+		return value
+
+	def write(self, name, value):
+		"""Store <value> in cache file <name>.
+
+		@type self: ResultCache
+		@type name: str
+		@type value: object
+		@rtype: None
+		"""
+		path = os.path.join(self.directory, name)
+		temp_path = '%s.%d.tmp' % (path, os.getpid())
+		try:
+			if not os.path.isdir(self.directory):
+				os.makedirs(self.directory)
+			with open(temp_path, 'wb') as cache_file:
+				cPickle.dump(value, cache_file, 2)
+				size = cache_file.tell()
+			if os.path.exists(path):  # os.rename can't replace on Windows
+				os.remove(path)
+			os.rename(temp_path, path)
+		except (IOError, OSError, cPickle.PickleError):
+			return
+		if self.entries is not None:
+			self.size += size - self.entries.pop(name, 0)
+			self.entries[name] = size
+
+	def evict(self):
+		"""Remove the least recently used cache files beyond max_bytes.
+
+		The directory is listed the first time, to find the files of earlier
+			sessions; the files are tracked in memory from then on.
+
+		@type self: ResultCache
+		@rtype: None
+		"""
+		if self.entries is None:
+			try:
+				files = []
+				for name in os.listdir(self.directory):
+					status = os.stat(os.path.join(self.directory, name))
+					files.append((status.st_mtime, name, status.st_size))
+			except OSError:
+				return
+			files.sort()
+			self.entries = collections.OrderedDict(
+				(name, size) for _, name, size in files)
+			self.size = sum(self.entries.values())
+		while self.size > self.max_bytes and self.entries:
+			name, size = self.entries.popitem(last=False)
+			try:
+				os.remove(os.path.join(self.directory, name))
+			except OSError:
+				pass
+			self.size -= size
+
+
+def record_view(field, parsed):
+	"""Property giving a read-only view of <field> in the record array of a Run
+
+	Fields of the full series span every eluate. Fields of the parsed series
+		are packed at the front of the record array, so the first num_parsed
+		entries are returned.
+
+	@type field: str
+	@type parsed: bool
+	@rtype: property
+	"""
+	if parsed:
+		def view(self):
+			return self.data[field][:self.num_parsed]
+	else:
+		def view(self):
+			return self.data[field]
+	return property(view)
 
 
 class Run(object):
 	"""Basic data form a single CATE run/replicate
 
+	All series are stored in one contiguous float64 record array (data) and
+		are exposed as read-only views of its fields. Blank raw_cpms are nan.
+
 	=== Attributes ===
 	@type name: str
 		Name of run, used for identification purposes
@@ -198,24 +904,64 @@ class Run(object):
 			of the detecting equipment.
 	@type load_time: float
 		Amount of time plant used was placed in loading solution for (minutes).
-	@type elut_ends: list[float]
+	@type data: ndarray
+		Read-only record array with one float64 field per series.
+	@type parsed: ndarray
+		Validity mask of elut_ends; True where the eluate has radioactivity
+			and so has a log efflux.
+	@type num_parsed: int
+		Number of True points in parsed.
+	@type elut_starts: ndarray
+		Time points that eluates were added to plants
+	@type elut_ends: ndarray
 		Time points that eluates were removed from plants (vs added to plants)
-	@type raw_cpms: list[float]
-		Eluate radioactivities as measured by detecting equipment.
-	@type elut_cpms_gfact: list[float]
+	@type raw_cpms: ndarray
+		Eluate radioactivities as measured by detecting equipment; nan where
+			the eluate was left blank.
+	@type elut_cpms: ndarray
+		raw_cpms with blank values replaced with 0s
+	@type elut_cpms_gfact: ndarray
 		elut_cpms corrected for (multiplied by) g_fact
-	@type elut_cpms_gRFW: list[float]
+	@type elut_cpms_gRFW: ndarray
 		elut_cpms_gfact corrected for (divided by) g_fact
-	@type elut_cpms_log: list[float]
+	@type elut_cpms_log: ndarray
 		Logarithmic conversion of elut_cpms_gRFW
-	@type elut_ends_parsed: list[float]
+	@type elut_ends_parsed: ndarray
 		elut_ends with time points corresponding to eluates with no 
 			radioactivity removed.
 	@type x: ndarry
-		elut_ends_parsed converted to a numpy compatible array
+		Same view as elut_ends_parsed
 	@type y: ndarry
-		elut_cpms_log converted to a numpy compatible array
-	"""        
+		Same view as elut_cpms_log
+	@type elut_index: BoundaryIndex
+		Converts phase boundaries to indexes of elut_ends.
+	@type parsed_index: BoundaryIndex
+		Converts phase boundaries to indexes of elut_ends_parsed.
+	@type poisson_weights: ndarray
+		Regression weights of the points of elut_ends_parsed. Counts are
+			Poisson distributed, so the variance of their logs is
+			proportional to 1/count.
+	"""
+	__slots__ = (
+		'name', 'SA', 'rt_cnts', 'sht_cnts', 'rt_wght', 'gfact', 'load_time',
+		'data', 'parsed', 'num_parsed', 'elut_index', 'parsed_index')
+	series_fields = ('elut_starts', 'elut_ends', 'raw_cpms', 'elut_cpms')
+	parsed_fields = (
+		'elut_ends_parsed', 'elut_cpms_gfact', 'elut_cpms_gRFW',
+		'elut_cpms_log', 'poisson_weights')
+
+	elut_starts = record_view('elut_starts', False)
+	elut_ends = record_view('elut_ends', False)
+	raw_cpms = record_view('raw_cpms', False)
+	elut_cpms = record_view('elut_cpms', False)
+	elut_ends_parsed = record_view('elut_ends_parsed', True)
+	elut_cpms_gfact = record_view('elut_cpms_gfact', True)
+	elut_cpms_gRFW = record_view('elut_cpms_gRFW', True)
+	elut_cpms_log = record_view('elut_cpms_log', True)
+	poisson_weights = record_view('poisson_weights', True)
+	x = elut_ends_parsed
+	y = elut_cpms_log
+
 	def __init__(
 			self, name, SA, rt_cnts, sht_cnts, rt_wght, gfact,
 			load_time, elut_ends, raw_cpms, elut_cpms):
@@ -240,10 +986,11 @@ class Run(object):
 			Amount of time plant used was placed in loading solution for (minutes).
 		@type elut_ends: list[float]
 			Time points that eluates were removed from plants (vs added to plants)
-		@type raw_cpms: list[float]
-			Eluate radioactivities as measured by detecting equipment.
-		@type elut_cpms: list[float]
-			raw_cpms with blank values ('') replaced with 0s
+		@type raw_cpms: list[float | str] | ndarray
+			Eluate radioactivities as measured by detecting equipment; blank
+				values are '' (or nan in an ndarray).
+		@type elut_cpms: list[float] | ndarray
+			raw_cpms with blank values replaced with 0s
 
 		@rtype: None
 		"""       
@@ -254,73 +1001,183 @@ class Run(object):
 		self.rt_wght = rt_wght
 		self.gfact = gfact
 		self.load_time = load_time
-		self.elut_ends = elut_ends
-		self.raw_cpms = raw_cpms
-		self.elut_cpms = elut_cpms  # = raw_cpms with blanks('') replaced w/0
-		self.elut_starts = [0.0] + elut_ends[:-1]
-		self.elut_cpms_gfact, self.elut_cpms_gRFW, \
-			self.elut_cpms_log, self.elut_ends_parsed = \
-			Operations.basic_run_calcs(
-				rt_wght, gfact, self.elut_starts, elut_ends, elut_cpms)       
-		# x and y data for graphing ('numpy-fied')
-		self.x = numpy.array(self.elut_ends_parsed)
-		self.y = numpy.array(self.elut_cpms_log)
+		elut_ends = numpy.asarray(elut_ends, dtype=float)
+		elut_starts = numpy.concatenate(([0.0], elut_ends[:-1]))
+		elut_cpms_gfact, elut_cpms_gRFW, elut_cpms_log, parsed = \
+			Operations.basic_run_arrays(
+				rt_wght, gfact, elut_starts, elut_ends, elut_cpms)
+		self.parsed = parsed
+		self.num_parsed = int(parsed.sum())
+		self.data = numpy.empty(
+			len(elut_ends),
+			dtype=[(field, float) for field in
+				   Run.series_fields + Run.parsed_fields])
+		self.data['elut_starts'] = elut_starts
+		self.data['elut_ends'] = elut_ends
+		if isinstance(raw_cpms, numpy.ndarray):
+			self.data['raw_cpms'] = raw_cpms
+		else:
+			self.data['raw_cpms'] = [
+				numpy.nan if cpm == '' else cpm for cpm in raw_cpms]
+		self.data['elut_cpms'] = elut_cpms
+		packed = {
+			'elut_ends_parsed': elut_ends, 'elut_cpms_gfact': elut_cpms_gfact,
+			'elut_cpms_gRFW': elut_cpms_gRFW, 'elut_cpms_log': elut_cpms_log,
+			'poisson_weights': self.data['elut_cpms']}
+		for field in Run.parsed_fields:
+			self.data[field] = numpy.nan
+			self.data[field][:self.num_parsed] = packed[field][parsed]
+		self.data.flags.writeable = False
+		self.index_series()
+
+	def index_series(self):
+		"""Build the BoundaryIndexes of elut_ends and elut_ends_parsed.
+
+		@type self: Run
+		@rtype: None
+		"""
+		self.elut_index = BoundaryIndex(self.elut_ends)
+		self.parsed_index = BoundaryIndex(self.elut_ends_parsed)
+
+	def __getstate__(self):
+		"""Pickle state of Run; the BoundaryIndexes are rebuilt on unpickling.
+
+		@type self: Run
+		@rtype: dict
+		"""
+		return dict(
+			(slot, getattr(self, slot)) for slot in Run.__slots__
+			if slot not in ('elut_index', 'parsed_index'))
+
+	def __setstate__(self, state):
+		"""Restore Run from <state> made by __getstate__.
+
+		@type self: Run
+		@type state: dict
+		@rtype: None
+		"""
+		for slot, value in state.items():
+			setattr(self, slot, value)
+		self.data.flags.writeable = False
+		self.index_series()
+
+
+class BoundaryIndex(object):
+	""" Converts phase boundaries (x-values) to indexes of a sorted x-series
+
+	Points may be missing from the x-series (e.g. elut_ends_parsed or a
+		curve-stripped series). A boundary that is not in the series resolves
+		to the closest point inside the phase: the next point for a start and
+		the previous point for an end. Lookups bisect the series, so they take
+		O(log n) time.
+
+	=== Attributes ===
+	@type x_series: list[float] | ndarray
+		Sorted x-series that boundaries are converted to indexes of.
+	@type tolerance: float
+		x-values closer than this to a point of <x_series> are that point.
+	"""
+	tolerance = 1e-9
+
+	def __init__(self, x_series):
+		""" Constructor of BoundaryIndex object.
+
+		@type self: BoundaryIndex
+		@type x_series: list[float] | ndarray
+			Sorted x-series that boundaries are converted to indexes of.
+		@rtype: None
+		"""
+		self.x_series = x_series
+
+	def start(self, x_value):
+		"""Index of the first point of <x_series> at or after <x_value>.
+
+		@type self: BoundaryIndex
+		@type x_value: float
+		@rtype: int
+		"""
+		return bisect.bisect_left(self.x_series, x_value - self.tolerance)
+
+	def end(self, x_value):
+		"""Index of the last point of <x_series> at or before <x_value>.
+
+		@type self: BoundaryIndex
+		@type x_value: float
+		@rtype: int
+		"""
+		return bisect.bisect_right(self.x_series, x_value + self.tolerance) - 1
+
+	def to_index(self, x_value, boundary_type):
+		"""Index of <x_value> as the start or end of a phase.
+
+		@type self: BoundaryIndex
+		@type x_value: float
+		@type boundary_type: 'start' | 'end'
+		@rtype: int
+		"""
+		if boundary_type == 'start':
+			return self.start(x_value)
+		return self.end(x_value)
 
 
 class Phase(object):
 	""" Data for a particular phase in our Analysis
 	
 	=== Attributes ===
-	@type xs: (float, float) | ('', '')
+	@type xs: (float, float)
 		x-values (from elut_ends_parsed) of boundaries of phase.
-	@type xy1: (float, float) | ('', '')
+	@type xy1: (float, float)
 		x, y coordinates for one end of regression line.
 		Used to plot phase in GUI.
-	@type xy2: (float, float) | ('', '')
+	@type xy2: (float, float)
 		x, y coordinates for other end of regression line.
 		Used to plot phase in GUI.
-	@type r2: float | ''
+	@type r2: float
 		Coefficient of correlation (R^2) between <x_series> and <y_series>.
-	@type slope: float | ''
+	@type slope: float
 		Slope of regression line between <x_series> and <y_series>.
-	@type intercept: float | ''
+	@type intercept: float
 		Intercept of regression line between <x_series> and <y_series>.
 	@type x_series: [float]
 		x_series of data. Generally elut_ends_parsed.
 	@type x_series: [float]
 		y_series of data. elut_cpms_log data is curve-stripped forms.
-	@type k: float | ''
+	@type k: float
 		Rate constant of the phase (slope *2.303).
-	@type t05: float | ''
+	@type t05: float
 		Half-life of exchange of the phase (0.693/k).
-	@type r0: float | ''
+	@type r0: float
 		Rate of radioisotope release from compartment at time = 0 (antilog of
 			intercept).
-	@type efflux: float | ''
+	@type efflux: float
 		Efflux from compartment (r0/SA).
 
 	=== Representation Invariants ===
-	- Default values of attributes in blank phase are empty strings
+	- Values of attributes that are absent (e.g. in a blank phase) are nan
 	"""
+	__slots__ = (
+		'xs', 'xy1', 'xy2', 'r2', 'slope', 'intercept', 'x_series', 'y_series',
+		'k', 't05', 'r0', 'efflux')
+
 	def __init__(
 		self, xs, xy1, xy2, r2, slope, intercept, x_series, y_series,
 		k, t05, r0, efflux):
 		""" Constructor of Phase object.
 
 		@type self: Phase
-		@type xs: (float, float) | ('', '')
+		@type xs: (float, float)
 			x-values (from elut_ends_parsed) of boundaries of phase.
-		@type xy1: (float, float) | ('', '')
+		@type xy1: (float, float)
 			x, y coordinates for one end of regression line.
 			Used to plot phase in GUI.
-		@type xy2: (float, float) | ('', '')
+		@type xy2: (float, float)
 			x, y coordinates for other end of regression line.
 			Used to plot phase in GUI.
-		@type r2: float | ''
+		@type r2: float
 			Coefficient of correlation (R^2) between <x_series> and <y_series>.
-		@type slope: float | ''
+		@type slope: float
 			Slope of regression line between <x_series> and <y_series>.
-		@type intercept: float | ''
+		@type intercept: float
 			Intercept of regression line between <x_series> and <y_series>.
 		@type x_series: [float]
 			x_series of data. Generally elut_ends_parsed.
@@ -343,6 +1200,321 @@ class Phase(object):
 		self.x_series, self.y_series = x_series, y_series
 		self.k, self.t05, self.r0, self.efflux = k, t05, r0, efflux
 
+	@classmethod
+	def empty(cls, x_series=(), y_series=()):
+		"""Return a blank phase of <x_series> and <y_series>.
+
+		@type x_series: [float]
+		@type y_series: [float]
+		@rtype: Phase
+		"""
+		nan = numpy.nan
+		return cls(
+			(nan, nan), (nan, nan), (nan, nan), nan, nan, nan,
+			list(x_series), list(y_series), nan, nan, nan, nan)
+
+	@property
+	def is_empty(self):
+		"""Whether the phase is blank (could not be extracted).
+
+		@type self: Phase
+		@rtype: bool
+		"""
+		return bool(numpy.isnan(self.xs[0]))
+
+	def __getstate__(self):
+		"""Pickle state of Phase.
+
+		@type self: Phase
+		@rtype: dict
+		"""
+		return dict((slot, getattr(self, slot)) for slot in Phase.__slots__)
+
+	def __setstate__(self, state):
+		"""Restore Phase from <state> made by __getstate__.
+
+		@type self: Phase
+		@type state: dict
+		@rtype: None
+		"""
+		for slot, value in state.items():
+			setattr(self, slot, value)
+
+
+class PhaseTable(object):
+	""" Struct-of-arrays form of the same phase of many analyses
+
+	Each parameter of the phases is one array with an entry per phase, so
+		parameters of a whole experiment can be computed and exported
+		column-wise. Entries of blank phases are nan.
+
+	=== Attributes ===
+	@type start: ndarray
+		Start (xs[0]) of each phase.
+	@type end: ndarray
+		End (xs[1]) of each phase.
+	@type slope: ndarray
+		Slope of regression line of each phase.
+	@type intercept: ndarray
+		Intercept of regression line of each phase.
+	@type r2: ndarray
+		Coefficient of correlation (R^2) of each phase.
+	@type k: ndarray
+		Rate constant of each phase.
+	@type t05: ndarray
+		Half-life of exchange of each phase.
+	@type r0: ndarray
+		Rate of radioisotope release at time = 0 of each phase.
+	@type efflux: ndarray
+		Efflux from compartment of each phase.
+	"""
+	__slots__ = (
+		'start', 'end', 'slope', 'intercept', 'r2', 'k', 't05', 'r0', 'efflux')
+	columns = __slots__  # Names of the parameter arrays
+
+	def __init__(self, phases):
+		""" Constructor of PhaseTable object.
+
+		@type self: PhaseTable
+		@type phases: list[Phase]
+		@rtype: None
+		"""
+		self.start = numpy.array(
+			[phase.xs[0] for phase in phases], dtype=float)
+		self.end = numpy.array([phase.xs[1] for phase in phases], dtype=float)
+		for name in PhaseTable.columns[2:]:
+			setattr(self, name, numpy.array(
+				[getattr(phase, name) for phase in phases], dtype=float))
+
+	def __len__(self):
+		"""Number of phases in the table.
+
+		@type self: PhaseTable
+		@rtype: int
+		"""
+		return len(self.start)
+
+	@property
+	def is_empty(self):
+		"""True for each phase that is blank.
+
+		@type self: PhaseTable
+		@rtype: ndarray
+		"""
+		return numpy.isnan(self.start)
+
+	def take(self, rows):
+		"""Return a PhaseTable of the phases at <rows> of this table.
+
+		@type self: PhaseTable
+		@type rows: ndarray | list[int]
+		@rtype: PhaseTable
+		"""
+		table = PhaseTable([])
+		for name in PhaseTable.columns:
+			setattr(table, name, getattr(self, name)[rows])
+		return table
+
+
+class ExperimentFrame(object):
+	""" Struct-of-arrays view of the runs and results of many analyses
+
+	Run metadata, flux results and phase parameters are held as one array
+		(column) per quantity with an entry per analysis, so that analyses
+		can be filtered and aggregated without looping over objects.
+	Columns are rebuilt from the analyses when they are accessed after any
+		analysis was made, analyzed or restored from a ResultCache (see
+		Analysis.results_version), or analyses were added or removed. Runs
+		edited in place are only picked up by refresh().
+	Phase parameters are named as in Analysis.intervals (e.g. 'k_p3').
+
+	=== Attributes ===
+	@type analyses: list[Analysis]
+		Analyses that the frame is a view of.
+	@type columns: dict[str, ndarray]
+		Run and result columns by name. Missing results are nan.
+	@type phases: dict[str, PhaseTable]
+		Phase parameters by phase name ('phase3', 'phase2' or 'phase1').
+	@type version: (int, int)
+		Analysis.results_version and number of analyses when the columns
+		were built.
+	"""
+	run_columns = ('SA', 'rt_cnts', 'sht_cnts', 'rt_wght', 'gfact', 'load_time')
+	result_columns = (
+		'elut_period', 'tracer_retained', 'netflux', 'influx', 'ratio',
+		'poolsize')
+	phase_names = ('phase3', 'phase2', 'phase1')
+
+	def __init__(self, analyses):
+		""" Constructor of ExperimentFrame object.
+
+		@type self: ExperimentFrame
+		@type analyses: list[Analysis]
+		@rtype: None
+		"""
+		self.analyses = analyses
+		self.columns, self.phases = {}, {}
+		self.refresh()
+
+	def sync(self):
+		"""Rebuild the columns if they are out of date with the analyses.
+
+		@type self: ExperimentFrame
+		@rtype: None
+		"""
+		if self.version != (Analysis.results_version, len(self.analyses)):
+			self.refresh()
+
+	def refresh(self):
+		"""Rebuild all columns from the analyses.
+
+		Call after editing runs (e.g. their SA) in place.
+
+		@type self: ExperimentFrame
+		@rtype: None
+		"""
+		self.version = (Analysis.results_version, len(self.analyses))
+		runs = [analysis.run for analysis in self.analyses]
+		self.columns['name'] = numpy.array(
+			[run.name for run in runs], dtype=object)
+		for name in ExperimentFrame.run_columns:
+			self.columns[name] = numpy.array(
+				[getattr(run, name) for run in runs], dtype=float)
+		self.columns['kind'] = numpy.array(
+			[analysis.kind for analysis in self.analyses], dtype=object)
+		for name in ExperimentFrame.result_columns:
+			values = [getattr(analysis, name) for analysis in self.analyses]
+			self.columns[name] = numpy.array([
+				numpy.nan if value is None else value for value in values],
+				dtype=float)
+		for phase_name in ExperimentFrame.phase_names:
+			self.phases[phase_name] = PhaseTable([
+				getattr(analysis, phase_name) for analysis in self.analyses])
+
+	def __len__(self):
+		"""Number of analyses in the frame.
+
+		@type self: ExperimentFrame
+		@rtype: int
+		"""
+		return len(self.analyses)
+
+	def __getitem__(self, name):
+		"""Return column <name>, e.g. 'SA', 'influx' or 'k_p3'.
+
+		@type self: ExperimentFrame
+		@type name: str
+		@rtype: ndarray
+		"""
+		self.sync()
+		if name in self.columns:
+			return self.columns[name]
+		param, _, phase_num = name.rpartition('_p')
+		phase_name = 'phase' + phase_num
+		if param in PhaseTable.columns and phase_name in self.phases:
+			return getattr(self.phases[phase_name], param)
+		raise KeyError(name)
+
+	def phase_table(self, phase_name):
+		"""Return the PhaseTable of <phase_name> of all analyses.
+
+		@type self: ExperimentFrame
+		@type phase_name: str
+			'phase3', 'phase2' or 'phase1'
+		@rtype: PhaseTable
+		"""
+		self.sync()
+		return self.phases[phase_name]
+
+	def where(self, mask):
+		"""Return a frame of the analyses where <mask> is True.
+
+		e.g. frame.where(frame['load_time'] == 60)
+
+		@type self: ExperimentFrame
+		@type mask: ndarray
+			bool for each analysis (or indexes of the analyses to keep)
+		@rtype: ExperimentFrame
+		"""
+		self.sync()
+		rows = numpy.arange(len(self.analyses))[mask]
+		frame = ExperimentFrame([])
+		frame.analyses = [self.analyses[row] for row in rows]
+		frame.version = (Analysis.results_version, len(rows))
+		frame.columns = dict(
+			(name, column[rows]) for name, column in self.columns.items())
+		frame.phases = dict(
+			(name, table.take(rows)) for name, table in self.phases.items())
+		return frame
+
+	def aggregate(self, name, func=numpy.nanmean, by=None):
+		"""Aggregate column <name> with <func>, optionally grouped by column <by>.
+
+		@type self: ExperimentFrame
+		@type name: str
+		@type func: ndarray -> float
+			Defaults to the mean ignoring missing (nan) values.
+		@type by: None | str
+		@rtype: float | dict[object, float]
+			Aggregate of the whole column, or of each value of column <by>.
+		"""
+		column = self[name]
+		if by is None:
+			return func(column)
+		keys, groups = numpy.unique(self[by], return_inverse=True)
+		return dict(
+			(key, func(column[groups == index]))
+			for index, key in enumerate(keys))
+
+
+class Regression(object):
+	""" Least-squares line (y = mx + b) fit to one or many series
+
+	Attributes are floats for a single series, or arrays with an entry per
+		series when many series were fit at once.
+
+	=== Attributes ===
+	@type n: float | ndarray
+		Number of points fit.
+	@type slope: float | ndarray
+		Slope of the regression line (m).
+	@type intercept: float | ndarray
+		Intercept of the regression line (b).
+	@type r2: float | ndarray
+		Coefficient of correlation (R^2) of the fit.
+	@type slope_se: float | ndarray
+		Standard error of <slope>.
+	@type intercept_se: float | ndarray
+		Standard error of <intercept>.
+	@type ss_resid: float | ndarray
+		Sum of squared residuals about the regression line.
+	"""
+	def __init__(
+		self, n, slope, intercept, r2, slope_se, intercept_se, ss_resid):
+		""" Constructor of Regression object.
+
+		@type self: Regression
+		@type n: float | ndarray
+			Number of points fit.
+		@type slope: float | ndarray
+			Slope of the regression line (m).
+		@type intercept: float | ndarray
+			Intercept of the regression line (b).
+		@type r2: float | ndarray
+			Coefficient of correlation (R^2) of the fit.
+		@type slope_se: float | ndarray
+			Standard error of <slope>.
+		@type intercept_se: float | ndarray
+			Standard error of <intercept>.
+		@type ss_resid: float | ndarray
+			Sum of squared residuals about the regression line.
+		@rtype: None
+		"""
+		self.n = n
+		self.slope, self.intercept, self.r2 = slope, intercept, r2
+		self.slope_se, self.intercept_se = slope_se, intercept_se
+		self.ss_resid = ss_resid
+
 if __name__ == "__main__":
 	import Excel
 	import os
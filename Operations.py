@@ -2,6 +2,10 @@ import math
 import numpy
 import Objects
 
+# Curve-stripped efflux this small relative to the efflux is rounding error
+#    (e.g. a phase stripped from its own points), and is omitted like <= 0
+STRIP_TOLERANCE = 1e-9
+
 
 def grab_x_ys(elution_ends, slope, intercept):
     """Given general line data, output ends of line for graphing.
@@ -57,7 +61,45 @@ def basic_run_calcs(rt_wght, gfact, elut_starts, elut_ends, elut_cpms):
     return elut_cpms_gfact, elut_cpms_gRFW, elut_cpms_log, elut_ends_parsed
 
 
-def get_obj_phase3(obj_num_pts, elut_ends_parsed, elut_cpms_log):
+def basic_run_arrays(rt_wght, gfact, elut_starts, elut_ends, elut_cpms):
+    """Array version of basic_run_calcs that keeps empty data points.
+
+    Instead of being removed, empty data points (0 cpm) are nan in every
+        returned series, which therefore stay aligned with <elut_ends>.
+    Stacked runs (one row per run) are done at once if <rt_wght> and <gfact>
+        have one entry per row.
+
+    Precondition: blank values in <elut_cpms> have been replaced with 0s
+
+    @type rt_wght: float | ndarray
+        root weight of plant
+    @type gfact: float | ndarray
+        factor used to correct for measuring differences in detecting machines
+    @type elut_starts: list[float] | ndarray
+        x-series representing times elutions STARTED
+    @type elut_ends: list[float] | ndarray
+        x-series representing times elutions ENDED. No points removed yet.
+    @type elut_cpms: list[float] | ndarray
+        y-series representing times raw elution radioactivitiy in (in cpm)
+    @rtype: ndarray, ndarray, ndarray, ndarray
+        elution radioactivity corrected for G-factor, root weight, logged, and
+        True for the data points that are kept when parsing, respectively
+    """
+    cpms = numpy.asarray(elut_cpms, dtype=float)
+    gfact = numpy.asarray(gfact, dtype=float)[..., numpy.newaxis]
+    rt_wght = numpy.asarray(rt_wght, dtype=float)[..., numpy.newaxis]
+    parsed = cpms != 0  # Our trigger to skip data point
+    cpms = numpy.where(parsed, cpms, numpy.nan)
+    elut_cpms_gfact = cpms * gfact
+    elut_cpms_gRFW = cpms * gfact / rt_wght / (
+        numpy.asarray(elut_ends, dtype=float) -
+        numpy.asarray(elut_starts, dtype=float))
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        elut_cpms_log = numpy.log10(elut_cpms_gRFW)
+    return elut_cpms_gfact, elut_cpms_gRFW, elut_cpms_log, parsed
+
+
+def get_obj_phase3(obj_num_pts, elut_ends_parsed, elut_cpms_log, weights=None):
     """Determine limits of phase 3 using objective regression.
 
     Precondition: obj_num_pts > 3 (checked when getting user input)
@@ -74,24 +116,20 @@ def get_obj_phase3(obj_num_pts, elut_ends_parsed, elut_cpms_log):
         elution end points with empty end points (paired with '' or 0) removed
     @type elut_cpms_log: list[float]
         elution radioativity corrected for G-factor, root weight, and logged
+    @type weights: None | list[float] | ndarray
+        regression weight of each point. Default is unweighted.
     @rtype: (float, float), list[float], list[float], list[float]
         boundaries of phase 3, and r^2s, slopes, and intercepts (for testing)
     """
-    r2s = []
-    ms, bs = [], []  # y = mx+b
-    # Storing all possible r2s/ms/bs
-    for index in range(len(elut_cpms_log) - 2, -1, -1):
-        temp_x = elut_ends_parsed[index:]
-        temp_y = elut_cpms_log[index:]
-        temp_r2, temp_m, temp_b = linear_regression(
-            x_series=temp_x, y_series=temp_y)
-        r2s = [temp_r2] + r2s
-        ms = [temp_m] + ms
-        bs = [temp_b] + bs
-        
+    # Storing all possible r2s/ms/bs (every suffix of >= 2 points), y = mx+b
+    suffixes = suffix_regressions(elut_ends_parsed, elut_cpms_log, weights)
+    r2s = suffixes.r2[:-1].tolist()
+    ms, bs = suffixes.slope[:-1].tolist(), suffixes.intercept[:-1].tolist()
+
     # Determining the index at which r2 drops three times in a row 
     # from obj_num_pts from the end of the series
     counter = 0
+    index = 0  # Phase 3 starts at the 3rd pt if there is nothing to scan
     for index in range(len(elut_ends_parsed) - obj_num_pts, 1, -1):
         if r2s[index - 1] < r2s[index]:
             counter += 1
@@ -105,11 +143,55 @@ def get_obj_phase3(obj_num_pts, elut_ends_parsed, elut_cpms_log):
     return xs_p3, r2s, ms, bs  # r2s, ms, bs returned for testing
 
 
-def get_obj_phase12(xs_p3, elut_ends_parsed, elut_cpms_log, elut_ends):
+def sweep_obj_phase3(obj_nums, elut_ends_parsed, elut_cpms_log, weights=None):
+    """get_obj_phase3 for each of <obj_nums> from a single suffix regression.
+
+    The r^2s of the suffixes don't depend on obj_num_pts, only the scan for
+        three drops in a row does. Drops are found once, and the last drop
+        before the top of each scan is read off a running maximum.
+
+    @type obj_nums: list[int]
+        numbers of points used to start objective regression
+    @type elut_ends_parsed: list[float]
+        elution end points with empty end points (paired with '' or 0) removed
+    @type elut_cpms_log: list[float]
+        elution radioativity corrected for G-factor, root weight, and logged
+    @type weights: None | list[float] | ndarray
+        regression weight of each point. Default is unweighted.
+    @rtype: list[int], list[float], list[float], list[float]
+        index of elut_ends_parsed at which phase 3 starts for each of
+        <obj_nums>, and r^2s, slopes, and intercepts (as in get_obj_phase3)
+    """
+    suffixes = suffix_regressions(elut_ends_parsed, elut_cpms_log, weights)
+    r2s = suffixes.r2[:-1]
+    num_pts = len(elut_ends_parsed)
+
+    # triples[index] if r2 drops at index, index + 1 and index + 2
+    cols = numpy.arange(num_pts)
+    with numpy.errstate(invalid='ignore'):
+        drops = numpy.zeros(num_pts, dtype=bool)
+        drops[1:-1] = r2s[:-1] < r2s[1:]
+    triples = numpy.zeros(num_pts, dtype=bool)
+    triples[2:-2] = drops[2:-2] & drops[3:-1] & drops[4:]
+    last_triples = numpy.maximum.accumulate(numpy.where(triples, cols, -1))
+
+    tops = num_pts - numpy.asarray(obj_nums, dtype=int)
+    scan_ends = numpy.where(tops >= 2, 2, 0)
+    has_triple = tops >= 4
+    scan_ends[has_triple] = numpy.maximum(
+        last_triples[tops[has_triple] - 2], scan_ends[has_triple])
+    return (
+        (scan_ends + 2).tolist(), r2s.tolist(), suffixes.slope[:-1].tolist(),
+        suffixes.intercept[:-1].tolist())
+
+
+def get_obj_phase12(xs_p3, elut_ends_parsed, elut_cpms_log, weights=None):
     """Determining boundaries of phase 1+2 using objective regression.
 
     These are the x and y series for phase 1 and 2 that yield highest combined
     r2. Refactored out of set_obj_phases so tests can access highest_r2
+    If no split gives a positive combined r2 (e.g. < 4 pts precede phase 3)
+        both phases are returned empty.
 
     @type xs_p3: (float, float)
         boundaries of phase 3
@@ -117,37 +199,114 @@ def get_obj_phase12(xs_p3, elut_ends_parsed, elut_cpms_log, elut_ends):
         elution end points with empty end points (paired with '' or 0) removed
     @type elut_cpms_log: list[float]
         elution radioativity corrected for G-factor, root weight, and logged
-    @type elut_ends: list[float]
-        x-series representing times elutions ENDED. No points removed yet.
+    @type weights: None | list[float] | ndarray
+        regression weight of each point. Default is unweighted.
     @rtype: (float, float), (float, float), float
         best boundaries of phase 2 and 1, and their combined r2
     """
     start_p3 = x_to_index(
-        x_value=xs_p3[0], boundary_type='start',
-        x_series=elut_ends_parsed, larger_x=elut_ends)
+        x_value=xs_p3[0], boundary_type='start', x_series=elut_ends_parsed)
     temp_x_p12 = elut_ends_parsed[:start_p3]
     temp_y_p12 = elut_cpms_log[:start_p3]
-    highest_r2 = 0
-    
-    for index in range(1, len(temp_x_p12) - 2):  # -2 bec. min. len(list) = 2
-        temp_start_p2 = index + 1
-        temp_x_p2 = temp_x_p12[temp_start_p2:]
-        temp_y_p2 = temp_y_p12[temp_start_p2:]
-        temp_x_p1 = temp_x_p12[:temp_start_p2]
-        temp_y_p1 = temp_y_p12[:temp_start_p2]
-        temp_r2_p2, temp_m_p2, temp_b_p2 = linear_regression(
-            temp_x_p2, temp_y_p2)
-        temp_r2_p1, temp_m_p1, temp_b_p1 = linear_regression(
-            temp_x_p1, temp_y_p1)
-        if temp_r2_p1 + temp_r2_p2 > highest_r2:
-            highest_r2 = temp_r2_p1 + temp_r2_p2
-            xs_p2 = (temp_x_p12[temp_start_p2], temp_x_p12[-1])
-            xs_p1 = (temp_x_p12[0], temp_x_p12[temp_start_p2 - 1])
-        
+    xs_p2, xs_p1, highest_r2 = ('', ''), ('', ''), 0
+    if len(temp_x_p12) < 4:  # Each phase needs >= 2 pts
+        return xs_p2, xs_p1, highest_r2
+
+    # Phase 1 is every prefix, phase 2 every suffix; score all splits at once
+    if weights is not None:
+        weights = weights[:start_p3]
+    r2s_p1 = prefix_regressions(temp_x_p12, temp_y_p12, weights).r2
+    r2s_p2 = suffix_regressions(temp_x_p12, temp_y_p12, weights).r2
+    starts_p2 = numpy.arange(2, len(temp_x_p12) - 1)
+    combined_r2s = r2s_p1[starts_p2 - 1] + r2s_p2[starts_p2]
+    combined_r2s[numpy.isnan(combined_r2s)] = 0
+    best = numpy.argmax(combined_r2s)  # First of any tied splits
+    if combined_r2s[best] > highest_r2:
+        highest_r2 = combined_r2s[best]
+        temp_start_p2 = int(starts_p2[best])
+        xs_p2 = (temp_x_p12[temp_start_p2], temp_x_p12[-1])
+        xs_p1 = (temp_x_p12[0], temp_x_p12[temp_start_p2 - 1])
+
     return xs_p2, xs_p1, highest_r2  # highest_r2 is returned for testing
 
 
-def extract_phase(xs, x_series, y_series, elut_ends, SA, load_time):
+def get_opt_phases(elut_ends_parsed, elut_cpms_log, min_pts=3, weights=None):
+    """Determine the boundaries of all 3 phases with the best combined fit.
+
+    Every split of the series into phase 1, 2 and 3 (in that order, each with
+        >= <min_pts> pts) is scored by the sum of the r2s of the 3 phases, as
+        they are extracted in Analysis.analyze. Phase 2 is fit to the data
+        curve-stripped of phase 3, and phase 1 to the data curve-stripped of
+        phase 3 and phase 2.
+    The search is staged: for each start of phase 3, the suffix sums of the
+        stripped data give phase 2 for every start of phase 2 at once, and
+        phase 1 is fit for all of those starts together. This takes O(n^3)
+        vectorized operations rather than O(n^2) separate regressions.
+
+    @type elut_ends_parsed: list[float]
+        elution end points with empty end points (paired with '' or 0) removed
+    @type elut_cpms_log: list[float]
+        elution radioativity corrected for G-factor, root weight, and logged
+    @type min_pts: int
+        minimum number of points in each phase
+    @type weights: None | ndarray
+        weight of each point in every regression. Default is unweighted.
+    @rtype: (float, float), (float, float), (float, float), float
+        boundaries of phase 3, 2 and 1, and their combined r2 (all empty and
+        0 if the series is too short to be split)
+    """
+    x = numpy.asarray(elut_ends_parsed, dtype=float)
+    y = numpy.asarray(elut_cpms_log, dtype=float)
+    xs_p3, xs_p2, xs_p1, highest_r2 = ('', ''), ('', ''), ('', ''), 0
+    if len(x) < 3 * min_pts:
+        return xs_p3, xs_p2, xs_p1, highest_r2
+
+    fits_p3 = suffix_regressions(x, y, weights)
+    weights_p12 = None
+    best_start_p3, best_start_p2 = None, None
+    for start_p3 in range(2 * min_pts, len(x) - min_pts + 1):
+        # Curve-strip phase 3 from phase 1 + 2 data, fit phase 2 as a suffix
+        x_p12 = x[:start_p3]
+        y_p12, kept_p12 = curvestrip_arrays(
+            x_p12, y[:start_p3], True,
+            fits_p3.slope[start_p3], fits_p3.intercept[start_p3])
+        if weights is not None:
+            weights_p12 = numpy.asarray(weights, dtype=float)[:start_p3]
+            kept_p12 = numpy.where(kept_p12, weights_p12, 0)
+        moments, origin = cumulative_moments(
+            x_p12, y_p12, weights=kept_p12, reverse=True)
+        fits_p2 = moments_regression(moments, origin)
+        starts_p2 = numpy.arange(min_pts, start_p3 - min_pts + 1)
+
+        # Curve-strip each possible phase 2 from the data that precedes it
+        #    (one row per start of phase 2) and fit phase 1 to each row
+        p1 = (kept_p12 > 0) & \
+            (numpy.arange(start_p3) < starts_p2[:, numpy.newaxis])
+        y_p1, kept_p1 = curvestrip_arrays(
+            x_p12, y_p12, p1,
+            fits_p2.slope[starts_p2], fits_p2.intercept[starts_p2])
+        fits_p1 = fit_line(
+            x_p12 * numpy.ones((len(starts_p2), 1)), y_p1, mask=kept_p1,
+            weights=weights_p12)
+
+        combined_r2s = fits_p3.r2[start_p3] + fits_p2.r2[starts_p2] + \
+            fits_p1.r2
+        enough_pts = (fits_p2.n[starts_p2] >= min_pts) & \
+            (fits_p1.n >= min_pts)
+        combined_r2s[~enough_pts | numpy.isnan(combined_r2s)] = 0
+        best = numpy.argmax(combined_r2s)  # First of any tied splits
+        if combined_r2s[best] > highest_r2:
+            highest_r2 = combined_r2s[best]
+            best_start_p3, best_start_p2 = start_p3, int(starts_p2[best])
+
+    if best_start_p3 is not None:
+        xs_p3 = (x[best_start_p3], x[-1])
+        xs_p2 = (x[best_start_p2], x[best_start_p3 - 1])
+        xs_p1 = (x[0], x[best_start_p2 - 1])
+    return xs_p3, xs_p2, xs_p1, highest_r2
+
+
+def extract_phase(xs, x_series, y_series, SA, load_time, weights=None):
     """Extract compartment analysis of phase parameters.
 
     Uses from regression analysis of a phase from CATE run efflux trace.
@@ -162,68 +321,58 @@ def extract_phase(xs, x_series, y_series, elut_ends, SA, load_time):
         x-series from which we are extracting data
     @type y_series: list[float]
         y-series from which we are extracting data
-    @type elut_ends: list[float]
-        x-series representing times elutions ENDED. No points removed yet.
     @type SA: float
         specific activity of loading solution in cpm/ml
     @type load_time: float
         Number of minutes plant was in radioactive solution prior to CATE
+    @type weights: None | list[float] | ndarray
+        regression weight of each point of <x_series>. Default is unweighted.
     @rtype: Phase
         Phase object used to store phase parameters
     """
     if len(x_series) < 2:  # Return empty phase
-        phase_xs = ('', '')
-        r2, slope, intercept = '', '', ''
-        xy1, xy2 = ('', ''), ('', '')
-        k, t05, r0, efflux = '', '', '', ''
-        return Objects.Phase(
-            phase_xs, xy1, xy2, r2, slope, intercept,
-            x_series, y_series, k, t05, r0, efflux)
+        return Objects.Phase.empty(x_series, y_series)
 
     x_start, x_end = xs
-    start_index = x_to_index(
-        x_value=x_start, boundary_type='start',
-        x_series=x_series, larger_x=elut_ends)
-    end_index = x_to_index(
-        x_value=x_end, boundary_type='end',
-        x_series=x_series, larger_x=elut_ends)
+    boundaries = Objects.BoundaryIndex(x_series)
+    start_index = boundaries.start(x_start)
+    end_index = boundaries.end(x_end)
     
     x_phase = x_series[start_index: end_index+1]
     y_phase = y_series[start_index: end_index+1]
 
-    if len(x_phase) > 1:
-        phase_xs = xs
-        r2, slope, intercept = linear_regression(x_phase, y_phase)  # y=mx+b
-        xy1, xy2 = grab_x_ys(x_phase, slope, intercept)
-        k = abs(slope) * 2.303
-        t05 = 0.693/k
-        r0 = 10 ** intercept
-        efflux = 60 * r0 / (SA * (1 - math.exp(-1 * k * load_time)))
-    else:  # Return empty phase
-        phase_xs = ('', '')
-        r2, slope, intercept = '', '', ''
-        xy1, xy2 = ('', ''), ('', '')
-        k, t05, r0, efflux = '', '', '', ''
-        
+    if weights is not None:
+        weights = weights[start_index: end_index+1]
+
+    if len(x_phase) < 2:  # Return empty phase
+        return Objects.Phase.empty(x_phase, y_phase)
+
+    r2, slope, intercept = linear_regression(
+        x_phase, y_phase, weights)  # y=mx+b
+    xy1, xy2 = grab_x_ys(x_phase, slope, intercept)
+    k = abs(slope) * 2.303
+    t05 = 0.693/k
+    r0 = 10 ** intercept
+    efflux = 60 * r0 / (SA * (1 - math.exp(-1 * k * load_time)))
     return Objects.Phase(
-        phase_xs, xy1, xy2, r2, slope, intercept,
+        xs, xy1, xy2, r2, slope, intercept,
         x_phase, y_phase, k, t05, r0, efflux)
 
 
-def x_to_index(x_value, boundary_type, x_series, larger_x):
+def x_to_index(x_value, boundary_type, x_series):
     """ Converts data point <x_value> in <x_series> to an index.
 
     Preconditions:
-    - <x_value> in in <larger_x>
-    - <x_series> is not an empty list
+    - <x_series> is sorted and not an empty list
 
     This function is necessary because we remove blank data points over the
         course of our analysis (e.g., elut_ends_parsed, etc.). Thus, indexs
         don't line up well across the data analysis and the x values of data
         points are instead used. This function converts these x values to 
         indexes that are relevant to the local data.
-    If <x_value> is not in <x_series>, x_to_index is recursively called on a 
-        proximal data point in <x_series>.
+    If <x_value> is not in <x_series>, the closest data point inside the
+        boundary is used (see BoundaryIndex). Runs keep a BoundaryIndex of
+        their series so repeated lookups don't need to call this.
 
     @type x_value: float
         x_value to be converted to index
@@ -231,20 +380,10 @@ def x_to_index(x_value, boundary_type, x_series, larger_x):
         whether <x_value> is the start or end of a boundary
     @type x_series: list[float]
         data series in which <x_value> is being converted to an index
-    @type larger_x: list[float]
-        data series which has no missing data
     @rtype: int
         index that <x_value> has been converted to
     """
-    while x_value not in x_series:
-        new_index = x_to_index(x_value, boundary_type, larger_x, larger_x)
-        if boundary_type == 'start':
-            x_value = larger_x[new_index + 1]
-        else:
-            x_value = larger_x[new_index - 1]
-    for index, item in enumerate(x_series):
-        if item == x_value:
-            return index
+    return Objects.BoundaryIndex(x_series).to_index(x_value, boundary_type)
 
 
 def advanced_run_calcs(analysis):
@@ -269,30 +408,207 @@ def advanced_run_calcs(analysis):
     analysis.poolsize = analysis.influx * analysis.phase3.t05 / (3 * 0.693)
 
 
-def linear_regression(x_series, y_series):
+def clear_run_calcs(analysis):
+    """Unset the calculations of advanced_run_calcs, which need a phase III.
+
+    @type analysis: Analysis
+    @rtype: None
+    """
+    analysis.elut_period, analysis.tracer_retained = None, None
+    analysis.netflux, analysis.influx = None, None
+    analysis.ratio, analysis.poolsize = None, None
+
+
+def linear_regression(x_series, y_series, weights=None):
     """Linear regression of <x_series> and <y_series>
 
     @type x_series: list[float]
         <x_series> we are using for linear regression
     @type y_series: list[float]
         <y_series> we are using for linear regression
+    @type weights: None | list[float] | ndarray
+        weight of each point. Default is unweighted.
     @rtype: float, float, float
         r^2, m (slope), and b (intercept) of y=mx+b
-    """    
-    coeffs = numpy.polyfit(x_series, y_series, 1)        
-    # Conversion to "convenience class" in numpy for working with polynomials        
-    p = numpy.poly1d(coeffs)         
-    # Determining R^2 on the current data set, fit values, and mean
-    yhat = p(x_series) # or [p(z) for z in x_series]
-    ybar = numpy.sum(y_series)/len(y_series)  # or sum(y_series)/len(y_series)
-    # Below can also be: sum([(yihat-ybar)**2 for yihat in yhat])
-    ssreg = numpy.sum((yhat-ybar)**2)
-    # Below can also be: or sum([ (yi - ybar)**2 for yi in y_series])
-    sstot = numpy.sum((y_series - ybar)**2) 
-    r2 = ssreg/sstot
-    slope = coeffs[0]
-    intercept = coeffs[1]    
-    return r2, slope, intercept
+    """
+    line = fit_line(x_series, y_series, weights=weights)
+    return line.r2, line.slope, line.intercept
+
+
+def regression_terms(x_series, y_series, weights=None, reverse=False):
+    """Per-point terms that are summed to fit lines by least squares.
+
+    Terms run along the last axis, so stacked series (one row per run) are
+        kept apart. Points with a weight of 0 are left out, and the others are
+        weighted by their relative weights.
+    Data are shifted to the first point kept (last with <reverse>), which
+        keeps sums over the points near that point accurate.
+
+    @type x_series: list[float] | ndarray
+        1-D series, or 2-D with one series per row
+    @type y_series: list[float] | ndarray
+        1-D series, or 2-D with one series per row
+    @type weights: None | ndarray
+        weight of each point, 0 to leave it out. Default weighs all points 1.
+    @type reverse: bool
+    @rtype: ndarray, (ndarray, ndarray)
+        (7, ...) array of each point's 1 (if kept), and weight w, wx, wy, wx^2,
+        wy^2 and wxy, and the (x, y) origin of each series they were taken
+        about
+    """
+    x = numpy.asarray(x_series, dtype=float)
+    y = numpy.asarray(y_series, dtype=float)
+    if weights is None:
+        weights = numpy.ones(y.shape)
+    x, y, weights = numpy.broadcast_arrays(
+        x, y, numpy.asarray(weights, dtype=float))
+    valid = weights > 0
+    # Index of the first (or last) point kept in each series
+    if reverse:
+        anchor = valid.shape[-1] - 1 - numpy.argmax(valid[..., ::-1], axis=-1)
+    else:
+        anchor = numpy.argmax(valid, axis=-1)
+    if y.ndim == 1:
+        origin = (x[anchor: anchor + 1], y[anchor: anchor + 1])
+    else:
+        rows = numpy.arange(len(y))
+        origin = (x[rows, anchor][:, numpy.newaxis],
+                  y[rows, anchor][:, numpy.newaxis])
+    x = numpy.where(valid, x - origin[0], 0)
+    y = numpy.where(valid, y - origin[1], 0)
+    terms = numpy.array([
+        valid, weights, weights * x, weights * y,
+        weights * x * x, weights * y * y, weights * x * y])
+    return terms, origin
+
+
+def cumulative_moments(x_series, y_series, weights=None, reverse=False):
+    """Running sums needed to regress many contiguous windows of a series.
+
+    With <reverse> the sums run from the end of the series, so entry i holds
+        the sums of the suffix starting at i. See regression_terms.
+
+    @type x_series: list[float] | ndarray
+        1-D series, or 2-D with one series per row
+    @type y_series: list[float] | ndarray
+        1-D series, or 2-D with one series per row
+    @type weights: None | ndarray
+        weight of each point, 0 to leave it out. Default weighs all points 1.
+    @type reverse: bool
+    @rtype: ndarray, (ndarray, ndarray)
+        (7, ...) array of running n, sum(w), sum(wx), sum(wy), sum(wx^2),
+        sum(wy^2) and sum(wxy), and the (x, y) origin of each series they were
+        taken about
+    """
+    terms, origin = regression_terms(x_series, y_series, weights, reverse)
+    if reverse:
+        moments = numpy.cumsum(terms[..., ::-1], axis=-1)[..., ::-1]
+    else:
+        moments = numpy.cumsum(terms, axis=-1)
+    return moments, origin
+
+
+def moments_regression(moments, origin):
+    """Closed-form linear regression of every window summarized in <moments>.
+
+    Windows with < 2 points or no spread in x or y give nan, as polyfit would.
+    Standard errors need > 2 points, and treat weights as relative (i.e. the
+        variance of the residuals is estimated from the fit).
+
+    @type moments: ndarray
+        (7, ...) array of n, sum(w), sum(wx), sum(wy), sum(wx^2), sum(wy^2)
+        and sum(wxy)
+    @type origin: (float, float) | (ndarray, ndarray)
+        (x, y) point the sums in <moments> were taken about
+    @rtype: Regression
+        fit of each window
+    """
+    n, sw, sx, sy, sxx, syy, sxy = moments
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        x_mean, y_mean = sx / sw, sy / sw
+        ss_x = sxx - sx * x_mean
+        ss_y = syy - sy * y_mean
+        ss_xy = sxy - sx * y_mean
+        slope = ss_xy / ss_x
+        r2 = ss_xy * ss_xy / (ss_x * ss_y)
+        x_mean = x_mean + origin[0]
+        intercept = y_mean + origin[1] - slope * x_mean
+        ss_resid = numpy.maximum(ss_y - slope * ss_xy, 0)
+        variance = ss_resid / (n - 2)
+        slope_se = numpy.sqrt(variance / ss_x)
+        intercept_se = numpy.sqrt(variance * (1 / sw + x_mean * x_mean / ss_x))
+    return Objects.Regression(
+        n, slope, intercept, r2, slope_se, intercept_se, ss_resid)
+
+
+def fit_line(x_series, y_series, mask=None, weights=None):
+    """Closed-form linear regression of a series, or of each stacked series.
+
+    @type x_series: list[float] | ndarray
+        1-D series, or 2-D with one series per row
+    @type y_series: list[float] | ndarray
+        1-D series, or 2-D with one series per row
+    @type mask: None | ndarray
+        True for points included in the fit. Default includes all points.
+    @type weights: None | ndarray
+        weight of each point. Default is unweighted.
+    @rtype: Regression
+        fit of the series (floats), or of each series (arrays)
+    """
+    if weights is not None:
+        if mask is not None:
+            weights = numpy.where(mask, weights, 0)
+        mask = weights
+    if mask is not None:
+        terms, origin = regression_terms(x_series, y_series, weights=mask)
+        return moments_regression(
+            terms.sum(axis=-1), (origin[0][..., 0], origin[1][..., 0]))
+    # Every point is used, so sums can be taken directly about the 1st point
+    x = numpy.asarray(x_series, dtype=float)
+    y = numpy.asarray(y_series, dtype=float)
+    origin = (x[..., 0], y[..., 0])
+    x = x - origin[0][..., numpy.newaxis]
+    y = y - origin[1][..., numpy.newaxis]
+    n = numpy.ones(x.shape[:-1]) * x.shape[-1]
+    moments = numpy.array([
+        n, n, x.sum(axis=-1), y.sum(axis=-1), (x * x).sum(axis=-1),
+        (y * y).sum(axis=-1), (x * y).sum(axis=-1)])
+    return moments_regression(moments, origin)
+
+
+def prefix_regressions(x_series, y_series, weights=None):
+    """Linear regression of every prefix of <x_series> and <y_series>.
+
+    Done in a single pass over running sums instead of a fit per prefix.
+
+    @type x_series: list[float] | ndarray
+    @type y_series: list[float] | ndarray
+    @type weights: None | list[float] | ndarray
+        weight of each point. Default is unweighted.
+    @rtype: Regression
+        fits where entry i regresses points 0 to i (the single point prefix
+        at the start is nan)
+    """
+    moments, origin = cumulative_moments(x_series, y_series, weights)
+    return moments_regression(moments, origin)
+
+
+def suffix_regressions(x_series, y_series, weights=None):
+    """Linear regression of every suffix of <x_series> and <y_series>.
+
+    Done in a single pass over running sums instead of a fit per suffix.
+
+    @type x_series: list[float] | ndarray
+    @type y_series: list[float] | ndarray
+    @type weights: None | list[float] | ndarray
+        weight of each point. Default is unweighted.
+    @rtype: Regression
+        fits where entry i regresses points i onwards (the single point
+        suffix at the end is nan)
+    """
+    moments, origin = cumulative_moments(
+        x_series, y_series, weights, reverse=True)
+    return moments_regression(moments, origin)
 
 
 def curvestrip(x_series, y_series, slope, intercept):
@@ -327,9 +643,681 @@ def curvestrip(x_series, y_series, slope, intercept):
         antilog_orig = 10 ** item
         antilog_reg = 10 ** extrapolated_raw[index]
         curvestrip_x_raw = antilog_orig - antilog_reg
-        if curvestrip_x_raw > 0:  # We can perform a log operation
+        # We can perform a log operation
+        if curvestrip_x_raw > STRIP_TOLERANCE * antilog_orig:
             y_curvestrip.append(math.log10(curvestrip_x_raw))
             x_curvestrip.append(x_series[index])
         else: # No log operation possible. Data omitted from series
             pass
     return x_curvestrip, y_curvestrip
+
+
+def curvestrip_arrays(x_series, y_series, series, slope, intercept):
+    """Array version of curvestrip that marks omitted data instead.
+
+    Points that can not be logged after curve-stripping (nothing is left of
+        them but rounding error, see STRIP_TOLERANCE) are nan in the
+        returned series and False in the returned mask, so both stay aligned
+        with <x_series>. Stacked series (one row per run) are done at once if
+        <slope> and <intercept> have one entry per row.
+
+    @type x_series: list[float] | ndarray
+        <x_series> we are using for for curve-stripping
+    @type y_series: list[float] | ndarray
+        <y_series> we are using for curve-stripping
+    @type series: bool | ndarray
+        True for the points of <y_series> that are to be curve-stripped
+    @type slope: float | ndarray
+        slope of the immediately later, more slowly-exchanging phase
+    @type intercept: float | ndarray
+        intercept of the immediately later, more slowly-exchanging phase
+    @rtype: ndarray, ndarray
+        curve-stripped y-series, and True for the points that were kept
+    """
+    x = numpy.asarray(x_series, dtype=float)
+    y = numpy.asarray(y_series, dtype=float)
+    slope = numpy.asarray(slope, dtype=float)[..., numpy.newaxis]
+    intercept = numpy.asarray(intercept, dtype=float)[..., numpy.newaxis]
+    with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        # Antilog extrapolated later phase and original data, subtract them
+        efflux = 10 ** y
+        stripped = efflux - 10 ** ((slope * x) + intercept)
+        # We can perform a log operation
+        kept = series & (stripped > STRIP_TOLERANCE * efflux)
+        y_curvestrip = numpy.where(kept, numpy.log10(stripped), numpy.nan)
+    return y_curvestrip, kept
+
+
+def stack_runs(runs):
+    """Stack the parsed series of <runs> into 2-D arrays, one row per run.
+
+    Rows are left-aligned and padded with nan, so column i of a row is the
+        i-th point of that run's elut_ends_parsed/elut_cpms_log.
+
+    @type runs: list[Run]
+    @rtype: ndarray, ndarray, ndarray, ndarray
+        elut_ends (padded), elut_ends_parsed, elut_cpms_log, and the number of
+        parsed points in each row
+    """
+    width = max(len(run.elut_ends) for run in runs)
+    elut_ends = numpy.empty((len(runs), width))
+    x, y = numpy.empty((len(runs), width)), numpy.empty((len(runs), width))
+    elut_ends.fill(numpy.nan)
+    x.fill(numpy.nan)
+    y.fill(numpy.nan)
+    counts = numpy.zeros(len(runs), dtype=int)
+    for row, run in enumerate(runs):
+        counts[row] = len(run.elut_ends_parsed)
+        elut_ends[row, :len(run.elut_ends)] = run.elut_ends
+        x[row, :counts[row]] = run.elut_ends_parsed
+        y[row, :counts[row]] = run.elut_cpms_log
+    return elut_ends, x, y, counts
+
+
+def batch_obj_phase3(obj_num_pts, x, y, counts, weights=None):
+    """get_obj_phase3 for every row of stacked series at once.
+
+    @type obj_num_pts: int
+        number of points used to start objective regression of every row
+    @type x: ndarray
+        stacked elut_ends_parsed (see stack_runs)
+    @type y: ndarray
+        stacked elut_cpms_log (see stack_runs)
+    @type counts: ndarray
+        number of points in each row
+    @type weights: None | ndarray
+        stacked regression weights. Default is unweighted.
+    @rtype: ndarray, ndarray, ndarray, ndarray
+        index at which phase 3 starts in each row, and r^2s, slopes, and
+        intercepts of every suffix of each row
+    """
+    cols = numpy.arange(x.shape[1])
+    valid = cols < counts[:, numpy.newaxis]
+    if weights is not None:
+        valid = numpy.where(valid, weights, 0)
+    moments, origin = cumulative_moments(x, y, weights=valid, reverse=True)
+    suffixes = moments_regression(moments, origin)
+    r2s, ms, bs = suffixes.r2, suffixes.slope, suffixes.intercept
+
+    # Scanning down from obj_num_pts from the end, phase 3 starts 2 pts after
+    # the first index where r2 has dropped three times in a row
+    with numpy.errstate(invalid='ignore'):
+        drops = numpy.zeros(x.shape, dtype=bool)
+        drops[:, 1:] = r2s[:, :-1] < r2s[:, 1:]
+    triples = numpy.zeros(x.shape, dtype=bool)
+    triples[:, :-2] = drops[:, :-2] & drops[:, 1:-1] & drops[:, 2:]
+    tops = counts - obj_num_pts
+    triples &= (cols >= 2) & (cols <= tops[:, numpy.newaxis] - 2)
+    last_triple = x.shape[1] - 1 - numpy.argmax(triples[:, ::-1], axis=1)
+    scan_ends = numpy.where(
+        triples.any(axis=1), last_triple, numpy.where(tops >= 2, 2, 0))
+    return scan_ends + 2, r2s, ms, bs
+
+
+def batch_obj_phase12(starts_p3, x, y, weights=None):
+    """get_obj_phase12 for every row of stacked series at once.
+
+    @type starts_p3: ndarray
+        index at which phase 3 starts in each row (see batch_obj_phase3)
+    @type x: ndarray
+        stacked elut_ends_parsed (see stack_runs)
+    @type y: ndarray
+        stacked elut_cpms_log (see stack_runs)
+    @type weights: None | ndarray
+        stacked regression weights. Default is unweighted.
+    @rtype: ndarray, ndarray
+        index at which phase 2 starts in each row (-1 if no split was found),
+        and the combined r2 of that split
+    """
+    cols = numpy.arange(x.shape[1])
+    p12 = cols < starts_p3[:, numpy.newaxis]
+    if weights is not None:
+        p12 = numpy.where(p12, weights, 0)
+    # Phase 1 ending right before column i vs. phase 2 starting at column i
+    moments, origin = cumulative_moments(x, y, weights=p12)
+    r2s_p1 = numpy.empty(x.shape)
+    r2s_p1[:, 0] = numpy.nan
+    r2s_p1[:, 1:] = moments_regression(moments, origin).r2[:, :-1]
+    moments, origin = cumulative_moments(x, y, weights=p12, reverse=True)
+    r2s_p2 = moments_regression(moments, origin).r2
+
+    # Both phases need >= 2 pts
+    splits = (cols >= 2) & (cols <= starts_p3[:, numpy.newaxis] - 2)
+    combined_r2s = numpy.where(splits, r2s_p1 + r2s_p2, 0)
+    combined_r2s[numpy.isnan(combined_r2s)] = 0
+    rows = numpy.arange(len(x))
+    best = numpy.argmax(combined_r2s, axis=1)  # First of any tied splits
+    highest_r2s = combined_r2s[rows, best]
+    starts_p2 = numpy.where(highest_r2s > 0, best, -1)
+    return starts_p2, highest_r2s
+
+
+def xs_to_arrays(xs_list):
+    """Convert phase boundaries of many analyses to arrays.
+
+    @type xs_list: list[('', '') | (float, float)]
+    @rtype: ndarray, ndarray
+        starts and ends of each phase (nan if the phase is not defined)
+    """
+    starts = numpy.array(
+        [numpy.nan if xs[0] == '' else xs[0] for xs in xs_list], dtype=float)
+    ends = numpy.array(
+        [numpy.nan if xs[1] == '' else xs[1] for xs in xs_list], dtype=float)
+    return starts, ends
+
+
+def batch_phase_params(
+        starts, ends, x, y, series, SA, load_time, weights=None):
+    """Fit the phase between <starts> and <ends> of every row of stacked series.
+
+    @type starts: ndarray
+        start of the phase in each row (nan if the phase is empty)
+    @type ends: ndarray
+        end of the phase in each row (nan if the phase is empty)
+    @type x: ndarray
+        stacked x-series (see stack_runs)
+    @type y: ndarray
+        stacked y-series, possibly curve-stripped
+    @type series: ndarray
+        True for points that are part of the series of their row (i.e. not
+        padding or holes from curve-stripping)
+    @type SA: float | ndarray
+        specific activity of loading solution in cpm/ml of each row
+    @type load_time: float | ndarray
+        Number of minutes plant was in radioactive solution of each row
+    @type weights: None | ndarray
+        stacked regression weights. Default is unweighted.
+    @rtype: ndarray, ndarray, ndarray, [ndarray]
+        True for the points in the phase of each row, whether each row's phase
+        could be fit, r^2 of each row, and slopes, intercepts, k, t05, r0 and
+        efflux of each row (nan where the phase is empty)
+    """
+    tolerance = Objects.BoundaryIndex.tolerance
+    with numpy.errstate(invalid='ignore'):
+        window = series & (x >= starts[:, numpy.newaxis] - tolerance) & \
+            (x <= ends[:, numpy.newaxis] + tolerance)
+    fitted = (series.sum(axis=1) > 1) & (window.sum(axis=1) > 1)
+
+    line = fit_line(x, y, mask=window, weights=weights)
+    r2, slope, intercept = line.r2, line.slope, line.intercept
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        k = numpy.abs(slope) * 2.303
+        t05 = 0.693 / k
+        r0 = 10 ** intercept
+        efflux = 60 * r0 / (SA * (1 - numpy.exp(-1 * k * load_time)))
+    params = [slope, intercept, k, t05, r0, efflux]
+    for param in params:
+        param[~fitted] = numpy.nan
+    return window, fitted, r2, params
+
+
+def batch_extract_phases(xs_list, x, y, series, SA, load_time, weights=None):
+    """extract_phase for every row of stacked series at once.
+
+    @type xs_list: list[('', '') | (float, float)]
+        boundaries of the phase in each row
+    @type x: ndarray
+        stacked x-series (see stack_runs)
+    @type y: ndarray
+        stacked y-series, possibly curve-stripped
+    @type series: ndarray
+        True for points that are part of the series of their row (i.e. not
+        padding or holes from curve-stripping)
+    @type SA: ndarray
+        specific activity of loading solution in cpm/ml of each row
+    @type load_time: ndarray
+        Number of minutes plant was in radioactive solution of each row
+    @type weights: None | ndarray
+        stacked regression weights. Default is unweighted.
+    @rtype: list[Phase], (ndarray, ndarray, ndarray, ndarray, ndarray, ndarray)
+        Phase object of each row, and slopes, intercepts, k, t05, r0 and efflux
+        of each row as arrays (nan where the phase is empty)
+    """
+    starts, ends = xs_to_arrays(xs_list)
+    window, fitted, r2, params = batch_phase_params(
+        starts, ends, x, y, series, SA, load_time, weights)
+    slope, intercept, k, t05, r0, efflux = params
+    series_sizes = series.sum(axis=1)
+
+    phases = []
+    for row, phase_xs in enumerate(xs_list):
+        if series_sizes[row] < 2:
+            keep = series[row]
+        else:
+            keep = window[row]
+        x_phase, y_phase = x[row, keep].tolist(), y[row, keep].tolist()
+        if fitted[row]:
+            xy1, xy2 = grab_x_ys(x_phase, slope[row], intercept[row])
+            phases.append(Objects.Phase(
+                phase_xs, xy1, xy2, r2[row], slope[row], intercept[row],
+                x_phase, y_phase, k[row], t05[row], r0[row], efflux[row]))
+        else:  # Empty phase
+            phases.append(Objects.Phase.empty(x_phase, y_phase))
+    return phases, params
+
+
+def batch_advanced_run_calcs(runs, k, t05, r0, efflux):
+    """advanced_run_calcs for many runs at once.
+
+    @type runs: list[Run]
+    @type k: ndarray
+        Rate constant of phase 3 of each run
+    @type t05: ndarray
+        Half-life of exchange of phase 3 of each run
+    @type r0: ndarray
+        Rate of radioisotope release from phase 3 at time = 0 of each run
+    @type efflux: ndarray
+        Efflux from phase 3 of each run
+    @rtype: (ndarray, ndarray, ndarray, ndarray, ndarray, ndarray)
+        elut_period, tracer_retained, netflux, influx, ratio, and poolsize
+        of each run
+    """
+    elut_period = numpy.array([run.elut_ends[-1] for run in runs], dtype=float)
+    SA = numpy.array([run.SA for run in runs], dtype=float)
+    rt_cnts = numpy.array([run.rt_cnts for run in runs], dtype=float)
+    sht_cnts = numpy.array([run.sht_cnts for run in runs], dtype=float)
+    rt_wght = numpy.array([run.rt_wght for run in runs], dtype=float)
+    load_time = numpy.array([run.load_time for run in runs], dtype=float)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        tracer_retained = (sht_cnts + rt_cnts) / rt_wght
+        netflux = 60 * (
+            tracer_retained - (r0 / k) * numpy.exp(-1 * k * elut_period)) \
+            / SA / load_time
+        influx = efflux + netflux
+        ratio = efflux / influx
+        poolsize = influx * t05 / (3 * 0.693)
+    return elut_period, tracer_retained, netflux, influx, ratio, poolsize
+
+
+def batch_strip_phases(x, y, series, xs_p3, xs_p2, xs_p1, SA, load_time):
+    """Extract phase 3, 2 and 1 of every row of stacked series that all share
+        the same phase boundaries.
+
+    Phases are curve-stripped from each other as in Analysis.analyze. Phase 1
+        is taken from the curve-stripped data by its boundaries.
+
+    @type x: ndarray
+        stacked x-series (see stack_runs)
+    @type y: ndarray
+        stacked y-series
+    @type series: ndarray
+        True for points that are part of the series of their row
+    @type xs_p3: ('', '') | (float, float)
+    @type xs_p2: ('', '') | (float, float)
+    @type xs_p1: ('', '') | (float, float)
+    @type SA: float
+    @type load_time: float
+    @rtype: list[(ndarray, ndarray, [ndarray])]
+        True for the points in the phase, y-series the phase was fit to,
+        and params (see batch_phase_params) of phase 3, 2 and 1 of each row.
+        Phases after an empty phase are left out.
+    """
+    tolerance = Objects.BoundaryIndex.tolerance
+    phases = []
+    for xs in [xs_p3, xs_p2, xs_p1]:
+        if xs == ('', ''):
+            break
+        if phases:  # Curve-strip the previous phase from the data up to xs
+            params = phases[-1][2]
+            y, series = curvestrip_arrays(
+                x, y, series & (x <= xs[1] + tolerance), params[0], params[1])
+        starts = numpy.array([xs[0]], dtype=float)
+        ends = numpy.array([xs[1]], dtype=float)
+        window, fitted, r2, params = batch_phase_params(
+            starts, ends, x, y, series, SA, load_time)
+        phases.append((window, y, params))
+    return phases
+
+
+def bootstrap_run(run, xs_p3, xs_p2, xs_p1, num_resamples, seed):
+    """Bootstrap the phase and flux parameters of a run by resampling residuals.
+
+    The residuals of each phase's regression are resampled (with replacement)
+        and added back to its line. The sum of the antilogs of the lines of
+        the later phases are added to this to rebuild each resample of the
+        run, which is then curve-stripped and fit again. All resamples are
+        stacked and fit at once.
+
+    @type run: Run
+    @type xs_p3: ('', '') | (float, float)
+    @type xs_p2: ('', '') | (float, float)
+    @type xs_p1: ('', '') | (float, float)
+    @type num_resamples: int
+    @type seed: int
+        seed of the random number generator, so resamples can be reproduced
+    @rtype: dict[str, ndarray]
+        parameter (e.g. 'k_p3' or 'influx') -> value of it in each resample
+        (nan where it couldn't be calculated)
+    """
+    x = numpy.asarray([run.elut_ends_parsed], dtype=float)
+    y = numpy.asarray([run.elut_cpms_log], dtype=float)
+    series = numpy.ones(x.shape, dtype=bool)
+    random = numpy.random.RandomState(seed)
+
+    # Rebuild the run from its fitted phases plus resampled residuals
+    x_resamples = numpy.repeat(x, num_resamples, axis=0)
+    y_resamples = numpy.repeat(y, num_resamples, axis=0)
+    later_phases = numpy.zeros(x.shape)  # Antilog of lines of later phases
+    for window, y_series, params in batch_strip_phases(
+            x, y, series, xs_p3, xs_p2, xs_p1, run.SA, run.load_time):
+        line = params[0][:, numpy.newaxis] * x + params[1][:, numpy.newaxis]
+        if numpy.isnan(line).any():
+            break
+        residuals = (y_series - line)[window]
+        resampled = residuals[random.randint(
+            len(residuals), size=(num_resamples, len(residuals)))]
+        y_resamples[:, window[0]] = numpy.log10(
+            10 ** (line[window] + resampled) + later_phases[window])
+        later_phases += 10 ** line
+
+    phases = batch_strip_phases(
+        x_resamples, y_resamples, numpy.ones(x_resamples.shape, dtype=bool),
+        xs_p3, xs_p2, xs_p1, run.SA, run.load_time)
+    return phase_samples(run, phases)
+
+
+def phase_samples(run, phases):
+    """Parameters of each row of phases extracted by batch_strip_phases.
+
+    @type run: Run
+        run every row of the phases was extracted from
+    @type phases: list[(ndarray, ndarray, [ndarray])]
+        phases of each row (see batch_strip_phases)
+    @rtype: dict[str, ndarray]
+        parameter (e.g. 'k_p3' or 'influx') -> value of it in each row
+        (nan where it couldn't be calculated)
+    """
+    samples = {}
+    for phase_num, (window, y_series, params) in zip(['3', '2', '1'], phases):
+        slope, intercept, k, t05, r0, efflux = params
+        samples['k_p' + phase_num] = k
+        samples['t05_p' + phase_num] = t05
+        samples['r0_p' + phase_num] = r0
+        samples['efflux_p' + phase_num] = efflux
+        if phase_num == '3':
+            elut_period, tracer_retained, samples['netflux'], \
+                samples['influx'], samples['ratio'], samples['poolsize'] = \
+                batch_advanced_run_calcs([run], k, t05, r0, efflux)
+    return samples
+
+
+def simulate_counts(run, xs_p3, xs_p2, xs_p1, num_draws, seed, count_time=1):
+    """Propagate counting noise in the raw cpms of a run to its parameters.
+
+    Counts are Poisson distributed, so <num_draws> count vectors are drawn
+        around the measured counts (cpm * <count_time>) and the whole analysis
+        (basic calculations, curve-stripping, phase extraction and flux
+        calculations) is done on all of them at once, one row per draw.
+
+    @type run: Run
+    @type xs_p3: ('', '') | (float, float)
+    @type xs_p2: ('', '') | (float, float)
+    @type xs_p1: ('', '') | (float, float)
+    @type num_draws: int
+    @type seed: int
+        seed of the random number generator, so draws can be reproduced
+    @type count_time: float
+        minutes each eluate was counted for
+    @rtype: dict[str, ndarray]
+        parameter (e.g. 'k_p3' or 'influx') -> value of it in each draw
+        (nan where it couldn't be calculated)
+    """
+    random = numpy.random.RandomState(seed)
+    counts = numpy.maximum(numpy.asarray(run.elut_cpms, dtype=float), 0) * \
+        count_time
+    cpms = random.poisson(counts, size=(num_draws, len(counts))) / \
+        float(count_time)
+    elut_cpms_gfact, elut_cpms_gRFW, elut_cpms_log, parsed = \
+        basic_run_arrays(
+            run.rt_wght, run.gfact, run.elut_starts, run.elut_ends, cpms)
+    x = numpy.repeat(
+        numpy.asarray([run.elut_ends], dtype=float), num_draws, axis=0)
+    phases = batch_strip_phases(
+        x, elut_cpms_log, parsed, xs_p3, xs_p2, xs_p1, run.SA, run.load_time)
+    return phase_samples(run, phases)
+
+
+def sample_spreads(samples):
+    """Standard deviation of each parameter in <samples>.
+
+    @type samples: dict[str, ndarray]
+        parameter -> value of it in each sample (see simulate_counts)
+    @rtype: dict[str, '' | float]
+        parameter -> standard deviation, empty if < 2 samples gave a value
+        for the parameter
+    """
+    spreads = {}
+    for name, values in samples.items():
+        values = values[~numpy.isnan(values)]
+        if len(values) < 2:
+            spreads[name] = ''
+        else:
+            spreads[name] = values.std(ddof=1)
+    return spreads
+
+
+def bootstrap_task(task):
+    """bootstrap_run for a tuple of its arguments, to be mapped over a Pool.
+
+    @type task: (Run, (float, float), (float, float), (float, float), int, int)
+    @rtype: dict[str, ndarray]
+    """
+    return bootstrap_run(*task)
+
+
+def percentile_intervals(samples, confidence):
+    """Percentile interval of each parameter in <samples>.
+
+    @type samples: dict[str, ndarray]
+        parameter -> value of it in each resample (see bootstrap_run)
+    @type confidence: float
+        percent of the resamples the interval covers (e.g. 95)
+    @rtype: dict[str, ('', '') | (float, float)]
+        parameter -> (lower, upper) limits of interval, empty if no resample
+        gave a value for the parameter
+    """
+    tail = (100 - confidence) / 2.0
+    intervals = {}
+    for name, values in samples.items():
+        values = values[~numpy.isnan(values)]
+        if len(values) == 0:
+            intervals[name] = ('', '')
+        else:
+            lower, upper = numpy.percentile(values, [tail, 100 - tail])
+            intervals[name] = (lower, upper)
+    return intervals
+
+
+def exponential_model(x, slopes, intercepts):
+    """Log of the sum of the exponential phases of each stacked series.
+
+    Each phase is a line in log space, so the efflux of a run is
+        sum(10 ** (slope * x + intercept)) over its phases.
+
+    @type x: ndarray
+        stacked x-series (see stack_runs)
+    @type slopes: ndarray
+        slope of each phase (columns) of each series (rows)
+    @type intercepts: ndarray
+        intercept of each phase (columns) of each series (rows)
+    @rtype: ndarray, ndarray
+        log of modelled efflux of each point, and the share of it from each
+        phase, with phases along axis 1
+    """
+    logs = slopes[:, :, numpy.newaxis] * x[:, numpy.newaxis, :] + \
+        intercepts[:, :, numpy.newaxis]
+    with numpy.errstate(invalid='ignore', over='ignore'):
+        highest = logs.max(axis=1)  # Factored out to avoid overflow
+        terms = 10 ** (logs - highest[:, numpy.newaxis, :])
+        totals = terms.sum(axis=1)
+        return numpy.log10(totals) + highest, \
+            terms / totals[:, numpy.newaxis, :]
+
+
+def fit_exponentials(
+        x, y, window, slopes, intercepts, max_iter=100, weights=None):
+    """Fit the sum of exponential phases to each stacked series at once.
+
+    Levenberg-Marquardt least squares of log efflux, starting from <slopes>
+        and <intercepts> (e.g. from curve-stripping). The Jacobian is
+        analytic: d(model)/d(intercept) of a phase is its share of the efflux
+        at each point, and d(model)/d(slope) is that share times x. With
+        <weights> each residual and its row of the Jacobian are scaled by the
+        square root of the weight of its point.
+
+    @type x: ndarray
+        stacked x-series (see stack_runs)
+    @type y: ndarray
+        stacked log efflux
+    @type window: ndarray
+        True for the points of each series that are fit
+    @type slopes: ndarray
+        starting slope of each phase (columns) of each series (rows)
+    @type intercepts: ndarray
+        starting intercept of each phase (columns) of each series (rows)
+    @type max_iter: int
+    @type weights: None | ndarray
+        weight of each point of each series. Default is unweighted.
+    @rtype: ndarray, ndarray
+        fitted slopes and intercepts, arranged like <slopes> and <intercepts>
+    """
+    num_phases = slopes.shape[1]
+    params = numpy.concatenate([slopes, intercepts], axis=1).astype(float)
+    # Square roots of the weights, so the squared residuals are weighted
+    if weights is None:
+        roots = numpy.ones(x.shape)
+    else:
+        roots = numpy.sqrt(numpy.where(window, weights, 0))
+
+    def residuals(params):
+        model, shares = exponential_model(
+            x, params[:, :num_phases], params[:, num_phases:])
+        resids = numpy.where(window, model - y, 0) * roots
+        jacobian = numpy.where(
+            window[:, numpy.newaxis, :],
+            numpy.concatenate([shares * x[:, numpy.newaxis, :], shares], axis=1),
+            0) * roots[:, numpy.newaxis, :]
+        return resids, jacobian, (resids * resids).sum(axis=1)
+
+    resids, jacobian, costs = residuals(params)
+    damping = numpy.full(len(params), 1e-3)
+    identity = numpy.eye(2 * num_phases)
+    active = numpy.ones(len(params), dtype=bool)  # Series still being fit
+    for iteration in range(max_iter):
+        jtj = numpy.einsum('rin,rjn->rij', jacobian, jacobian)
+        jtr = numpy.einsum('rin,rn->ri', jacobian, resids)
+        scale = jtj * identity + 1e-12 * identity
+        systems = jtj + damping[:, numpy.newaxis, numpy.newaxis] * scale
+        try:
+            steps = numpy.linalg.solve(systems, -jtr)
+        except numpy.linalg.LinAlgError:
+            # Phases of a point or two give singular systems once damped less
+            steps = numpy.array([
+                numpy.linalg.lstsq(system, -gradient, rcond=-1)[0]
+                for system, gradient in zip(systems, jtr)])
+        trial_resids, trial_jacobian, trial_costs = residuals(params + steps)
+        better = active & (trial_costs < costs)
+        worse = active & ~better
+        params[better] += steps[better]
+        resids[better] = trial_resids[better]
+        jacobian[better] = trial_jacobian[better]
+        active &= numpy.abs(costs - trial_costs) > 1e-12 * (costs + 1e-12)
+        costs[better] = trial_costs[better]
+        damping[better] /= 10
+        damping[worse] *= 10
+        active &= damping < 1e10
+        if not active.any():
+            break
+    return params[:, :num_phases], params[:, num_phases:]
+
+
+def batch_nonlinear_phases(analyses):
+    """Refit the phases of <analyses> as a sum of exponentials.
+
+    Analyses with all 3 phases extracted by curve-stripping are fit together
+        (see fit_exponentials). Each phase is then set to its fitted line,
+        with the data curve-stripped of the other 2 fitted phases as its
+        series, and later calculations are redone. Points of weighted
+        analyses are weighted by Run.poisson_weights in the fit and the r2s.
+
+    @type analyses: list[Analysis]
+    @rtype: None
+    """
+    analyses = [
+        analysis for analysis in analyses if
+        ('', '') not in (analysis.xs_p3, analysis.xs_p2, analysis.xs_p1) and
+        not (analysis.phase3.is_empty or analysis.phase2.is_empty or
+             analysis.phase1.is_empty)]
+    if not analyses:
+        return
+    runs = [analysis.run for analysis in analyses]
+    elut_ends, x, y, counts = stack_runs(runs)
+    cols = numpy.arange(x.shape[1])
+    starts = numpy.array([analysis.xs_p1[0] for analysis in analyses])
+    ends = numpy.array([analysis.xs_p3[1] for analysis in analyses])
+    tolerance = Objects.BoundaryIndex.tolerance
+    with numpy.errstate(invalid='ignore'):
+        window = (cols < counts[:, numpy.newaxis]) & \
+            (x >= starts[:, numpy.newaxis] - tolerance) & \
+            (x <= ends[:, numpy.newaxis] + tolerance)
+    slopes = numpy.array([
+        [analysis.phase3.slope, analysis.phase2.slope, analysis.phase1.slope]
+        for analysis in analyses])
+    intercepts = numpy.array([
+        [analysis.phase3.intercept, analysis.phase2.intercept,
+         analysis.phase1.intercept] for analysis in analyses])
+    weights = None
+    if any(analysis.weighted for analysis in analyses):
+        weights = numpy.ones(x.shape)
+        for row, analysis in enumerate(analyses):
+            if analysis.weighted:
+                weights[row, :counts[row]] = analysis.run.poisson_weights
+    slopes, intercepts = fit_exponentials(
+        x, y, window, slopes, intercepts, weights=weights)
+
+    with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        lines = slopes[:, :, numpy.newaxis] * x[:, numpy.newaxis, :] + \
+            intercepts[:, :, numpy.newaxis]
+        efflux = 10 ** y
+        antilogs = 10 ** lines
+    for row, analysis in enumerate(analyses):
+        phases = []
+        for index, phase in enumerate(
+                [analysis.phase3, analysis.phase2, analysis.phase1]):
+            # Curve-strip the other fitted phases from the data of this phase
+            others = antilogs[row].sum(axis=0) - antilogs[row, index]
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                stripped = numpy.log10(efflux[row] - others)
+                keep = window[row] & ~numpy.isnan(stripped) & \
+                    (x[row] >= phase.xs[0] - tolerance) & \
+                    (x[row] <= phase.xs[1] + tolerance)
+            x_phase = x[row, keep].tolist()
+            y_phase = stripped[keep].tolist()
+            if len(x_phase) < 2:  # Return empty phase, as extract_phase
+                phases.append(Objects.Phase.empty(x_phase, y_phase))
+                continue
+            slope, intercept = slopes[row, index], intercepts[row, index]
+            if weights is None:
+                point_weights = numpy.ones(len(x_phase))
+            else:
+                point_weights = weights[row, keep]
+            resids = stripped[keep] - lines[row, index, keep]
+            deviations = stripped[keep] - numpy.average(
+                stripped[keep], weights=point_weights)
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                r2 = 1 - (point_weights * resids * resids).sum() / \
+                    (point_weights * deviations * deviations).sum()
+            k = abs(slope) * 2.303
+            t05 = 0.693 / k
+            r0 = 10 ** intercept
+            efflux_phase = 60 * r0 / (
+                analysis.run.SA * (1 - math.exp(-1 * k * analysis.run.load_time)))
+            xy1, xy2 = grab_x_ys(x_phase, slope, intercept)
+            phases.append(Objects.Phase(
+                phase.xs, xy1, xy2, r2, slope, intercept, x_phase, y_phase,
+                k, t05, r0, efflux_phase))
+        analysis.phase3, analysis.phase2, analysis.phase1 = phases
+        if analysis.phase3.is_empty:
+            clear_run_calcs(analysis)
+        else:
+            advanced_run_calcs(analysis)
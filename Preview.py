@@ -88,11 +88,13 @@ class MainFrame(wx.Frame):
 	"""The main preview frame of the application
 	"""
 
-	def __init__(self, experiment):
+	def __init__(self, experiment, cache=None):
 		"""Constructor of the main preview frame
 
 		@type self: MainFrame
 		@type experiment: Experiment
+		@type cache: ResultCache | None
+			Analyses redone in the preview are restored from and stored in it
 		@rtype: None
 		"""
 		wx.Frame.__init__(self, None, -1, 'vaCATE - ')
@@ -100,6 +102,7 @@ class MainFrame(wx.Frame):
 		self.SetIcon(wx.Icon('Images/testtube.ico', wx.BITMAP_TYPE_ICO))
 		self.analysis_num = 0  # Attribute of frame, not exp/analysis
 		self.experiment = experiment
+		self.cache = cache
 		self.create_main_panel()
 		# Default analysis: objective regression using the last 8 data points
 		self.draw_figure()
@@ -496,7 +499,7 @@ class MainFrame(wx.Frame):
 			self.subj_p2_end_textbox.SetValue('')
 			self.subj_p3_start_textbox.SetValue('')
 			self.subj_p3_end_textbox.SetValue('')
-		elif analysis.kind == 'subj':
+		elif analysis.kind in ('subj', 'opt'):
 			self.obj_textbox.SetValue('')
 			if analysis.xs_p3 != ('', ''):
 				self.subj_p3_start_textbox.SetValue(
@@ -553,7 +556,7 @@ class MainFrame(wx.Frame):
 		self.plot_phase3.set_ylim(bottom=0)
 
 		# Graphing the p3 series and regression line
-		if analysis.xs_p3 != ('', '') and analysis.phase3.xs != ('', ''):
+		if analysis.xs_p3 != ('', '') and not analysis.phase3.is_empty:
 			self.plot_phase3.scatter(
 				analysis.phase3.x_series, analysis.phase3.y_series,
 				s=self.slider_width.GetValue(),
@@ -588,7 +591,7 @@ class MainFrame(wx.Frame):
 			self.data_poolsize.SetValue('%0.3f' % analysis.poolsize)
 
 		# Graphing raw uncorrected data of p1 and p2
-		if analysis.xs_p2 != ('', '') and analysis.phase2.xs != ('', ''):
+		if analysis.xs_p2 != ('', '') and not analysis.phase2.is_empty:
 			self.plot_phase2.scatter(
 				analysis.x_p12, analysis.y_p12, s=self.slider_width.GetValue(),
 				alpha=0.50, edgecolors='k', facecolors='w', picker=5)
@@ -620,7 +623,7 @@ class MainFrame(wx.Frame):
 			self.data_p2_efflux.SetValue('%0.2f' % analysis.phase2.efflux)
 
 		# Graphing the p1 series and regression line	
-		if analysis.xs_p1 != ('', '') and analysis.phase1.xs != ('', ''):
+		if analysis.xs_p1 != ('', '') and not analysis.phase1.is_empty:
 			self.plot_phase1.scatter(
 				analysis.x_p1, analysis.y_p1,
 				s=self.slider_width.GetValue(),
@@ -696,7 +699,7 @@ class MainFrame(wx.Frame):
 			new_analysis = self.experiment.analyses[self.analysis_num]
 			new_analysis.kind = 'obj'
 			new_analysis.obj_num_pts = int(self.obj_textbox.GetValue())
-			new_analysis.analyze()
+			new_analysis.analyze(cache=self.cache)
 			self.experiment.analyses[self.analysis_num] = new_analysis
 			self.draw_figure()
 
@@ -708,12 +711,8 @@ class MainFrame(wx.Frame):
 		@rtype: None
 		"""
 		obj_num_pts = int(self.obj_textbox.GetValue())
-		for analysis_num in range(0, len(self.experiment.analyses)):
-			new_analysis = self.experiment.analyses[analysis_num]
-			new_analysis.kind = 'obj'
-			new_analysis.obj_num_pts = obj_num_pts
-			new_analysis.analyze()
-			self.experiment.analyses[analysis_num] = new_analysis
+		self.experiment.analyze_all(
+			'obj', obj_num_pts=obj_num_pts, cache=self.cache)
 		self.draw_figure()
 
 	def check_phase_boundary(self, boundary_raw, elut_ends_temp):
@@ -906,7 +905,7 @@ class MainFrame(wx.Frame):
 		if p1_start != '' and p1_end != '':
 			p1_start, p1_end = float(p1_start), float(p1_end)
 			new_analysis.xs_p1 = (p1_start, p1_end)
-		new_analysis.analyze()
+		new_analysis.analyze(cache=self.cache)
 		self.experiment.analyses[analysis_num] = new_analysis
 
 	def on_subj_draw(self, event):
@@ -945,11 +944,15 @@ class MainFrame(wx.Frame):
 		p1_start = self.subj_p1_start_textbox.GetValue()
 		p1_end = self.subj_p1_end_textbox.GetValue()
 		if self.check_subj_input():
-			for analysis_num in range(0, len(self.experiment.analyses)):
-				self.create_single_subj(
-					analysis_num,
-					(p3_start, p3_end), (p2_start, p2_end), (p1_start, p1_end)
-				)
+			# Convert subjective analysis textbox entries to floats
+			xs_p3, xs_p2, xs_p1 = [
+				(float(start), float(end)) if start != '' and end != ''
+				else ('', '')
+				for start, end in [
+					(p3_start, p3_end), (p2_start, p2_end), (p1_start, p1_end)]]
+			self.experiment.analyze_all(
+				'subj', xs_p1=xs_p1, xs_p2=xs_p2, xs_p3=xs_p3,
+				cache=self.cache)
 			self.draw_figure()
 
 	def on_cb_grid(self, event):
@@ -1,9 +1,19 @@
 import xlrd
 from nose.tools import assert_equals
+from nose.plugins.skip import SkipTest
 from nose_parameterized import parameterized
+import numpy
+import csv
+import glob
 import os
+import shutil
+import tempfile
+import xlsxwriter
+import zipfile
 
 import Excel
+import Objects
+import Operations
 
 class TestExperiment(object):
     def __init__(self, directory, analyses):
@@ -312,7 +322,7 @@ def test_analysis(file_name, analysis_data):
     print question_path
     question_exp = Excel.grab_data(question_path)
     answer_exp = grab_answers(directory, file_name, \
-                              question_exp.analyses[0].run.elut_ends)
+                              question_exp.analyses[0].run.elut_ends.tolist())
     for index, question in enumerate(question_exp.analyses):
         if 'Subj' in file_name:
             question.kind = 'subj'
@@ -338,15 +348,15 @@ def test_analysis(file_name, analysis_data):
         assert_equals(question.run.rt_wght, answer.rt_wght)
         assert_equals(question.run.gfact, answer.gfact)
         assert_equals(question.run.load_time, answer.load_time)
-        assert_equals(question.run.elut_ends, answer.elut_ends)
-        assert_equals(question.run.elut_cpms, answer.elut_cpms)
-        assert_equals(question.run.elut_starts, answer.elut_starts)
+        assert_equals(question.run.elut_ends.tolist(), answer.elut_ends)
+        assert_equals(question.run.elut_cpms.tolist(), answer.elut_cpms)
+        assert_equals(question.run.elut_starts.tolist(), answer.elut_starts)
         for index, item in enumerate(question.run.elut_cpms_gfact):
             assert_equals(
                 "{0:.10f}".format(question.run.elut_cpms_gfact[index]),
                 "{0:.10f}".format(answer.elut_cpms_gfact[index]))
-        assert_equals(question.run.elut_cpms_gRFW, answer.elut_cpms_gRFW)
-        assert_equals(question.run.elut_cpms_log, answer.elut_cpms_log)
+        assert_equals(question.run.elut_cpms_gRFW.tolist(), answer.elut_cpms_gRFW)
+        assert_equals(question.run.elut_cpms_log.tolist(), answer.elut_cpms_log)
 
         assert_equals(question.phase3.xs[0], answer.phase3.xs[0])
         assert_equals(question.phase3.xs[1], answer.phase3.xs[1])
@@ -388,9 +398,9 @@ def test_analysis(file_name, analysis_data):
             "{0:.7f}".format(question.tracer_retained),
             "{0:.7f}".format(answer.tracer_retained))
 
-        assert_equals(question.phase2.xs[0], answer.phase2.xs[0])
-        assert_equals(question.phase2.xs[1], answer.phase2.xs[1])
-        if question.phase2.xs != ('', ''):
+        if not question.phase2.is_empty:
+            assert_equals(question.phase2.xs[0], answer.phase2.xs[0])
+            assert_equals(question.phase2.xs[1], answer.phase2.xs[1])
             assert_equals(
                 "{0:.7f}".format(question.phase2.slope),
                 "{0:.7f}".format(answer.phase2.slope))
@@ -413,17 +423,14 @@ def test_analysis(file_name, analysis_data):
                 "{0:.7f}".format(question.phase2.r2),
                 "{0:.7f}".format(answer.phase2.r2))
         else:
-            assert_equals(question.phase2.slope, answer.phase2.slope)
-            assert_equals(question.phase2.intercept, answer.phase2.intercept)
-            assert_equals(question.phase2.k, answer.phase2.k)
-            assert_equals(question.phase2.r0, answer.phase2.r0)
-            assert_equals(question.phase2.efflux, answer.phase2.efflux)
-            assert_equals(question.phase2.t05, answer.phase2.t05)
-            assert_equals(question.phase2.r2, answer.phase2.r2)
-
-        assert_equals(question.phase1.xs[0], answer.phase1.xs[0])
-        assert_equals(question.phase1.xs[1], answer.phase1.xs[1])
-        if question.phase1.xs != ('', ''):
+            assert_equals(answer.phase2.xs, ('', ''))
+            for name in ('slope', 'intercept', 'k', 'r0', 'efflux', 't05', 'r2'):
+                assert numpy.isnan(getattr(question.phase2, name))
+                assert_equals(getattr(answer.phase2, name), '')
+
+        if not question.phase1.is_empty:
+            assert_equals(question.phase1.xs[0], answer.phase1.xs[0])
+            assert_equals(question.phase1.xs[1], answer.phase1.xs[1])
             assert_equals(
                 "{0:.7f}".format(question.phase1.slope),
                 "{0:.7f}".format(answer.phase1.slope))
@@ -446,15 +453,923 @@ def test_analysis(file_name, analysis_data):
                 "{0:.7f}".format(question.phase1.r2),
                 "{0:.7f}".format(answer.phase1.r2))
         else:
-            assert_equals(question.phase1.slope, answer.phase1.slope)
-            assert_equals(question.phase1.intercept, answer.phase1.intercept)
-            assert_equals(question.phase1.k, answer.phase1.k)
-            assert_equals(question.phase1.r0, answer.phase1.r0)
-            assert_equals(question.phase1.efflux, answer.phase1.efflux)
-            assert_equals(question.phase1.t05, answer.phase1.t05)
-            assert_equals(question.phase1.r2, answer.phase1.r2)
+            assert_equals(answer.phase1.xs, ('', ''))
+            for name in ('slope', 'intercept', 'k', 'r0', 'efflux', 't05', 'r2'):
+                assert numpy.isnan(getattr(question.phase1, name))
+                assert_equals(getattr(answer.phase1, name), '')
+
+
+@parameterized([
+    ("Tests/1/Test_MultiRun1.xlsx",),
+    ("Tests/Edge Cases/Test_MissMidPtPh3.xlsx",),
+    ("Tests/Edge Cases/Test_RsqNoDec.xlsx",),
+])
+def test_suffix_regressions(file_name):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(os.path.join(directory, file_name))
+    for question in question_exp.analyses:
+        x, y = question.run.elut_ends_parsed, question.run.elut_cpms_log
+        suffixes = Operations.suffix_regressions(x, y)
+        r2s, ms, bs = suffixes.r2, suffixes.slope, suffixes.intercept
+        for index in range(0, len(x) - 1):
+            r2, m, b = Operations.linear_regression(x[index:], y[index:])
+            assert_equals("{0:.9f}".format(r2s[index]), "{0:.9f}".format(r2))
+            assert_equals("{0:.9f}".format(ms[index]), "{0:.9f}".format(m))
+            assert_equals("{0:.9f}".format(bs[index]), "{0:.9f}".format(b))
+
+
+@parameterized([
+    ("Tests/1/Test_MultiRun1.xlsx", 8),
+    ("Tests/1/Test_SubjMultiRun1.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/2/Test_MultiRun1.xlsx", 8),
+    ("Tests/4/Test_MultiRun1.xlsx", 4),
+    ("Tests/4/Test_SubjMultiRun1.xlsx", [(1.5, 4.5), (6, 9), (10.5, 39)]),
+    ("Tests/2/Test_MultiRun1.xlsx", [(3, 16), (20.5, 22), (23.5, 34)]),
+    ("Tests/4/Test_MultiRun1.xlsx", [(3, 10.5), (12, 13.5), (21, 37.5)]),
+    ("Tests/Edge Cases/Test_CurveStripPh1.xlsx", 8),
+    ("Tests/Edge Cases/Test_MissLastPtPh3.xlsx", 8),
+    ("Tests/Edge Cases/Test_MissLastPtPh2.xlsx", 8),
+    ("Tests/Edge Cases/Test_MissLastPtPh1.xlsx", 8),
+    ("Tests/Edge Cases/Test_Miss1stPtPh3.xlsx", 8),
+    ("Tests/Edge Cases/Test_Miss1stPtPh2.xlsx", 8),
+    ("Tests/Edge Cases/Test_Miss1stPtPh1.xlsx", 8),
+    ("Tests/Edge Cases/Test_MissMajPh3.xlsx", 8),
+    ("Tests/Edge Cases/Test_MissMidPtPh3.xlsx", 8),
+    ("Tests/Edge Cases/Test_MissMidPtPh2.xlsx", 8),
+    ("Tests/Edge Cases/Test_MissMidPtPh1.xlsx", 8),
+    ("Tests/Edge Cases/Test_Ph1Is1Pt.xlsx", 8),
+    ("Tests/Edge Cases/Test_RsqNoDec.xlsx", 8),
+    ("Tests/Edge Cases/Test_EarlyEndPh3.xlsx", 8),
+    ("Tests/Edge Cases/Test_MajMidPh3.xlsx", 8),
+    ("Tests/Edge Cases/Test_SubjMiss1stPtPh1.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/Edge Cases/Test_SubjMiss1stPtPh2.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/Edge Cases/Test_SubjMiss1stPtPh3.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/Edge Cases/Test_SubjMissLastPtPh3.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/Edge Cases/Test_SubjMissLastPtPh2.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/Edge Cases/Test_SubjMissLastPtPh1.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/Edge Cases/Test_SubjMissMidPtPh3.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/Edge Cases/Test_SubjMissMidPtPh23.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    ("Tests/Edge Cases/Test_SubjMissMidPtPh123.xlsx", [(1, 3), (4, 10), (11.5, 45)]),
+    # Phase III of a single point is empty
+    ("Tests/1/Test_SubjMultiRun1.xlsx", [(1, 3), (4, 10), (45, 45)]),
+])
+def test_analyze_all(file_name, analysis_data):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_path = os.path.join(directory, file_name)
+    question_exp = Excel.grab_data(question_path)
+    answer_exp = Excel.grab_data(question_path)
+    if isinstance(analysis_data, list):
+        for question in question_exp.analyses:
+            question.obj_num_pts = 8  # Kept by subjective analyses
+        question_exp.analyze_all(
+            'subj', xs_p1=analysis_data[0], xs_p2=analysis_data[1],
+            xs_p3=analysis_data[2])
+        assert_equals(
+            [question.obj_num_pts for question in question_exp.analyses],
+            [8] * len(question_exp.analyses))
+    else:
+        question_exp.analyze_all('obj', obj_num_pts=analysis_data)
+    for index, question in enumerate(question_exp.analyses):
+        answer = answer_exp.analyses[index]
+        answer.kind = question.kind
+        answer.obj_num_pts = question.obj_num_pts
+        answer.xs_p3 = question.xs_p3 if answer.kind == 'subj' else ('', '')
+        answer.xs_p2 = question.xs_p2 if answer.kind == 'subj' else ('', '')
+        answer.xs_p1 = question.xs_p1 if answer.kind == 'subj' else ('', '')
+        answer.analyze()
+        assert_equals(question.xs_p3, answer.xs_p3)
+        assert_equals(question.xs_p2, answer.xs_p2)
+        assert_equals(question.xs_p1, answer.xs_p1)
+        for name in ('netflux', 'influx', 'ratio', 'poolsize'):
+            if getattr(answer, name) is None:  # No phase III
+                assert_equals(getattr(question, name), None)
+            else:
+                assert_equals(
+                    "{0:.9g}".format(getattr(question, name)),
+                    "{0:.9g}".format(getattr(answer, name)))
+        assert_equals(question.x_p1_curvestrip_p23, answer.x_p1_curvestrip_p23)
+        for phase_name in ('phase3', 'phase2', 'phase1'):
+            question_phase = getattr(question, phase_name)
+            answer_phase = getattr(answer, phase_name)
+            assert_equals(question_phase.is_empty, answer_phase.is_empty)
+            assert_equals(
+                list(question_phase.x_series), list(answer_phase.x_series))
+            if not answer_phase.is_empty:
+                assert_equals(question_phase.xs, answer_phase.xs)
+                assert_equals(
+                    "{0:.9g}".format(question_phase.slope),
+                    "{0:.9g}".format(answer_phase.slope))
+                assert_equals(
+                    "{0:.9g}".format(question_phase.intercept),
+                    "{0:.9g}".format(answer_phase.intercept))
+                assert_equals(
+                    "{0:.9g}".format(question_phase.efflux),
+                    "{0:.9g}".format(answer_phase.efflux))
+
+
+def test_fit_line():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"))
+    runs = [question.run for question in question_exp.analyses]
+    elut_ends, x, y, counts = Operations.stack_runs(runs)
+    mask = numpy.arange(x.shape[1]) < counts[:, numpy.newaxis]
+    lines = Operations.fit_line(x, y, mask=mask)
+    for index, run in enumerate(runs):
+        x_series, y_series = run.x, run.y
+        n = len(x_series)
+        design = numpy.vstack([x_series, numpy.ones(n)]).T
+        (slope, intercept), ss_resid = numpy.linalg.lstsq(
+            design, y_series, rcond=-1)[:2]
+        covariance = numpy.linalg.inv(numpy.dot(design.T, design)) * \
+            ss_resid[0] / (n - 2)
+        line = Operations.fit_line(x_series, y_series)
+        for value, answer in [
+                (line.n, n), (line.slope, slope),
+                (line.intercept, intercept), (line.ss_resid, ss_resid[0]),
+                (line.slope_se, numpy.sqrt(covariance[0, 0])),
+                (line.intercept_se, numpy.sqrt(covariance[1, 1])),
+                (lines.slope[index], slope),
+                (lines.intercept_se[index], numpy.sqrt(covariance[1, 1]))]:
+            assert_equals("{0:.9g}".format(value), "{0:.9g}".format(answer))
+
+
+@parameterized([
+    ("Tests/1/Test_MultiRun1.xlsx",),
+    ("Tests/Edge Cases/Test_MissMidPtPh1.xlsx",),
+    ("Tests/Edge Cases/Test_CurveStripPh1.xlsx",),
+])
+def test_run_arrays(file_name):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(os.path.join(directory, file_name))
+    for question in question_exp.analyses:
+        run = question.run
+        answers = Operations.basic_run_calcs(
+            run.rt_wght, run.gfact, run.elut_starts, run.elut_ends,
+            run.elut_cpms)
+        assert_equals(run.elut_cpms_gfact.tolist(), answers[0])
+        assert_equals(run.elut_cpms_gRFW.tolist(), answers[1])
+        assert_equals(run.elut_cpms_log.tolist(), answers[2])
+        assert_equals(run.elut_ends_parsed.tolist(), answers[3])
+
+        question.kind = 'obj'
+        question.obj_num_pts = 8
+        question.analyze()
+        answer_x, answer_y = Operations.curvestrip(
+            question.x_p12, question.y_p12,
+            question.phase3.slope, question.phase3.intercept)
+        assert_equals(question.x_p12_curvestrip_p3, answer_x)
+        assert_equals(question.y_p12_curvestrip_p3, answer_y)
+
+
+def test_boundary_index():
+    x_series = [0.5, 1.0, 1.5, 2.5, 4.0, 6.0, 9.0]
+    boundaries = Objects.BoundaryIndex(x_series)
+    for x_value, start, end in [
+            (0.5, 0, 0), (1.5, 2, 2), (2.0, 3, 2), (1.5 + 1e-12, 2, 2),
+            (0.1 + 0.2 + 1.2, 2, 2), (5.0, 5, 4), (9.0, 6, 6)]:
+        assert_equals(boundaries.start(x_value), start)
+        assert_equals(boundaries.end(x_value), end)
+        assert_equals(
+            Operations.x_to_index(x_value, 'start', x_series), start)
+        assert_equals(Operations.x_to_index(x_value, 'end', x_series), end)
+
+
+def test_incremental_analyze():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"))
+    for question in question_exp.analyses:
+        question.kind = 'obj'
+        question.obj_num_pts = 8
+        question.analyze()
+        if question.phase1.is_empty:
+            continue
+        phase3, phase2 = question.phase3, question.phase2
+        question.kind = 'subj'
+        question.xs_p1 = (question.phase1.xs[0], question.phase1.xs[1] + 1)
+        question.analyze()
+        assert question.phase3 is phase3
+        assert question.phase2 is phase2
+        fresh = Objects.Analysis(
+            'subj', None, question.run, question.xs_p1, question.xs_p2,
+            question.xs_p3)
+        fresh.analyze()
+        assert_equals(question.phase1.xy1, fresh.phase1.xy1)
+        assert_equals(question.phase1.slope, fresh.phase1.slope)
+        assert_equals(question.phase1.efflux, fresh.phase1.efflux)
+
+
+@parameterized([
+    ("Tests/1/Test_MultiRun1.xlsx",),
+    ("Tests/2/Test_MultiRun1.xlsx",),
+    ("Tests/Edge Cases/Test_MissMajPh3.xlsx",),
+])
+def test_obj_sweep(file_name):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(os.path.join(directory, file_name))
+    for question in question_exp.analyses:
+        for obj_analysis in question.obj_sweep():
+            answer = Objects.Analysis(
+                'obj', obj_analysis.obj_num_pts, question.run)
+            answer.analyze()
+            assert_equals(obj_analysis.xs_p3, answer.xs_p3)
+            assert_equals(obj_analysis.xs_p2, answer.xs_p2)
+            assert_equals(obj_analysis.xs_p1, answer.xs_p1)
+            for phase_name in ('phase3', 'phase2', 'phase1'):
+                obj_phase = getattr(obj_analysis, phase_name)
+                answer_phase = getattr(answer, phase_name)
+                assert_equals(obj_phase.is_empty, answer_phase.is_empty)
+                if not answer_phase.is_empty:
+                    assert_equals(obj_phase.efflux, answer_phase.efflux)
 
 
+@parameterized([
+    ("Tests/1/Test_MultiRun1.xlsx",),
+    ("Tests/Edge Cases/Test_CurveStripPh1.xlsx",),
+])
+def test_opt_phases(file_name):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(os.path.join(directory, file_name))
+    question_exp.analyze_all('opt')
+    for question in question_exp.analyses:
+        x = numpy.array(question.run.elut_ends_parsed)
+        y = numpy.array(question.run.elut_cpms_log)
+        # Brute force search of every split of the run
+        highest_r2, answer = 0, (('', ''), ('', ''), ('', ''))
+        for start_p3 in range(6, len(x) - 2):
+            slope3, intercept3 = numpy.polyfit(x[start_p3:], y[start_p3:], 1)
+            r2_p3 = numpy.corrcoef(x[start_p3:], y[start_p3:])[0, 1] ** 2
+            stripped = 10 ** y[:start_p3] - \
+                10 ** (slope3 * x[:start_p3] + intercept3)
+            x_p12 = x[:start_p3][stripped > 0]
+            y_p12 = numpy.log10(stripped[stripped > 0])
+            for start_p2 in range(3, start_p3 - 2):
+                p2 = x_p12 >= x[start_p2]
+                if p2.sum() < 3:
+                    continue
+                slope2, intercept2 = numpy.polyfit(x_p12[p2], y_p12[p2], 1)
+                r2_p2 = numpy.corrcoef(x_p12[p2], y_p12[p2])[0, 1] ** 2
+                stripped = 10 ** y_p12[~p2] - \
+                    10 ** (slope2 * x_p12[~p2] + intercept2)
+                if (stripped > 0).sum() < 3:
+                    continue
+                r2_p1 = numpy.corrcoef(
+                    x_p12[~p2][stripped > 0],
+                    numpy.log10(stripped[stripped > 0]))[0, 1] ** 2
+                if r2_p1 + r2_p2 + r2_p3 > highest_r2 + 1e-9:
+                    highest_r2 = r2_p1 + r2_p2 + r2_p3
+                    answer = (
+                        (x[start_p3], x[-1]), (x[start_p2], x[start_p3 - 1]),
+                        (x[0], x[start_p2 - 1]))
+        assert_equals(
+            (question.xs_p3, question.xs_p2, question.xs_p1), answer)
+        assert_equals(
+            "{0:.9f}".format(question.opt_r2_max),
+            "{0:.9f}".format(highest_r2))
+
+
+def test_bootstrap():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"))
+    question_exp.analyze_all('obj', obj_num_pts=8)
+    question_exp.bootstrap(num_resamples=200, seed=1, processes=1)
+    answers = [question.intervals for question in question_exp.analyses]
+    question_exp.bootstrap(num_resamples=200, seed=1, processes=2)
+    for question, answer in zip(question_exp.analyses, answers):
+        assert_equals(question.intervals, answer)
+        lower, upper = question.intervals['influx']
+        assert lower <= question.influx <= upper
+        for lower, upper in question.intervals.values():
+            assert lower <= upper
+
+
+def test_simulate_counts():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"))
+    question_exp.analyze_all('obj', obj_num_pts=8)
+    for question in question_exp.analyses:
+        # Counting for (practically) ever leaves no counting noise
+        samples = Operations.simulate_counts(
+            question.run, question.xs_p3, question.xs_p2, question.xs_p1,
+            num_draws=5, seed=0, count_time=1e12)
+        for value in samples['efflux_p1']:
+            assert_equals(
+                "{0:.4g}".format(value),
+                "{0:.4g}".format(question.phase1.efflux))
+        for value in samples['influx']:
+            assert_equals(
+                "{0:.4g}".format(value), "{0:.4g}".format(question.influx))
+    question_exp.simulate_counts(num_draws=100, seed=1)
+    answers = [question.count_spreads for question in question_exp.analyses]
+    question_exp.simulate_counts(num_draws=100, seed=1)
+    for question, answer in zip(question_exp.analyses, answers):
+        assert_equals(question.count_spreads, answer)
+        assert question.count_spreads['k_p3'] > 0
+
+
+def test_nonlinear_phases():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"))
+    question_exp.analyze_all('obj', obj_num_pts=8)
+    answers = [
+        [question.phase3, question.phase2, question.phase1]
+        for question in question_exp.analyses]
+    question_exp.analyze_all('obj', obj_num_pts=8, engine='nonlinear')
+    for question, answer in zip(question_exp.analyses, answers):
+        x = numpy.array([question.run.elut_ends_parsed])
+        y = numpy.array([question.run.elut_cpms_log])
+        window = (x >= question.xs_p1[0]) & (x <= question.xs_p3[1])
+        costs = []
+        for phases in [answer, [
+                question.phase3, question.phase2, question.phase1]]:
+            model = Operations.exponential_model(
+                x, numpy.array([[phase.slope for phase in phases]]),
+                numpy.array([[phase.intercept for phase in phases]]))[0]
+            costs.append((((model - y)[window]) ** 2).sum())
+        assert costs[1] <= costs[0]
+        # Fitting a single run gives the same fit
+        single = Objects.Analysis('obj', 8, question.run)
+        single.engine = 'nonlinear'
+        single.analyze()
+        for phase, single_phase in zip(
+                [question.phase3, question.phase2, question.phase1],
+                [single.phase3, single.phase2, single.phase1]):
+            assert_equals(
+                "{0:.6g}".format(phase.k), "{0:.6g}".format(single_phase.k))
+
+
+@parameterized([
+    # Stripping the fitted phases leaves phase I with no points
+    ("Run 1", [(16, 17.5), (19, 22), (23.5, 45)], 'phase1'),
+    # ... and phase II with one point
+    ("Run 1", [(16, 19), (20.5, 22), (23.5, 45)], 'phase2'),
+    # Two-point phases make the damped fit singular
+    ("Run11", [(10, 11.5), (13, 14.5), (16, 45)], 'phase1'),
+])
+def test_nonlinear_short_phases(run_name, subj_xs, empty_phase):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"))
+    question = [analysis for analysis in question_exp.analyses
+                if analysis.run.name == run_name][0]
+    question.kind, question.engine = 'subj', 'nonlinear'
+    question.xs_p1, question.xs_p2, question.xs_p3 = subj_xs
+    question.analyze()
+    assert not question.phase3.is_empty
+    for phase_name in ['phase2', 'phase1']:
+        assert_equals(
+            getattr(question, phase_name).is_empty, phase_name == empty_phase)
+
+
+@parameterized([
+    ("Tests/1/Test_MultiRun1.xlsx",),
+    ("Tests/Edge Cases/Test_MissMidPtPh1.xlsx",),
+    ("Tests/Edge Cases/Test_CurveStripPh1.xlsx",),
+])
+def test_weighted_analysis(file_name):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(os.path.join(directory, file_name))
+    question_exp.analyze_all('obj', obj_num_pts=8, weighted=True)
+    for question in question_exp.analyses:
+        answer = Objects.Analysis('obj', 8, question.run)
+        answer.weighted = True
+        answer.analyze()
+        for phase, answer_phase in [
+                (question.phase3, answer.phase3),
+                (question.phase2, answer.phase2),
+                (question.phase1, answer.phase1)]:
+            assert_equals(phase.is_empty, answer_phase.is_empty)
+            if phase.is_empty:
+                continue
+            assert_equals(phase.xs, answer_phase.xs)
+            assert_equals(
+                "{0:.9g}".format(phase.efflux),
+                "{0:.9g}".format(answer_phase.efflux))
+            # Weights are the counts of the points that were fit
+            x_phase = numpy.array(phase.x_series)
+            weights = answer.weights_of(phase.x_series)
+            slope, intercept = numpy.polyfit(
+                x_phase, phase.y_series, 1, w=numpy.sqrt(weights))
+            assert_equals(
+                "{0:.9g}".format(phase.slope), "{0:.9g}".format(slope))
+            assert_equals(
+                "{0:.9g}".format(phase.intercept), "{0:.9g}".format(intercept))
+
+
+def test_weighted_opt_nonlinear():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"))
+    question_exp.analyze_all('opt')
+    unweighted = [
+        (question.xs_p3, question.xs_p2, question.xs_p1)
+        for question in question_exp.analyses]
+    question_exp.analyze_all('opt', weighted=True)
+    weighted = [
+        (question.xs_p3, question.xs_p2, question.xs_p1)
+        for question in question_exp.analyses]
+    assert weighted != unweighted
+    for question in question_exp.analyses:
+        answer = Objects.Analysis('opt', None, question.run)
+        answer.weighted = True
+        answer.analyze()
+        assert_equals(
+            (question.xs_p3, question.xs_p2, question.xs_p1),
+            (answer.xs_p3, answer.xs_p2, answer.xs_p1))
+        assert_equals(
+            "{0:.9f}".format(question.opt_r2_max),
+            "{0:.9f}".format(answer.opt_r2_max))
+
+    # Weighted nonlinear fit lowers the weighted cost of curve-stripping
+    question_exp.analyze_all('obj', obj_num_pts=8, weighted=True)
+    answers = [
+        [question.phase3, question.phase2, question.phase1]
+        for question in question_exp.analyses]
+    question_exp.analyze_all(
+        'obj', obj_num_pts=8, engine='nonlinear', weighted=True)
+    for question, answer in zip(question_exp.analyses, answers):
+        if any(phase.is_empty for phase in answer):
+            continue  # Not refit (see batch_nonlinear_phases)
+        x = numpy.array([question.run.elut_ends_parsed])
+        y = numpy.array([question.run.elut_cpms_log])
+        weights = question.run.poisson_weights[numpy.newaxis]
+        window = (x >= question.xs_p1[0]) & (x <= question.xs_p3[1])
+        costs = []
+        for phases in [answer, [
+                question.phase3, question.phase2, question.phase1]]:
+            model = Operations.exponential_model(
+                x, numpy.array([[phase.slope for phase in phases]]),
+                numpy.array([[phase.intercept for phase in phases]]))[0]
+            costs.append(
+                (weights * (model - y) ** 2)[window].sum())
+        assert costs[1] <= costs[0]
+
+
+@parameterized([
+    ("Tests/1/Test_MultiRun1.xlsx",),
+    ("Tests/Edge Cases/Test_MissMajPh3.xlsx",),
+])
+def test_experiment_frame(file_name):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(os.path.join(directory, file_name))
+    question_exp.analyze_all('obj', 8)
+    frame = question_exp.frame
+    for row, analysis in enumerate(question_exp.analyses):
+        assert_equals(frame['SA'][row], analysis.run.SA)
+        assert_equals(frame['load_time'][row], analysis.run.load_time)
+        assert_equals(frame['influx'][row], analysis.influx)
+        assert_equals(frame['k_p3'][row], analysis.phase3.k)
+        assert_equals(
+            frame.phase_table('phase1').is_empty[row],
+            analysis.phase1.is_empty)
+
+    # Frame follows a change of kind that keeps the phases
+    analysis = question_exp.analyses[0]
+    analysis.analyze()
+    assert_equals(frame['kind'][0], 'obj')
+    phase3 = analysis.phase3
+    analysis.kind = 'subj'
+    analysis.analyze()
+    assert analysis.phase3 is phase3
+    assert_equals(frame['kind'][0], 'subj')
+
+    # ... re-analysis of an analysis
+    analysis.xs_p3, analysis.xs_p2, analysis.xs_p1 = (11.5, 40), (4, 10), (1, 3)
+    analysis.analyze()
+    assert_equals(frame['k_p3'][0], analysis.phase3.k)
+
+    # ... and run metadata edited in place, once refreshed
+    analysis.run.SA = analysis.run.SA * 2
+    analysis.run.load_time = 30.0
+    frame.refresh()
+    assert_equals(frame['SA'][0], analysis.run.SA)
+    assert_equals(frame['load_time'][0], 30.0)
+
+    high = frame['influx'] > frame.aggregate('influx')
+    subset = frame.where(high)
+    assert_equals(
+        subset['name'].tolist(),
+        [analysis.run.name for analysis, keep in
+         zip(question_exp.analyses, high) if keep])
+    assert_equals(
+        "{0:.9g}".format(subset.aggregate('influx', func=numpy.sum)),
+        "{0:.9g}".format(sum(analysis.influx for analysis, keep in
+                             zip(question_exp.analyses, high) if keep)))
+
+
+@parameterized([
+    ("Tests/1/Test_MultiRun1.xlsx",),
+    ("Tests/1/Test_SubjSingleRun1.xlsx",),
+    ("Tests/Edge Cases/Test_MissMidPtPh1.xlsx",),
+])
+def test_stream_backend(file_name):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    answer_exp = Excel.grab_data(os.path.join(directory, file_name))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, file_name), backend='stream')
+    assert_equals(len(question_exp.analyses), len(answer_exp.analyses))
+    for question, answer in zip(question_exp.analyses, answer_exp.analyses):
+        for name in ('name', 'SA', 'rt_cnts', 'sht_cnts', 'rt_wght', 'gfact',
+                     'load_time'):
+            assert_equals(
+                getattr(question.run, name), getattr(answer.run, name))
+        assert_equals(
+            question.run.elut_ends.tolist(), answer.run.elut_ends.tolist())
+        assert_equals(
+            question.run.elut_cpms.tolist(), answer.run.elut_cpms.tolist())
+        assert_equals(
+            question.run.parsed.tolist(), answer.run.parsed.tolist())
+
+
+@parameterized([
+    ("Tests/1/Test_MultiRun1.csv", "Tests/1/Test_MultiRun1.xlsx"),
+    ("Tests/Edge Cases/Test_MissMidPtPh1.tsv",
+     "Tests/Edge Cases/Test_MissMidPtPh1.xlsx"),
+])
+def test_text_input(file_name, excel_name):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(os.path.join(directory, file_name))
+    answer_exp = Excel.grab_data(os.path.join(directory, excel_name))
+    assert_equals(len(question_exp.analyses), len(answer_exp.analyses))
+    for question, answer in zip(question_exp.analyses, answer_exp.analyses):
+        for name in ('name', 'SA', 'rt_cnts', 'sht_cnts', 'rt_wght', 'gfact',
+                     'load_time'):
+            assert_equals(
+                getattr(question.run, name), getattr(answer.run, name))
+        assert_equals(
+            question.run.elut_ends.tolist(), answer.run.elut_ends.tolist())
+        assert_equals(
+            question.run.elut_cpms.tolist(), answer.run.elut_cpms.tolist())
+        assert_equals(
+            question.run.elut_cpms_log.tolist(),
+            answer.run.elut_cpms_log.tolist())
+
+
+def test_text_input_quoted():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(directory, "Tests/1/Test_MultiRun1.csv")
+    with open(file_path, 'rb') as text_file:
+        rows = list(csv.reader(text_file))
+    # Runs named by number, every field quoted and a short blank row last
+    rows[0] = rows[0][:2] + [
+        str(index + 1) for index in range(len(rows[0]) - 2)]
+    rows.append([''])
+    temp_dir = tempfile.mkdtemp()
+    try:
+        quoted_path = os.path.join(temp_dir, "Quoted.csv")
+        with open(quoted_path, 'wb') as text_file:
+            csv.writer(text_file, quoting=csv.QUOTE_ALL).writerows(rows)
+        question_exp = Excel.grab_data(quoted_path)
+    finally:
+        shutil.rmtree(temp_dir)
+    answer_exp = Excel.grab_data(os.path.join(
+        directory, "Tests/1/Test_MultiRun1.xlsx"))
+    assert_equals(
+        [analysis.run.name for analysis in question_exp.analyses],
+        [str(float(name)) for name in rows[0][2:]])
+    for question, answer in zip(question_exp.analyses, answer_exp.analyses):
+        assert_equals(question.run.SA, answer.run.SA)
+        assert_equals(
+            question.run.elut_ends.tolist(), answer.run.elut_ends.tolist())
+        assert_equals(
+            question.run.elut_cpms.tolist(), answer.run.elut_cpms.tolist())
+
+
+def test_text_values():
+    # Padded numbers, blanks of spaces and short rows
+    values = Excel.text_values(
+        [['1', ' 0.5 ', '10', ''], ['2', '1.0', '  ', '20\r'], ['3', '1.5']], 4)
+    assert_equals(values[:, 0].tolist(), [0.5, 1.0, 1.5])
+    assert_equals(values[0, 1], 10.0)
+    assert_equals(values[1, 2], 20.0)
+    assert_equals(
+        numpy.isnan(values).tolist(),
+        [[False, False, True], [False, True, False], [False, True, True]])
+
+
+def test_grab_batch():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = Excel.grab_batch(os.path.join(directory, "Tests/1"), processes=2)
+    file_names = sorted(
+        name for name in os.listdir(os.path.join(directory, "Tests/1"))
+        if name.endswith(('.xlsx', '.csv')))
+    assert_equals(
+        [os.path.basename(path) for path, _, _ in results], file_names)
+    for path, question_exp, error in results:
+        if 'Output' in path:  # Not a template, so it can't be read
+            assert_equals(question_exp, None)
+            assert error.startswith('ValueError')
+            continue
+        assert_equals(error, None)
+        answer_exp = Excel.grab_data(path)
+        assert_equals(
+            [analysis.run.name for analysis in question_exp.analyses],
+            [analysis.run.name for analysis in answer_exp.analyses])
+        for question, answer in zip(
+                question_exp.analyses, answer_exp.analyses):
+            assert_equals(
+                question.run.elut_cpms_log.tolist(),
+                answer.run.elut_cpms_log.tolist())
+
+
+def test_parse_cache():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    cache_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(cache_dir, "Test.xlsx")
+        shutil.copy(
+            os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"), file_path)
+        answer_exp = Excel.grab_data(file_path)
+        Excel.grab_data(file_path, cache=True)
+        assert os.path.exists(Excel.parse_cache_path(file_path))
+        question_exp = Excel.grab_data(file_path, cache=True)
+        for question, answer in zip(
+                question_exp.analyses, answer_exp.analyses):
+            for name in ('name', 'SA', 'rt_cnts', 'sht_cnts', 'rt_wght',
+                         'gfact', 'load_time'):
+                assert_equals(
+                    getattr(question.run, name), getattr(answer.run, name))
+            assert_equals(
+                question.run.elut_cpms_log.tolist(),
+                answer.run.elut_cpms_log.tolist())
+
+        # An unchanged file is matched without being hashed, a touched one by
+        #    its hash, after which its sidecar is updated
+        file_sha1 = Excel.file_sha1
+        try:
+            Excel.file_sha1 = None  # Hashing raises a TypeError
+            assert Excel.read_parse_cache(file_path) is not None
+            os.utime(file_path, (0, 0))
+            Excel.file_sha1 = file_sha1
+            assert Excel.read_parse_cache(file_path) is not None
+            Excel.file_sha1 = None
+            assert Excel.read_parse_cache(file_path) is not None
+        finally:
+            Excel.file_sha1 = file_sha1
+
+        # A corrupt sidecar is treated as missing and replaced
+        with open(Excel.parse_cache_path(file_path), 'wb') as sidecar:
+            sidecar.write('PK\x03\x04' + 'x' * 100)
+        assert Excel.read_parse_cache(file_path) is None
+        question_exp = Excel.grab_data(file_path, cache=True)
+        assert_equals(len(question_exp.analyses), len(answer_exp.analyses))
+        assert Excel.read_parse_cache(file_path) is not None
+
+        # Changed content invalidates the sidecar, even with the same mtime
+        status = os.stat(file_path)
+        shutil.copy(
+            os.path.join(directory, "Tests/1/Test_SingleRun1.xlsx"), file_path)
+        os.utime(file_path, (status.st_atime, status.st_mtime))
+        question_exp = Excel.grab_data(file_path, cache=True)
+        answer_exp = Excel.grab_data(file_path)
+        assert_equals(len(question_exp.analyses), len(answer_exp.analyses))
+        assert_equals(
+            question_exp.analyses[0].run.elut_cpms.tolist(),
+            answer_exp.analyses[0].run.elut_cpms.tolist())
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_result_cache():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx")
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = Objects.ResultCache(cache_dir)
+        answer_exp = Excel.grab_data(file_path)
+        answer_exp.analyze_all('obj', obj_num_pts=8, cache=cache)
+        question_exp = Excel.grab_data(file_path)
+        for question in question_exp.analyses:
+            question.kind, question.obj_num_pts = 'obj', 8
+            assert cache.restore(question)
+        for question, answer in zip(
+                question_exp.analyses, answer_exp.analyses):
+            assert_equals(question.xs_p3, answer.xs_p3)
+            assert_equals(question.influx, answer.influx)
+            assert_equals(question.phase3.k, answer.phase3.k)
+
+        # Other settings miss, but the last ones used can be restored
+        question = Excel.grab_data(file_path).analyses[0]
+        question.kind, question.obj_num_pts = 'obj', 4
+        assert not cache.restore(question)
+        assert cache.restore_last(question)
+        assert_equals(question.obj_num_pts, 8)
+        assert_equals(question.phase1.k, answer_exp.analyses[0].phase1.k)
+
+        # Results restored by a new analysis become the last ones used
+        question.kind, question.obj_num_pts = 'obj', 4
+        question.analyze(cache=cache)
+        answer_exp.analyze_all('obj', obj_num_pts=8, cache=cache)
+        question.obj_num_pts = 12
+        assert cache.restore_last(question)
+        assert_equals(question.obj_num_pts, 8)
+        question.analyze(cache=cache)
+        question = Excel.grab_data(file_path).analyses[0]
+        assert cache.restore_last(question)
+        assert_equals(question.obj_num_pts, 8)
+
+        # Least recently used results are evicted first
+        first, second = question_exp.analyses[:2]
+        cache.max_bytes = 0
+        cache.evict()
+        assert_equals(os.listdir(cache_dir), [])
+        cache.max_bytes = 2 ** 30
+        cache.store([first])
+        cache.max_bytes = sum(
+            os.path.getsize(os.path.join(cache_dir, name))
+            for name in os.listdir(cache_dir))
+        for name in os.listdir(cache_dir):
+            os.utime(os.path.join(cache_dir, name), (0, 0))
+        cache.store([second])
+        assert cache.restore(second)
+        assert not cache.restore(first)
+        # Sizes are tracked without listing the directory again
+        assert_equals(cache.size, sum(
+            os.path.getsize(os.path.join(cache_dir, name))
+            for name in os.listdir(cache_dir)))
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_sheet_writer():
+    directory = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(directory, "Test.xlsx")
+        workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True})
+        worksheet = Excel.SheetWriter(workbook.add_worksheet("Test"))
+        Excel.write_sheet_labels(worksheet, Excel.FormatRegistry(workbook))
+        worksheet.write_column(10, 3, [1.0, 2.0, 3.0])
+        worksheet.write(0, 2, "Run 1")
+        worksheet.merge_range(10, 0, 12, 0, "Merged")
+        worksheet.write(11, 3, 4.0)
+        worksheet.flush(12)
+        try:
+            worksheet.write(11, 3, 5.0)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Write to a flushed row wasn't refused")
+        worksheet.close()
+        workbook.close()
+        sheet = xlrd.open_workbook(file_path).sheet_by_index(0)
+        assert_equals(sheet.cell_value(0, 0), "Run Name")
+        assert_equals(sheet.cell_value(0, 2), "Run 1")
+        assert_equals(sheet.col_values(3, 10, 13), [1.0, 4.0, 3.0])
+        assert_equals(sheet.col_values(0, 10, 13), ["Merged", '', ''])
+        # xlrd doesn't read the merged cells of xlsx files
+        sheet_xml = zipfile.ZipFile(file_path).read(
+            'xl/worksheets/sheet1.xml')
+        assert '<mergeCell ref="A11:A13"/>' in sheet_xml
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_sheet_writer_file_handles():
+    try:
+        import resource
+    except ImportError:
+        raise SkipTest("File handle limits are only set on Unix")
+    if not os.path.isdir('/proc/self/fd'):
+        raise SkipTest("Open file handles are only counted on Linux")
+    num_open = len(os.listdir('/proc/self/fd'))
+    limits = resource.getrlimit(resource.RLIMIT_NOFILE)
+    directory = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(directory, "Test.xlsx")
+        workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True})
+        # More sheets than file handles can be open at once
+        resource.setrlimit(
+            resource.RLIMIT_NOFILE, (num_open + 32, limits[1]))
+        for index in range(64):
+            worksheet = Excel.SheetWriter(
+                workbook.add_worksheet("Run %d" % index))
+            worksheet.write_column(0, 0, [index, index + 1.0])
+            worksheet.close()
+        workbook.close()
+        resource.setrlimit(resource.RLIMIT_NOFILE, limits)
+        book = xlrd.open_workbook(file_path)
+        assert_equals(book.nsheets, 64)
+        assert_equals(book.sheet_by_index(63).col_values(0), [63.0, 64.0])
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, limits)
+        shutil.rmtree(directory)
+
+
+def test_write_series():
+    directory = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(directory, "Test.xlsx")
+        workbook = xlsxwriter.Workbook(file_path)
+        worksheet = workbook.add_worksheet("Test")
+        raw_series = [1.0, 2.0, 3.5, 5.0, 7.0]
+        Excel.write_series(
+            worksheet, [None], 0, 0, [2.0, 5.0, 7.0], [0.2, 0.5, 0.7],
+            raw_series)
+        Excel.write_series(
+            worksheet, [None], 0, 1, [1.0, 3.5, 6.0], [0.1, numpy.nan, 0.6],
+            raw_series)
+        workbook.close()
+        sheet = xlrd.open_workbook(file_path).sheet_by_index(0)
+        assert_equals(sheet.col_values(0), ['', 0.2, '', 0.5, 0.7])
+        assert_equals(sheet.col_values(1), [0.1, '', '', '', ''])
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_format_registry():
+    directory = tempfile.mkdtemp()
+    try:
+        workbook = xlsxwriter.Workbook(os.path.join(directory, "Test.xlsx"))
+        formats = Excel.FormatRegistry(workbook)
+        assert formats['border_bot'] is formats['border_bot']
+        assert formats['border_bot'] is formats.get(
+            dict(Excel.CELL_FORMATS['border_bot']))
+        assert formats['border_bot'] is not formats['border_bold_bot']
+        Excel.generate_sheet(workbook, "Run 1", formats=formats)
+        num_formats = len(workbook.formats)
+        Excel.generate_sheet(workbook, "Run 2", formats=formats)
+        assert_equals(len(workbook.formats), num_formats)
+        workbook.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_empty_phase3_export():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx")
+    single_exp = Excel.grab_data(file_path)
+    last = single_exp.analyses[0].run.elut_ends_parsed[-1]
+    for analysis in single_exp.analyses:
+        analysis.kind, analysis.xs_p3 = 'subj', (last, last)
+        analysis.analyze()
+    batch_exp = Excel.grab_data(file_path)
+    batch_exp.analyze_all('subj', xs_p3=(last, last))
+    output_dir = tempfile.mkdtemp()
+    # generate_analysis joins the directory and file name with a backslash
+    output_pattern = output_dir + "\\vaCATE Output - *.xlsx"
+    try:
+        for question_exp in [single_exp, batch_exp]:
+            question = question_exp.analyses[0]
+            assert question.phase3.is_empty
+            for name in ['netflux', 'influx', 'ratio', 'poolsize']:
+                assert_equals(getattr(question, name), None)
+            # Absent values are written as blank cells
+            question_exp.directory = output_dir
+            Excel.generate_analysis(question_exp)
+            output_path, = glob.glob(output_pattern)
+            book = xlrd.open_workbook(output_path)
+            os.remove(output_path)
+            summary = book.sheet_by_name("Summary")
+            assert_equals(summary.col_values(2, 8, 12), ['', '', '', ''])
+            run_sheet = book.sheet_by_name(question.run.name)
+            assert_equals(run_sheet.row_values(4, 13, 17), ['', '', '', ''])
+    finally:
+        for output_path in glob.glob(output_pattern):
+            os.remove(output_path)
+        shutil.rmtree(output_dir)
+
+
+
+def test_count_spreads_export():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    question_exp = Excel.grab_data(
+        os.path.join(directory, "Tests/1/Test_MultiRun1.xlsx"))
+    question_exp.analyze_all('obj', obj_num_pts=8)
+    question_exp.bootstrap(num_resamples=20, seed=1, processes=1)
+    question_exp.simulate_counts(num_draws=20, seed=1)
+    output_dir = tempfile.mkdtemp()
+    # generate_analysis joins the directory and file name with a backslash
+    output_pattern = output_dir + "\\vaCATE Output - *.xlsx"
+    try:
+        question_exp.directory = output_dir
+        Excel.generate_analysis(question_exp)
+        output_path, = glob.glob(output_pattern)
+        summary = xlrd.open_workbook(output_path).sheet_by_name("Summary")
+    finally:
+        for output_path in glob.glob(output_pattern):
+            os.remove(output_path)
+        shutil.rmtree(output_dir)
+    # Spreads follow the two rows of bootstrap intervals of each parameter
+    labels = Excel.parameter_labels()
+    spacer = len(question_exp.analyses[0].run.elut_ends) - 1
+    intervals_row = 43 + spacer * 7
+    spreads_row = intervals_row + 2 * len(labels)
+    assert_equals(summary.cell_value(intervals_row, 1), "Lower")
+    for index, (name, label) in enumerate(labels):
+        assert_equals(summary.cell_value(spreads_row + index, 0), label)
+        for col, question in enumerate(question_exp.analyses):
+            answer = question.count_spreads[name]
+            value = summary.cell_value(spreads_row + index, col + 2)
+            if answer == '':
+                assert_equals(value, '')
+            else:
+                assert_equals(
+                    "{0:.9g}".format(value), "{0:.9g}".format(answer))
+
 if __name__ == '__main__':
     import Excel
 
@@ -471,7 +1386,7 @@ if __name__ == '__main__':
     temp_question.analyze()
 
     # temp_exp = grab_answers(directory, "/Tests/Edge Cases/Test_SubjMissMidPtPh123.xlsx", temp_question.run.elut_ends)
-    temp_exp = grab_answers(directory, "/Tests/4/Test_SingleRun7.xlsx", temp_question.run.elut_ends)
+    temp_exp = grab_answers(directory, "/Tests/4/Test_SingleRun7.xlsx", temp_question.run.elut_ends.tolist())
     temp_answer = temp_exp.analyses[0]
 
     print "ANSWERS"
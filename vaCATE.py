@@ -4,6 +4,7 @@ import wx
 import xlsxwriter
 
 import Excel
+import Objects
 import Preview
 
 # The recommended way to use wx with mpl is with the WXAgg
@@ -183,6 +184,9 @@ class DialogFrame(wx.Frame):
         self.checkbox = wx.CheckBox(
             inner_panel, id=5, label="Automatically analyze")
         self.checkbox.SetValue(True)
+        self.restore_checkbox = wx.CheckBox(
+            inner_panel, id=6, label="Restore last analyses")
+        self.restore_checkbox.SetValue(False)
         btn3 = wx.Button(inner_panel, id=3, label="About")
         btn4 = wx.Button(inner_panel, id=4, label="Quit")
         
@@ -204,6 +208,8 @@ class DialogFrame(wx.Frame):
         button_box1.Add(btn1, 0, wx.CENTER)
         button_box1.AddSpacer(7, 10)
         button_box1.Add(self.checkbox, 0, wx.CENTER)
+        button_box1.AddSpacer(7, 10)
+        button_box1.Add(self.restore_checkbox, 0, wx.CENTER)
         button_box1.AddSpacer(7, 15)
         button_box2.AddSpacer(7, 10)
         button_box2.Add(btn2, 0, wx.CENTER)
@@ -257,13 +263,21 @@ class DialogFrame(wx.Frame):
             # Formatting the directory (and path) to unicode w/ forward slash
             # so it can be passed between methods/classes w/o bugs
             file_path = os.path.join(directory, filename)
-            temp_cate_data = Excel.grab_data(file_path)
-            if self.checkbox.GetValue():
-                for temp_analysis in temp_cate_data.analyses:
-                    temp_analysis.kind = 'obj'
-                    temp_analysis.obj_num_pts = 8
-                    temp_analysis.analyze()
-            frame = Preview.MainFrame(temp_cate_data)
+            temp_cate_data = Excel.grab_data(file_path, cache=True)
+            result_cache = Objects.ResultCache()
+            if self.restore_checkbox.GetValue():
+                # Runs analyzed before are opened as they were last left,
+                #    before any new analysis replaces what was last stored
+                for analysis in temp_cate_data.analyses:
+                    if not result_cache.restore_last(analysis) and \
+                            self.checkbox.GetValue():
+                        analysis.kind = 'obj'
+                        analysis.obj_num_pts = 8
+                        analysis.analyze(cache=result_cache)
+            elif self.checkbox.GetValue():
+                temp_cate_data.analyze_all(
+                    'obj', obj_num_pts=8, cache=result_cache)
+            frame = Preview.MainFrame(temp_cate_data, cache=result_cache)
             frame.Show(True)
             frame.MakeModal(True)            
             dlg.Destroy()